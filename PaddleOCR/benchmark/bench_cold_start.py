@@ -0,0 +1,119 @@
+# copyright (c) 2023 PaddlePaddle Authors. All Rights Reserve.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Cold start benchmark of the paddleocr package. Every run is a fresh
+interpreter that times `import paddleocr`, the construction of PaddleOCR
+and the first and second call, with eager construction, lazy construction
+and lazy construction followed by prewarm().
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.abspath(os.path.join(__dir__, '..'))
+
+MODES = ['eager', 'lazy', 'prewarm']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--image", type=str, default=None)
+    parser.add_argument("--det_model_dir", type=str, default=None)
+    parser.add_argument("--rec_model_dir", type=str, default=None)
+    parser.add_argument("--cls_model_dir", type=str, default=None)
+    parser.add_argument("--use_angle_cls", action='store_true')
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", type=str, default=None, choices=MODES)
+    return parser.parse_args()
+
+
+def child(args):
+    st = time.time()
+    import paddleocr
+    res = {'import': time.time() - st}
+
+    import cv2
+    import numpy as np
+    if args.image:
+        img = cv2.imread(args.image)
+    else:
+        img = np.full((640, 640, 3), 255, dtype=np.uint8)
+        cv2.putText(img, 'PaddleOCR cold start', (40, 320),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 2)
+
+    kwargs = {
+        name: getattr(args, name)
+        for name in ['det_model_dir', 'rec_model_dir', 'cls_model_dir']
+        if getattr(args, name)
+    }
+    st = time.time()
+    engine = paddleocr.PaddleOCR(
+        use_angle_cls=args.use_angle_cls,
+        lazy_init=args.child != 'eager',
+        show_log=False,
+        **kwargs)
+    res['construct'] = time.time() - st
+    st = time.time()
+    if args.child == 'prewarm':
+        engine.prewarm(cls=args.use_angle_cls)
+    res['prewarm'] = time.time() - st
+    for name in ['first_call', 'second_call']:
+        st = time.time()
+        engine.ocr(img, cls=args.use_angle_cls)
+        res[name] = time.time() - st
+    print(json.dumps(res))
+
+
+def run_child(args, mode):
+    cmd = [sys.executable, os.path.abspath(__file__), '--child', mode]
+    for name in ['image', 'det_model_dir', 'rec_model_dir', 'cls_model_dir']:
+        if getattr(args, name):
+            cmd += ['--' + name, getattr(args, name)]
+    if args.use_angle_cls:
+        cmd.append('--use_angle_cls')
+    out = subprocess.check_output(cmd, cwd=ROOT)
+    return json.loads(out.decode('utf-8').strip().splitlines()[-1])
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        sys.path.insert(0, ROOT)
+        child(args)
+        return
+    # one untimed run so model downloads and the page cache do not count
+    run_child(args, 'eager')
+    keys = ['import', 'construct', 'prewarm', 'first_call', 'second_call']
+    print("{:<8}".format('mode') + ''.join("{:>13}".format(k) for k in keys) +
+          "{:>16}".format('to 1st result'))
+    for mode in MODES:
+        runs = [run_child(args, mode) for _ in range(args.repeat)]
+        mean = {k: sum(r[k] for r in runs) / len(runs) for k in keys}
+        total = mean['import'] + mean['construct'] + mean['prewarm'] + mean[
+            'first_call']
+        print("{:<8}".format(mode) + ''.join("{:>11.1f}ms".format(mean[k] *
+                                                                   1000)
+                                             for k in keys) +
+              "{:>14.1f}ms".format(total * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+# copyright (c) 2023 PaddlePaddle Authors. All Rights Reserve.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Micro-benchmark of cropping the text boxes of a dense page one by one with
+get_rotate_crop_image against CropEngine.
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import time
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(__dir__, '..')))
+
+import cv2
+import numpy as np
+
+from tools.infer.utility import CropEngine, get_rotate_crop_image
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--height", type=int, default=2339)
+    parser.add_argument("--width", type=int, default=1654)
+    parser.add_argument("--box_num", type=int, default=300)
+    parser.add_argument(
+        "--rotated_ratio",
+        type=float,
+        default=0.3,
+        help="Share of slightly rotated boxes, the rest are axis aligned.")
+    parser.add_argument("--num_threads", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def make_boxes(height, width, box_num, rotated_ratio, seed):
+    rng = np.random.RandomState(seed)
+    boxes = []
+    for _ in range(box_num):
+        w, h = rng.uniform(20, 400), rng.uniform(16, 48)
+        cx, cy = rng.uniform(w, width - w), rng.uniform(h, height - h)
+        if rng.uniform() < rotated_ratio:
+            box = cv2.boxPoints(((cx, cy), (w, h), rng.uniform(-5, 5)))
+            # the order of detected boxes: tl, tr, br, bl
+            box = box[np.argsort(box[:, 0])]
+            left = box[:2][np.argsort(box[:2, 1])]
+            right = box[2:][np.argsort(box[2:, 1])]
+            box = np.array([left[0], right[0], right[1], left[1]])
+        else:
+            x0, y0 = round(cx - w / 2), round(cy - h / 2)
+            x1, y1 = x0 + round(w), y0 + round(h)
+            box = np.array([[x0, y0], [x1, y0], [x1, y1], [x0, y1]])
+        boxes.append(box.astype(np.float32))
+    return boxes
+
+
+def timeit(func, repeat):
+    func()
+    st = time.time()
+    for _ in range(repeat):
+        res = func()
+    return (time.time() - st) / repeat, res
+
+
+def main():
+    args = parse_args()
+    rng = np.random.RandomState(args.seed)
+    img = rng.randint(0, 256, (args.height, args.width, 3)).astype(np.uint8)
+    boxes = make_boxes(args.height, args.width, args.box_num,
+                       args.rotated_ratio, args.seed)
+
+    base_time, base_crops = timeit(
+        lambda: [get_rotate_crop_image(img, box.copy()) for box in boxes],
+        args.repeat)
+    engine = CropEngine(args.num_threads)
+    fast_time, (fast_crops, _) = timeit(lambda: engine(img, boxes),
+                                        args.repeat)
+    engine.close()
+
+    print("boxes: {}, threads: {}".format(len(boxes), args.num_threads))
+    print("get_rotate_crop_image : {:.2f} ms".format(base_time * 1000))
+    print("CropEngine            : {:.2f} ms".format(fast_time * 1000))
+    print("speedup               : {:.2f}x".format(base_time / max(fast_time,
+                                                                     1e-9)))
+    max_diff = max(
+        np.abs(a.astype(np.int32) - b.astype(np.int32)).max()
+        for a, b in zip(base_crops, fast_crops))
+    print("max pixel diff: {}".format(max_diff))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+# copyright (c) 2023 PaddlePaddle Authors. All Rights Reserve.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Micro-benchmark of DBPostProcess.boxes_from_bitmap against the vectorized
+boxes_from_bitmap_vectorized on a synthetic dense probability map.
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import time
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(__dir__, '..')))
+
+import cv2
+import numpy as np
+
+from ppocr.postprocess.db_postprocess import DBPostProcess
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--height", type=int, default=960)
+    parser.add_argument("--width", type=int, default=960)
+    parser.add_argument(
+        "--line_height", type=int, default=16, help="Pitch of text lines.")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--thresh", type=float, default=0.3)
+    parser.add_argument("--box_thresh", type=float, default=0.6)
+    parser.add_argument("--unclip_ratio", type=float, default=1.5)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def make_dense_map(height, width, line_height, seed):
+    """
+    A probability map that looks like a dense invoice: rows of short,
+    slightly rotated words.
+    """
+    rng = np.random.RandomState(seed)
+    pred = np.zeros((height, width), dtype=np.float32)
+    for cy in range(line_height // 2, height - line_height // 2, line_height):
+        x = 2
+        while x < width - 20:
+            w = rng.randint(8, 60)
+            h = rng.randint(line_height // 3, line_height * 2 // 3)
+            angle = rng.uniform(-3, 3)
+            box = cv2.boxPoints(((x + w / 2, cy), (w, h), angle))
+            cv2.fillPoly(pred, [box.astype(np.int32)],
+                         float(rng.uniform(0.4, 1.0)))
+            x += w + rng.randint(6, 20)
+    return cv2.GaussianBlur(pred, (3, 3), 0.8)
+
+
+def timeit(func, repeat):
+    func()
+    st = time.time()
+    for _ in range(repeat):
+        res = func()
+    return (time.time() - st) / repeat, res
+
+
+def main():
+    args = parse_args()
+    pred = make_dense_map(args.height, args.width, args.line_height,
+                          args.seed)
+    bitmap = pred > args.thresh
+    dest_h, dest_w = args.height * 2, args.width * 2
+    post_process = DBPostProcess(
+        thresh=args.thresh,
+        box_thresh=args.box_thresh,
+        unclip_ratio=args.unclip_ratio)
+
+    base_time, (base_boxes, base_scores) = timeit(
+        lambda: post_process.boxes_from_bitmap(pred, bitmap, dest_w, dest_h),
+        args.repeat)
+    fast_time, (fast_boxes, fast_scores) = timeit(
+        lambda: post_process.boxes_from_bitmap_vectorized(pred, bitmap, dest_w, dest_h),
+        args.repeat)
+
+    print("boxes: {} (current) / {} (vectorized)".format(
+        len(base_boxes), len(fast_boxes)))
+    print("current    : {:.2f} ms".format(base_time * 1000))
+    print("vectorized : {:.2f} ms".format(fast_time * 1000))
+    print("speedup    : {:.2f}x".format(base_time / max(fast_time, 1e-9)))
+    if len(base_boxes) == len(fast_boxes) and len(base_boxes) > 0:
+        box_diff = np.abs(base_boxes - fast_boxes)
+        score_diff = np.abs(np.array(base_scores) - np.array(fast_scores))
+        print("max box diff: {} px, mean box diff: {:.3f} px".format(
+            box_diff.max(), box_diff.mean()))
+        print("max score diff: {:.2e}".format(score_diff.max()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+# copyright (c) 2023 PaddlePaddle Authors. All Rights Reserve.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Regression check and micro-benchmark of reading_order against the former
+sorted_boxes on synthetic single-column pages. For every (line pitch, box
+height) layout the share of pages ordered differently from the former
+sorted_boxes and the share of pages in the wrong order (not line by line,
+left to right) of both are printed. The exit code is 1 when reading_order
+gets some page wrong that the former sorted_boxes orders right, or with
+--legacy when some page differs from it.
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import time
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(__dir__, '..')))
+
+import numpy as np
+
+from ppocr.utils.reading_order import reading_order
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--layouts",
+        type=str,
+        default="30x20,24x24,26x30,20x24,22x20,18x14",
+        help="Comma separated line pitch x box height of the pages.")
+    parser.add_argument("--line_num", type=int, default=40)
+    parser.add_argument("--width", type=int, default=1654)
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=3,
+        help="Max vertical offset of a box from its line.")
+    parser.add_argument("--page_num", type=int, default=200)
+    parser.add_argument(
+        "--overlap_thresh",
+        type=float,
+        default=0.4,
+        help="reading_order_overlap_thresh of the line clustering.")
+    parser.add_argument(
+        "--legacy",
+        action='store_true',
+        help="Check the legacy reading order instead of the clustering.")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def former_sorted_boxes(dt_boxes):
+    """
+    sorted_boxes of tools/infer/predict_system.py before the reading order
+    was vectorized.
+    """
+    num_boxes = dt_boxes.shape[0]
+    sorted_boxes = sorted(dt_boxes, key=lambda x: (x[0][1], x[0][0]))
+    _boxes = list(sorted_boxes)
+
+    for i in range(num_boxes - 1):
+        for j in range(i, -1, -1):
+            if abs(_boxes[j + 1][0][1] - _boxes[j][0][1]) < 10 and \
+                    (_boxes[j + 1][0][0] < _boxes[j][0][0]):
+                tmp = _boxes[j]
+                _boxes[j] = _boxes[j + 1]
+                _boxes[j + 1] = tmp
+            else:
+                break
+    return _boxes
+
+
+def make_page(rng, pitch, height, line_num, width, jitter):
+    boxes = []
+    for line in range(line_num):
+        x = rng.uniform(0, 40)
+        while True:
+            w = rng.uniform(30, 200)
+            if x + w > width:
+                break
+            y0 = line * pitch + rng.uniform(-jitter, jitter)
+            h = height + rng.uniform(-jitter, jitter) / 2
+            boxes.append([[x, y0], [x + w, y0], [x + w, y0 + h], [x, y0 + h]])
+            x += w + rng.uniform(8, 40)
+    # generated in reading order
+    boxes = np.array(boxes, dtype=np.float32)
+    perm = rng.permutation(len(boxes))
+    return boxes[perm], np.argsort(perm)
+
+
+def main():
+    args = parse_args()
+    rng = np.random.RandomState(args.seed)
+    failed = False
+    for layout in args.layouts.split(','):
+        pitch, height = (float(v) for v in layout.split('x'))
+        num_differ, former_wrong, new_wrong, regressed = 0, 0, 0, 0
+        former_time, new_time = 0, 0
+        for _ in range(args.page_num):
+            boxes, truth = make_page(rng, pitch, height, args.line_num,
+                                     args.width, args.jitter)
+            st = time.time()
+            former = np.array(former_sorted_boxes(boxes))
+            former_time += time.time() - st
+            st = time.time()
+            order = reading_order(
+                boxes, args.overlap_thresh, legacy=args.legacy)
+            new_time += time.time() - st
+            former_ok = np.array_equal(former, boxes[truth])
+            new_ok = np.array_equal(order, truth)
+            num_differ += not np.array_equal(former, boxes[order])
+            former_wrong += not former_ok
+            new_wrong += not new_ok
+            regressed += former_ok and not new_ok
+        failed = failed or regressed > 0 or (args.legacy and num_differ > 0)
+        print("pitch {:>4g} height {:>4g}: {:>5.1f}% pages differ, "
+              "wrong order former {:>5.1f}% now {:>5.1f}%, "
+              "former {:.2f} ms, now {:.2f} ms".format(
+                  pitch, height, 100.0 * num_differ / args.page_num,
+                  100.0 * former_wrong / args.page_num,
+                  100.0 * new_wrong / args.page_num,
+                  1000 * former_time / args.page_num,
+                  1000 * new_time / args.page_num))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
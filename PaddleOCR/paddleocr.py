@@ -15,15 +15,16 @@
 import os
 import sys
 import importlib
+import importlib.util
 
 __dir__ = os.path.dirname(__file__)
 
-import paddle
-
 sys.path.append(os.path.join(__dir__, ''))
 
 import cv2
+import copy
 import logging
+import threading
 import numpy as np
 from pathlib import Path
 
@@ -43,9 +44,11 @@ from tools.infer import predict_system
 from ppocr.utils.logging import get_logger
 
 logger = get_logger()
-from ppocr.utils.utility import check_and_read, get_image_file_list, alpha_to_color, binarize_img
+from ppocr.utils.utility import check_and_read, get_image_file_list, alpha_to_color, binarize_img, is_pdf_file
 from ppocr.utils.network import maybe_download, download_with_progressbar, is_link, confirm_model_dir_url
-from tools.infer.utility import draw_ocr, str2bool, check_gpu
+from ppocr.utils.ocr_cache import OCRResultCache, image_key, args_fingerprint
+from tools.infer.utility import draw_ocr, str2bool, check_gpu, read_pdf_by_args
+from tools.infer.engine_pool import EnginePool
 from ppstructure.utility import init_args, draw_structure_result
 from ppstructure.predict_system import StructureSystem, save_structure_res, to_excel
 
@@ -58,6 +61,7 @@ SUPPORT_DET_MODEL = ['DB']
 VERSION = '2.6.1.0'
 SUPPORT_REC_MODEL = ['CRNN', 'SVTR_LCNet']
 BASE_DIR = os.path.expanduser("~/.paddleocr/")
+_CACHE_MISS = object()
 
 DEFAULT_OCR_MODEL_VERSION = 'PP-OCRv3'
 SUPPORT_OCR_MODEL_VERSION = ['PP-OCR', 'PP-OCRv2', 'PP-OCRv3']
@@ -344,6 +348,8 @@ def parse_args(mMain=True):
                 'rec_char_dict_path', 'table_char_dict_path', 'layout_dict_path'
         ]:
             action.default = None
+    # the package api creates each predictor on first use
+    parser.set_defaults(lazy_init=True)
     if mMain:
         return parser.parse_args()
     else:
@@ -449,6 +455,37 @@ def check_img(img):
     return img
 
 
+def is_local_pdf(img):
+    return isinstance(img, str) and not is_link(img) and is_pdf_file(img)
+
+
+def preprocess_image(img, alpha_color=(255, 255, 255), inv=False, bin=False):
+    img = alpha_to_color(img, alpha_color)
+    if inv:
+        img = cv2.bitwise_not(img)
+    if bin:
+        img = binarize_img(img)
+    return img
+
+
+_engine_pool_lock = threading.Lock()
+
+
+def get_engine_pool(engine):
+    """
+    The EnginePool behind the async api of a PaddleOCR or PPStructure
+    engine, created on first use with args.async_workers replicas.
+    """
+    with _engine_pool_lock:
+        if engine.engine_pool is None:
+            engine.engine_pool = EnginePool(
+                engine,
+                engine.args.async_workers,
+                engine.args.async_max_pending,
+                skip=('engine_pool', 'pipeline_system'))
+    return engine.engine_pool
+
+
 class PaddleOCR(predict_system.TextSystem):
     def __init__(self, **kwargs):
         """
@@ -509,6 +546,44 @@ class PaddleOCR(predict_system.TextSystem):
         # init det_model and rec_model
         super().__init__(params)
         self.page_num = params.page_num
+        self.pipeline_system = None
+        self.engine_pool = None
+        self.ocr_cache = None
+        if params.ocr_cache_size > 0:
+            self.ocr_cache = OCRResultCache(
+                params.ocr_cache_size,
+                disk_dir=params.ocr_cache_dir,
+                disk_max_mb=params.ocr_cache_disk_mb)
+        self.cache_fingerprint = args_fingerprint(params)
+
+    def _cached_page(self, func, img, *options):
+        """
+        Return func(img), served from the result cache when the same pixels
+        were processed before with the same options and models.
+        """
+        if self.ocr_cache is None:
+            return func(img)
+        key = image_key(img, self.cache_fingerprint, *options)
+        res = self.ocr_cache.get(key, _CACHE_MISS)
+        if res is _CACHE_MISS:
+            res = func(img)
+            self.ocr_cache.put(key, copy.deepcopy(res))
+            return res
+        return copy.deepcopy(res)
+
+    def cache_stats(self):
+        """
+        Hit/miss counters of the page result cache and the recognizer crop
+        cache, None for a cache that is not enabled.
+        """
+        # do not create a lazily initialized recognizer just to report on it
+        crop_cache = getattr(
+            self.__dict__.get('text_recognizer'), 'cache', None)
+        return {
+            'ocr': self.ocr_cache.stats()
+            if self.ocr_cache is not None else None,
+            'rec_crop': crop_cache.stats() if crop_cache is not None else None
+        }
 
     def ocr(self, img, det=True, rec=True, cls=True, bin=False, inv=False, alpha_color=(255, 255, 255)):
         """
@@ -531,53 +606,57 @@ class PaddleOCR(predict_system.TextSystem):
                 'Since the angle classifier is not initialized, it will not be used during the forward process'
             )
 
-        img = check_img(img)
-        # for infer pdf file
-        if isinstance(img, list):
-            if self.page_num > len(img) or self.page_num == 0:
-                imgs = img
-            else:
-                imgs = img[:self.page_num]
+        if is_local_pdf(img):
+            # render the pages on demand instead of holding the whole pdf
+            imgs = read_pdf_by_args(img, self.args)
         else:
-            imgs = [img]
-
-        def preprocess_image(_image):
-            _image = alpha_to_color(_image, alpha_color)
-            if inv:
-                _image = cv2.bitwise_not(_image)
-            if bin:
-                _image = binarize_img(_image)
-            return _image
+            img = check_img(img)
+            # for infer pdf file
+            if isinstance(img, list):
+                if self.page_num > len(img) or self.page_num == 0:
+                    imgs = img
+                else:
+                    imgs = img[:self.page_num]
+            else:
+                imgs = [img]
 
+        cache_options = (det, rec, cls and self.use_angle_cls, bin, inv,
+                         tuple(alpha_color))
         if det and rec:
-            ocr_res = []
-            for idx, img in enumerate(imgs):
-                img = preprocess_image(img)
+
+            def ocr_page(img):
+                img = preprocess_image(img, alpha_color, inv, bin)
                 dt_boxes, rec_res, _ = self.__call__(img, cls)
                 if not dt_boxes and not rec_res:
-                    ocr_res.append(None)
-                    continue
-                tmp_res = [[box.tolist(), res]
-                           for box, res in zip(dt_boxes, rec_res)]
-                ocr_res.append(tmp_res)
-            return ocr_res
-        elif det and not rec:
+                    return None
+                return [[box.tolist(), res]
+                        for box, res in zip(dt_boxes, rec_res)]
+
             ocr_res = []
             for idx, img in enumerate(imgs):
-                img = preprocess_image(img)
+                ocr_res.append(
+                    self._cached_page(ocr_page, img, *cache_options))
+            return ocr_res
+        elif det and not rec:
+
+            def det_page(img):
+                img = preprocess_image(img, alpha_color, inv, bin)
                 dt_boxes, elapse = self.text_detector(img)
                 if not dt_boxes:
-                    ocr_res.append(None)
-                    continue
-                tmp_res = [box.tolist() for box in dt_boxes]
-                ocr_res.append(tmp_res)
+                    return None
+                return [box.tolist() for box in dt_boxes]
+
+            ocr_res = []
+            for idx, img in enumerate(imgs):
+                ocr_res.append(
+                    self._cached_page(det_page, img, *cache_options))
             return ocr_res
         else:
             ocr_res = []
             cls_res = []
             for idx, img in enumerate(imgs):
                 if not isinstance(img, list):
-                    img = preprocess_image(img)
+                    img = preprocess_image(img, alpha_color, inv, bin)
                     img = [img]
                 if self.use_angle_cls and cls:
                     img, cls_res_tmp, elapse = self.text_classifier(img)
@@ -589,6 +668,121 @@ class PaddleOCR(predict_system.TextSystem):
                 return cls_res
             return ocr_res
 
+    async def aocr(self,
+                   img,
+                   det=True,
+                   rec=True,
+                   cls=True,
+                   bin=False,
+                   inv=False,
+                   alpha_color=(255, 255, 255),
+                   timeout=None):
+        """
+        Awaitable ocr for asyncio services. Calls run in a pool of
+        async_workers engine replicas sharing the loaded models, so
+        concurrent callers do not block the event loop or each other.
+        args:
+            img, det, rec, cls, bin, inv, alpha_color: same as ocr
+            timeout: seconds to wait for the result, None waits forever. On timeout asyncio.TimeoutError is raised
+        A call cancelled (or timed out) before it starts never runs, a started call finishes in the background.
+        If more than async_max_pending calls are queued a RuntimeError is raised.
+        """
+        return await get_engine_pool(self).run(
+            PaddleOCR.ocr,
+            img,
+            det,
+            rec,
+            cls,
+            bin,
+            inv,
+            alpha_color,
+            timeout=timeout)
+
+    def ocr_stream(self,
+                   imgs,
+                   cls=True,
+                   bin=False,
+                   inv=False,
+                   alpha_color=(255, 255, 255)):
+        """
+        Pipelined OCR over a stream of images, det, cls and rec run in
+        their own workers so consecutive pages overlap.
+        args:
+            imgs: iterable (or generator) of ndarray, img_path or bytes. Pages of a pdf are yielded one by one
+            cls, bin, inv, alpha_color: same as ocr
+        return(generator):
+            the result of each page in input order, same format as one page of ocr
+        """
+        if cls == True and self.use_angle_cls == False:
+            logger.warning(
+                'Since the angle classifier is not initialized, it will not be used during the forward process'
+            )
+        if self.pipeline_system is None:
+            from tools.infer.pipeline_system import PipelineTextSystem
+            self.pipeline_system = PipelineTextSystem(self.args)
+
+        def page_iter():
+            for img in imgs:
+                if is_local_pdf(img):
+                    for page in read_pdf_by_args(img, self.args):
+                        yield preprocess_image(page, alpha_color, inv, bin)
+                    continue
+                img = check_img(img)
+                if isinstance(img, list):
+                    if 0 < self.page_num < len(img):
+                        img = img[:self.page_num]
+                    pages = img
+                else:
+                    pages = [img]
+                for page in pages:
+                    if page is not None:
+                        page = preprocess_image(page, alpha_color, inv, bin)
+                    yield page
+
+        for dt_boxes, rec_res, _ in self.pipeline_system.stream(page_iter(),
+                                                                cls):
+            if not dt_boxes and not rec_res:
+                yield None
+                continue
+            yield [[box.tolist(), res] for box, res in zip(dt_boxes, rec_res)]
+
+    def ocr_roi(self,
+                img,
+                regions,
+                det=False,
+                cls=True,
+                bin=False,
+                inv=False,
+                alpha_color=(255, 255, 255)):
+        """
+        OCR only known regions of an image, e.g. the fields of a fixed
+        layout form, skipping the full page detection.
+        args:
+            img: one image, ndarray, img_path or bytes
+            regions: list or dict of quads / polygons in image coordinates
+            det: detect the text lines inside each region. If False, every region is recognized as a single line. Default is False
+            cls, bin, inv, alpha_color: same as ocr
+        return:
+            results in the order (list) or under the keys (dict) of regions. A region gives (text, score) when det is False, else a list of [box, (text, score)]
+        """
+        if cls == True and self.use_angle_cls == False:
+            logger.warning(
+                'Since the angle classifier is not initialized, it will not be used during the forward process'
+            )
+        img = check_img(img)
+        if isinstance(img, list):
+            img = img[0]
+        img = preprocess_image(img, alpha_color, inv, bin)
+        keys = list(regions.keys()) if isinstance(regions, dict) else None
+        region_list = [regions[key] for key in keys] if keys else list(regions)
+        results, _ = self.ocr_regions(img, region_list, det, cls)
+        if det:
+            results = [[[box.tolist(), res] for box, res in roi_res]
+                       for roi_res in results]
+        if keys is not None:
+            return dict(zip(keys, results))
+        return results
+
 
 class PPStructure(StructureSystem):
     def __init__(self, **kwargs):
@@ -648,13 +842,50 @@ class PPStructure(StructureSystem):
                 Path(__file__).parent / layout_model_config['dict_path'])
         logger.debug(params)
         super().__init__(params)
+        self.args = params
+        self.engine_pool = None
 
     def __call__(self, img, return_ocr_result_in_table=False, img_idx=0):
+        if is_local_pdf(img):
+            # one result per page, the pages are rendered on demand
+            return [
+                res
+                for _, res in self.stream_pdf(img, return_ocr_result_in_table)
+            ]
         img = check_img(img)
         res, _ = super().__call__(
             img, return_ocr_result_in_table, img_idx=img_idx)
         return res
 
+    async def astructure(self,
+                         img,
+                         return_ocr_result_in_table=False,
+                         img_idx=0,
+                         timeout=None):
+        """
+        Awaitable __call__ for asyncio services, run in a pool of
+        async_workers engine replicas sharing the loaded models. timeout,
+        cancellation and async_max_pending behave as in PaddleOCR.aocr.
+        """
+        return await get_engine_pool(self).run(
+            PPStructure.__call__,
+            img,
+            return_ocr_result_in_table,
+            img_idx,
+            timeout=timeout)
+
+    def stream_pdf(self, pdf_path, return_ocr_result_in_table=False):
+        """
+        Analyze a pdf page by page, honoring page_start, page_num, pdf_dpi
+        and pdf_prefetch.
+        return(generator): (page_img, res) of every page
+        """
+        pages = read_pdf_by_args(pdf_path, self.args)
+        for index, page in enumerate(pages, self.args.page_start):
+            res, _ = super().__call__(
+                page, return_ocr_result_in_table, img_idx=index)
+            yield page, res
+
 
 def main():
     # for cmd
@@ -694,10 +925,7 @@ def main():
                     for line in res:
                         logger.info(line)
         elif args.type == 'structure':
-            img, flag_gif, flag_pdf = check_and_read(img_path)
-            if not flag_gif and not flag_pdf:
-                img = cv2.imread(img_path)
-
+            flag_pdf = is_pdf_file(img_path)
             if args.recovery and args.use_pdf2docx_api and flag_pdf:
                 from pdf2docx.converter import Converter
                 docx_file = os.path.join(args.output,
@@ -709,26 +937,26 @@ def main():
                 continue
 
             if not flag_pdf:
+                img, flag_gif, _ = check_and_read(img_path)
+                if not flag_gif:
+                    img = cv2.imread(img_path)
                 if img is None:
                     logger.error("error in loading image:{}".format(img_path))
                     continue
-                img_paths = [[img_path, img]]
+                pages = [(0, img)]
             else:
-                img_paths = []
-                for index, pdf_img in enumerate(img):
-                    os.makedirs(
-                        os.path.join(args.output, img_name), exist_ok=True)
+                os.makedirs(os.path.join(args.output, img_name), exist_ok=True)
+                pages = enumerate(
+                    read_pdf_by_args(img_path, args), args.page_start)
+
+            all_res = []
+            for index, img in pages:
+                if flag_pdf:
+                    logger.info('processing page {}:'.format(index + 1))
                     pdf_img_path = os.path.join(
                         args.output, img_name,
                         img_name + '_' + str(index) + '.jpg')
-                    cv2.imwrite(pdf_img_path, pdf_img)
-                    img_paths.append([pdf_img_path, pdf_img])
-
-            all_res = []
-            for index, (new_img_path, img) in enumerate(img_paths):
-                logger.info('processing {}/{} page:'.format(index + 1,
-                                                            len(img_paths)))
-                new_img_name = os.path.basename(new_img_path).split('.')[0]
+                    cv2.imwrite(pdf_img_path, img)
                 result = engine(img, img_idx=index)
                 save_structure_res(result, args.output, img_name, index)
 
@@ -37,6 +37,9 @@ from ppocr.data.simple_dataset import SimpleDataSet
 from ppocr.data.lmdb_dataset import LMDBDataSet, LMDBDataSetSR
 from ppocr.data.pgnet_dataset import PGDataSet
 from ppocr.data.pubtab_dataset import PubTabDataSet
+from ppocr.data.shard_dataset import ShardDataSet
+from ppocr.data.bucket_sampler import BucketBatchSampler
+from ppocr.data.eval_cache import EvalBatchCache
 
 __all__ = ['build_dataloader', 'transform', 'create_operators']
 
@@ -55,7 +58,7 @@ def build_dataloader(config, mode, device, logger, seed=None):
 
     support_dict = [
         'SimpleDataSet', 'LMDBDataSet', 'PGDataSet', 'PubTabDataSet',
-        'LMDBDataSetSR'
+        'LMDBDataSetSR', 'ShardDataSet'
     ]
     module_name = config[mode]['dataset']['name']
     assert module_name in support_dict, Exception(
@@ -74,7 +77,20 @@ def build_dataloader(config, mode, device, logger, seed=None):
     else:
         use_shared_memory = True
 
-    if mode == "Train":
+    if module_name == 'ShardDataSet' and 'bucket_sampler' not in loader_config:
+        # shuffled shard by shard by the dataset itself
+        shuffle = False
+
+    if mode == "Train" and 'bucket_sampler' in loader_config:
+        # batches of similar aspect ratio, distributed to multiple cards
+        batch_sampler = BucketBatchSampler(
+            dataset=dataset,
+            batch_size=batch_size,
+            shuffle=shuffle,
+            drop_last=drop_last,
+            seed=seed,
+            **loader_config['bucket_sampler'])
+    elif mode == "Train":
         # Distribute data to multiple cards
         batch_sampler = DistributedBatchSampler(
             dataset=dataset,
@@ -103,6 +119,14 @@ def build_dataloader(config, mode, device, logger, seed=None):
         use_shared_memory=use_shared_memory,
         collate_fn=collate_fn)
 
+    if mode == "Eval" and loader_config.get('cache', False):
+        # replay the transformed eval batches after the first evaluation
+        data_loader = EvalBatchCache(
+            data_loader,
+            max_mb=loader_config.get('cache_max_mb', 4096),
+            cache_dir=loader_config.get('cache_dir', None),
+            logger=logger)
+
     # support exit using ctrl+c
     signal.signal(signal.SIGINT, term_mp)
     signal.signal(signal.SIGTERM, term_mp)
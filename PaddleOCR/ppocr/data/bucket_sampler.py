@@ -0,0 +1,121 @@
+# copyright (c) 2023 PaddlePaddle Authors. All Rights Reserve.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import math
+
+import numpy as np
+import paddle.distributed as dist
+from paddle.io import Sampler
+
+
+class BucketBatchSampler(Sampler):
+    """
+    Distributed batch sampler for recognition that groups samples of
+    similar aspect ratio. Every sample goes to the narrowest bucket whose
+    width holds it once resized to image_height, and every batch is drawn
+    from one bucket. The sampler yields (idx, bucket_width) pairs, the
+    dataset puts the width into data['bucket_width'] and RecResizeImg pads
+    to it instead of the full image_shape width.
+    All cards get the same number of batches, the i-th batch of every card
+    comes from the same bucket.
+    args:
+        dataset: dataset with sample_info_list, [width, height, label_length]
+            of every sample, see ppocr/utils/lmdb_index.py and
+            ppocr/utils/shards.py
+        batch_size(int): batch size per card
+        image_height(int): height of the resized images, as in image_shape
+        bucket_widths(list): widths of the buckets, the last one is the
+            max width as in image_shape
+    """
+
+    def __init__(self,
+                 dataset,
+                 batch_size,
+                 image_height,
+                 bucket_widths,
+                 shuffle=True,
+                 drop_last=False,
+                 seed=None,
+                 num_replicas=None,
+                 rank=None):
+        sample_info = getattr(dataset, 'sample_info_list', None)
+        if sample_info is None:
+            raise ValueError(
+                "BucketBatchSampler needs the sample sizes of {}, build them "
+                "with ppocr/utils/lmdb_index.py for LMDBs or convert the data "
+                "to shards with ppocr/utils/shards.py".format(
+                    type(dataset).__name__))
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.bucket_widths = sorted(int(w) for w in bucket_widths)
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.seed = seed or 0
+        self.epoch = 0
+        self.nranks = num_replicas if num_replicas is not None else dist.get_world_size(
+        )
+        self.local_rank = rank if rank is not None else dist.get_rank()
+
+        sample_info = np.asarray(sample_info)
+        ratio = sample_info[:, 0] / np.maximum(sample_info[:, 1], 1)
+        resized_w = np.ceil(image_height * ratio)
+        bucket_ids = np.searchsorted(self.bucket_widths, resized_w)
+        bucket_ids = np.minimum(bucket_ids, len(self.bucket_widths) - 1)
+        self.buckets = [
+            np.where(bucket_ids == i)[0]
+            for i in range(len(self.bucket_widths))
+        ]
+
+    def _global_batches(self, rng):
+        """
+        Batches of batch_size * nranks samples per bucket. An incomplete last
+        batch of a bucket is dropped with drop_last, else filled up with
+        samples of the same bucket.
+        """
+        global_size = self.batch_size * self.nranks
+        batches = []
+        for bucket_id, indices in enumerate(self.buckets):
+            if len(indices) == 0:
+                continue
+            if self.shuffle:
+                indices = rng.permutation(indices)
+            num = len(indices) // global_size if self.drop_last else int(
+                math.ceil(len(indices) / global_size))
+            if num * global_size > len(indices):
+                indices = np.resize(indices, num * global_size)
+            for i in range(num):
+                batches.append((bucket_id, indices[i * global_size:(i + 1) *
+                                                   global_size]))
+        if self.shuffle:
+            batches = [batches[i] for i in rng.permutation(len(batches))]
+        return batches
+
+    def __iter__(self):
+        rng = np.random.RandomState(self.seed + self.epoch)
+        for bucket_id, indices in self._global_batches(rng):
+            width = self.bucket_widths[bucket_id]
+            local = indices[self.local_rank * self.batch_size:(
+                self.local_rank + 1) * self.batch_size]
+            yield [(int(idx), width) for idx in local]
+        if self.shuffle:
+            self.epoch += 1
+
+    def __len__(self):
+        global_size = self.batch_size * self.nranks
+        round_fn = math.floor if self.drop_last else math.ceil
+        return sum(
+            int(round_fn(len(indices) / global_size))
+            for indices in self.buckets)
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
@@ -0,0 +1,143 @@
+# copyright (c) 2023 PaddlePaddle Authors. All Rights Reserve.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import tempfile
+import weakref
+
+import numpy as np
+import paddle
+
+__all__ = ['EvalBatchCache']
+
+
+def _remove(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+class EvalBatchCache(object):
+    """
+    Eval dataloader that keeps the transformed batches of its first complete
+    pass in a memory mapped file and replays them on later passes, so the
+    periodic evaluation during training does not decode, resize and
+    normalize the same eval set again. Only for deterministic transforms.
+    Batches must be lists of tensors or arrays. When they are not, or when
+    the eval set is larger than max_mb, the cache is turned off and every
+    pass reads from the dataloader.
+    args:
+        data_loader: the eval paddle.io.DataLoader
+        max_mb(float): max size of the cached batches
+        cache_dir(str): directory of the cache file, the temp dir by
+            default, e.g. /dev/shm to keep it in shared memory
+    """
+
+    def __init__(self, data_loader, max_mb=4096, cache_dir=None, logger=None):
+        self.data_loader = data_loader
+        self.max_bytes = int(max_mb * (1 << 20))
+        self.cache_dir = cache_dir
+        self.logger = logger
+        self.disabled = False
+        self._path = None
+        self._batches = None
+        self._data = None
+
+    def __len__(self):
+        return len(self.data_loader)
+
+    def __getattr__(self, name):
+        if name == 'data_loader':
+            raise AttributeError(name)
+        return getattr(self.data_loader, name)
+
+    def __iter__(self):
+        if self._batches is not None:
+            return self._replay()
+        if self.disabled:
+            return iter(self.data_loader)
+        return self._record()
+
+    def _disable(self, reason):
+        self.disabled = True
+        if self.logger is not None:
+            self.logger.warning("eval cache disabled: {}".format(reason))
+
+    def _record(self):
+        fd, path = tempfile.mkstemp(
+            prefix='ppocr_eval_', suffix='.cache', dir=self.cache_dir)
+        finalizer = weakref.finalize(self, _remove, path)
+        batches = []
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for batch in self.data_loader:
+                    if not self.disabled:
+                        entry, size = self._write(f, batch, size)
+                        if entry is None:
+                            batches = None
+                        else:
+                            batches.append(entry)
+                    yield batch
+        finally:
+            if self.disabled or batches is None or len(batches) != len(
+                    self.data_loader):
+                # an incomplete pass is recorded again next time
+                finalizer()
+            else:
+                self._path = path
+                self._batches = batches
+                if size > 0:
+                    self._data = np.memmap(path, dtype=np.uint8, mode='r')
+                if self.logger is not None:
+                    self.logger.info(
+                        "cached {} eval batches, {:.1f} MB in {}".format(
+                            len(batches), size / (1 << 20), path))
+
+    def _write(self, f, batch, size):
+        if not isinstance(batch, (list, tuple)):
+            self._disable("batches of type {} are not supported".format(
+                type(batch).__name__))
+            return None, size
+        entry = []
+        for item in batch:
+            if isinstance(item, paddle.Tensor):
+                is_tensor, array = True, item.numpy()
+            elif isinstance(item, np.ndarray):
+                is_tensor, array = False, item
+            else:
+                self._disable("batch items of type {} are not supported".
+                              format(type(item).__name__))
+                return None, size
+            array = np.ascontiguousarray(array)
+            if size + array.nbytes > self.max_bytes:
+                self._disable("eval set larger than {:.0f} MB".format(
+                    self.max_bytes / (1 << 20)))
+                return None, size
+            f.write(array.tobytes())
+            entry.append((is_tensor, array.dtype, array.shape, size))
+            size += array.nbytes
+        return entry, size
+
+    def _replay(self):
+        for entry in self._batches:
+            batch = []
+            for is_tensor, dtype, shape, offset in entry:
+                count = int(np.prod(shape))
+                if count == 0:
+                    array = np.zeros(shape, dtype=dtype)
+                else:
+                    array = self._data[offset:offset + count * dtype.itemsize]
+                    array = array.view(dtype).reshape(shape)
+                batch.append(
+                    paddle.to_tensor(array) if is_tensor else np.array(array))
+            yield batch
@@ -18,6 +18,7 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import copy
+import hashlib
 import numpy as np
 import string
 from shapely.geometry import LineString, Point, Polygon
@@ -131,10 +132,60 @@ class BaseRecLabelEncode(object):
         for i, char in enumerate(dict_character):
             self.dict[char] = i
         self.character = dict_character
+        # index in character_str -> index in self.character
+        self.raw_to_dict = np.array(
+            [self.dict.get(char, -1) for char in self.character_str],
+            dtype=np.int64)
 
     def add_special_char(self, dict_character):
         return dict_character
 
+    def label_cache_key(self):
+        """
+        Hash of the character dict, use_space_char and lower, the label
+        ids of encode_raw are only valid for the same key.
+        """
+        md5 = hashlib.md5()
+        md5.update('\n'.join(self.character_str).encode('utf-8'))
+        md5.update(b'lower' if self.lower else b'')
+        return md5.hexdigest()
+
+    def encode_raw(self, text):
+        """
+        Indices of the chars of text in character_str, chars not in the dict
+        are skipped. Meant to be stored, see ppocr/data/label_cache.py.
+        """
+        if self.lower:
+            text = text.lower()
+        raw_dict = getattr(self, '_raw_dict', None)
+        if raw_dict is None:
+            raw_dict = {char: i for i, char in enumerate(self.character_str)}
+            self._raw_dict = raw_dict
+        return [raw_dict[char] for char in text if char in raw_dict]
+
+    def encode_ids(self, text, ids):
+        """
+        Same as encode(text) with the ids of encode_raw(text).
+        """
+        if len(text) == 0 or len(text) > self.max_text_len:
+            return None
+        if len(ids) == 0:
+            return None
+        return self.raw_to_dict[ids].tolist()
+
+    def encode_label(self, data):
+        """
+        encode(data['label']), with the pre-encoded ids the dataset put in
+        data['label_ids'] when they belong to the label, i.e. no op changed
+        the label and the ids are not longer than it.
+        """
+        text = data['label']
+        label_ids = data.pop('label_ids', None)
+        if label_ids is not None and label_ids[0] == text and len(label_ids[
+                1]) <= len(text):
+            return self.encode_ids(text, label_ids[1])
+        return self.encode(text)
+
     def encode(self, text):
         """convert text-label into text-index.
         input:
@@ -173,18 +224,14 @@ class CTCLabelEncode(BaseRecLabelEncode):
             max_text_length, character_dict_path, use_space_char)
 
     def __call__(self, data):
-        text = data['label']
-        text = self.encode(text)
+        text = self.encode_label(data)
         if text is None:
             return None
         data['length'] = np.array(len(text))
         text = text + [0] * (self.max_text_len - len(text))
         data['label'] = np.array(text)
-
-        label = [0] * len(self.character)
-        for x in text:
-            label[x] += 1
-        data['label_ace'] = np.array(label)
+        data['label_ace'] = np.bincount(
+            data['label'], minlength=len(self.character))
         return data
 
     def add_special_char(self, dict_character):
@@ -460,8 +507,7 @@ class AttnLabelEncode(BaseRecLabelEncode):
         return dict_character
 
     def __call__(self, data):
-        text = data['label']
-        text = self.encode(text)
+        text = self.encode_label(data)
         if text is None:
             return None
         if len(text) >= self.max_text_len:
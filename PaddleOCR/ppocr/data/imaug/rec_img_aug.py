@@ -226,11 +226,14 @@ class RecResizeImg(object):
 
     def __call__(self, data):
         img = data['image']
+        image_shape = self.image_shape
+        if 'bucket_width' in data:
+            # batch of similar widths from BucketBatchSampler
+            image_shape = list(image_shape[:2]) + [data['bucket_width']]
         if self.infer_mode and self.character_dict_path is not None:
-            norm_img, valid_ratio = resize_norm_img_chinese(img,
-                                                            self.image_shape)
+            norm_img, valid_ratio = resize_norm_img_chinese(img, image_shape)
         else:
-            norm_img, valid_ratio = resize_norm_img(img, self.image_shape,
+            norm_img, valid_ratio = resize_norm_img(img, image_shape,
                                                     self.padding)
         data['image'] = norm_img
         data['valid_ratio'] = valid_ratio
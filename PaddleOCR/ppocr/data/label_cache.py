@@ -0,0 +1,148 @@
+# copyright (c) 2023 PaddlePaddle Authors. All Rights Reserve.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Pre-encoded rec labels. The labels of a label file, LMDB or shard dataset
+are encoded once into char indices (int32) and stored next to it, in
+<prefix>.<key>.npz where key is the label_cache_key of the encoder, a hash
+of the char dict, with a stamp of the labels it was built from. The
+dataset passes the indices of a sample in
+data['label_ids'] and the label encode op uses them instead of looking up
+every char again.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+
+__all__ = [
+    'find_label_encoder', 'load_label_ids', 'content_stamp', 'stat_stamp',
+    'LabelIds'
+]
+
+# label encode ops reading data['label_ids']
+SUPPORTED_ENCODERS = ['CTCLabelEncode', 'AttnLabelEncode']
+
+
+def find_label_encoder(ops):
+    for op in ops:
+        if type(op).__name__ in SUPPORTED_ENCODERS:
+            return op
+    return None
+
+
+def content_stamp(paths):
+    """
+    md5 of the contents of the files in paths, for label files.
+    """
+    md5 = hashlib.md5()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                md5.update(chunk)
+    return md5.hexdigest()
+
+
+def stat_stamp(paths):
+    """
+    Size and modification time of the files in paths, for files too large
+    to hash like the data.mdb of an LMDB.
+    """
+    stats = [os.stat(path) for path in paths]
+    return ';'.join('{}:{}'.format(st.st_size, st.st_mtime_ns)
+                    for st in stats)
+
+
+class LabelIds(object):
+    """
+    Char indices of every label, flat ids with the offsets of each label.
+    """
+
+    def __init__(self, ids, offsets):
+        self.ids = ids
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.ids[self.offsets[i]:self.offsets[i + 1]]
+
+
+def build_label_ids(labels, encoder):
+    """
+    args:
+        labels: iterable of label strings, None for an unreadable label
+        encoder: label encode op, see BaseRecLabelEncode.encode_raw
+    """
+    ids, offsets = [], [0]
+    for label in labels:
+        if label is not None:
+            ids.extend(encoder.encode_raw(label))
+        offsets.append(len(ids))
+    return LabelIds(
+        np.array(
+            ids, dtype=np.int32), np.array(
+                offsets, dtype=np.int64))
+
+
+def load_label_ids(prefix, encoder, num_labels, labels_fn, logger,
+                   source_stamp):
+    """
+    Load the label ids stored for the dict of encoder, or build and store
+    them. A cache written for another dict, number of labels or source stamp
+    is not used.
+    args:
+        prefix(str): path of the cache without .<key>.npz
+        num_labels(int): number of labels of the source
+        labels_fn: returns an iterable of the labels of the source
+        source_stamp(str): changes when the labels change, see content_stamp
+            and stat_stamp
+    """
+    key = encoder.label_cache_key()
+    path = '{}.{}.npz'.format(prefix, key)
+    if os.path.exists(path):
+        try:
+            with np.load(path) as cache:
+                if 'source_stamp' in cache.files and str(cache[
+                        'key']) == key and int(cache[
+                            'num_labels']) == num_labels and str(cache[
+                                'source_stamp']) == source_stamp:
+                    return LabelIds(cache['ids'], cache['offsets'])
+            logger.info("label cache {} is outdated, rebuild it".format(path))
+        except Exception as e:
+            logger.warning("failed to read label cache {}: {}".format(path,
+                                                                      e))
+    label_ids = build_label_ids(labels_fn(), encoder)
+    if len(label_ids) != num_labels:
+        raise ValueError("expected {} labels for {}, got {}".format(
+            num_labels, prefix, len(label_ids)))
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                key=key,
+                num_labels=num_labels,
+                source_stamp=source_stamp,
+                ids=label_ids.ids,
+                offsets=label_ids.offsets)
+        os.replace(tmp_path, path)
+        logger.info("saved label cache of {} labels to {}".format(num_labels,
+                                                                  path))
+    except (IOError, OSError) as e:
+        logger.warning("failed to save label cache {}: {}".format(path, e))
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return label_ids
@@ -21,6 +21,8 @@ import six
 from PIL import Image
 
 from .imaug import transform, create_operators
+from .label_cache import find_label_encoder, load_label_ids, stat_stamp
+from ppocr.utils.lmdb_index import load_index
 
 
 class LMDBDataSet(Dataset):
@@ -33,54 +35,145 @@ class LMDBDataSet(Dataset):
         batch_size = loader_config['batch_size_per_card']
         data_dir = dataset_config['data_dir']
         self.do_shuffle = loader_config['shuffle']
+        self.readahead = dataset_config.get('readahead', False)
+        self.max_readers = dataset_config.get('max_readers', 32)
+        self._txns = {}
+        self._txn_pid = None
 
         self.lmdb_sets = self.load_hierarchical_lmdb_dataset(data_dir)
         logger.info("Initialize indexs of datasets:%s" % data_dir)
         self.data_idx_order_list = self.dataset_traversal()
+        self.sample_info_list = self.load_sample_info()
         if self.do_shuffle:
-            np.random.shuffle(self.data_idx_order_list)
+            order = np.random.permutation(len(self.data_idx_order_list))
+            self.data_idx_order_list = self.data_idx_order_list[order]
+            if self.sample_info_list is not None:
+                self.sample_info_list = self.sample_info_list[order]
         self.ops = create_operators(dataset_config['transforms'], global_config)
         self.ext_op_transform_idx = dataset_config.get("ext_op_transform_idx",
                                                        1)
 
         ratio_list = dataset_config.get("ratio_list", [1.0])
         self.need_reset = True in [x < 1 for x in ratio_list]
+        self.label_ids = None
+        if dataset_config.get('label_cache', False):
+            self.label_ids = self.load_label_ids(logger)
 
     def load_hierarchical_lmdb_dataset(self, data_dir):
+        """
+        Find the LMDBs under data_dir and their sample numbers. The envs are
+        closed again, every process opens its own on first use, see get_txn.
+        """
         lmdb_sets = {}
         dataset_idx = 0
         for dirpath, dirnames, filenames in os.walk(data_dir + '/'):
             if not dirnames:
                 env = lmdb.open(
                     dirpath,
-                    max_readers=32,
                     readonly=True,
                     lock=False,
                     readahead=False,
                     meminit=False)
-                txn = env.begin(write=False)
-                num_samples = int(txn.get('num-samples'.encode()))
-                lmdb_sets[dataset_idx] = {"dirpath":dirpath, "env":env, \
-                    "txn":txn, "num_samples":num_samples}
+                with env.begin(write=False) as txn:
+                    num_samples = int(txn.get('num-samples'.encode()))
+                env.close()
+                lmdb_sets[dataset_idx] = {
+                    "dirpath": dirpath,
+                    "num_samples": num_samples
+                }
                 dataset_idx += 1
         return lmdb_sets
 
+    def get_txn(self, lmdb_idx):
+        """
+        Read txn of an LMDB, opened lazily per process: handles inherited
+        through a fork must not be used by the DataLoader workers.
+        """
+        if self._txn_pid != os.getpid():
+            self._txn_pid = os.getpid()
+            self._txns = {}
+        if lmdb_idx not in self._txns:
+            env = lmdb.open(
+                self.lmdb_sets[lmdb_idx]['dirpath'],
+                max_readers=self.max_readers,
+                readonly=True,
+                lock=False,
+                readahead=self.readahead,
+                meminit=False)
+            self._txns[lmdb_idx] = (env, env.begin(write=False))
+        return self._txns[lmdb_idx][1]
+
+    def load_label_ids(self, logger):
+        """
+        Pre-encoded labels of every LMDB, see ppocr/data/label_cache.py.
+        """
+        encoder = find_label_encoder(self.ops)
+        if encoder is None:
+            logger.warning(
+                "label_cache is set but no label encode op supports it")
+            return None
+        label_ids = {}
+        for lno, lmdb_set in self.lmdb_sets.items():
+
+            def labels_fn(lmdb_set=lmdb_set):
+                env = lmdb.open(
+                    lmdb_set['dirpath'],
+                    readonly=True,
+                    lock=False,
+                    readahead=True,
+                    meminit=False)
+                with env.begin(write=False) as txn:
+                    for i in range(1, lmdb_set['num_samples'] + 1):
+                        label = txn.get('label-%09d'.encode() % i)
+                        yield label.decode('utf-8') if label is not None else None
+                env.close()
+
+            label_ids[lno] = load_label_ids(
+                os.path.join(lmdb_set['dirpath'], 'label_ids'), encoder,
+                lmdb_set['num_samples'], labels_fn, logger,
+                stat_stamp([os.path.join(lmdb_set['dirpath'], 'data.mdb')]))
+        return label_ids
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_txns'] = {}
+        state['_txn_pid'] = None
+        return state
+
     def dataset_traversal(self):
-        lmdb_num = len(self.lmdb_sets)
-        total_sample_num = 0
-        for lno in range(lmdb_num):
-            total_sample_num += self.lmdb_sets[lno]['num_samples']
-        data_idx_order_list = np.zeros((total_sample_num, 2))
-        beg_idx = 0
-        for lno in range(lmdb_num):
-            tmp_sample_num = self.lmdb_sets[lno]['num_samples']
-            end_idx = beg_idx + tmp_sample_num
-            data_idx_order_list[beg_idx:end_idx, 0] = lno
-            data_idx_order_list[beg_idx:end_idx, 1] \
-                = list(range(tmp_sample_num))
-            data_idx_order_list[beg_idx:end_idx, 1] += 1
-            beg_idx = beg_idx + tmp_sample_num
-        return data_idx_order_list
+        """
+        [lmdb_idx, file_idx] of every sample as int32 array, file_idx
+        counts from 1 like the LMDB keys.
+        """
+        index = [
+            np.stack(
+                [
+                    np.full(
+                        lmdb_set['num_samples'], lno, dtype=np.int32),
+                    np.arange(
+                        1, lmdb_set['num_samples'] + 1, dtype=np.int32)
+                ],
+                axis=1) for lno, lmdb_set in sorted(self.lmdb_sets.items())
+        ]
+        if len(index) == 0:
+            return np.zeros((0, 2), dtype=np.int32)
+        return np.concatenate(index)
+
+    def load_sample_info(self):
+        """
+        [width, height, label_length] of every sample in the order of
+        data_idx_order_list, from the sample_index.npy of every LMDB built
+        by ppocr/utils/lmdb_index.py. None when an LMDB has no index.
+        """
+        info = []
+        for lno, lmdb_set in sorted(self.lmdb_sets.items()):
+            index = load_index(lmdb_set['dirpath'], lmdb_set['num_samples'])
+            if index is None:
+                return None
+            info.append(np.asarray(index))
+        if len(info) == 0:
+            return np.zeros((0, 3), dtype=np.int32)
+        return np.concatenate(info)
 
     def get_img_data(self, value):
         """get_img_data"""
@@ -109,7 +202,7 @@ class LMDBDataSet(Dataset):
             lmdb_idx = int(lmdb_idx)
             file_idx = int(file_idx)
             sample_info = self.get_lmdb_sample_info(
-                self.lmdb_sets[lmdb_idx]['txn'], file_idx)
+                self.get_txn(lmdb_idx), file_idx)
             if sample_info is None:
                 continue
             img, label = sample_info
@@ -131,19 +224,31 @@ class LMDBDataSet(Dataset):
         return imgbuf, label
 
     def __getitem__(self, idx):
+        # (idx, width) from BucketBatchSampler
+        bucket_width = None
+        if isinstance(idx, (tuple, list)):
+            idx, bucket_width = idx
         lmdb_idx, file_idx = self.data_idx_order_list[idx]
         lmdb_idx = int(lmdb_idx)
         file_idx = int(file_idx)
-        sample_info = self.get_lmdb_sample_info(self.lmdb_sets[lmdb_idx]['txn'],
+        sample_info = self.get_lmdb_sample_info(self.get_txn(lmdb_idx),
                                                 file_idx)
-        if sample_info is None:
-            return self.__getitem__(np.random.randint(self.__len__()))
-        img, label = sample_info
-        data = {'image': img, 'label': label}
-        data['ext_data'] = self.get_ext_data()
-        outs = transform(data, self.ops)
+        outs = None
+        if sample_info is not None:
+            img, label = sample_info
+            data = {'image': img, 'label': label}
+            if self.label_ids is not None:
+                data['label_ids'] = (label,
+                                     self.label_ids[lmdb_idx][file_idx - 1])
+            if bucket_width is not None:
+                data['bucket_width'] = bucket_width
+            data['ext_data'] = self.get_ext_data()
+            outs = transform(data, self.ops)
         if outs is None:
-            return self.__getitem__(np.random.randint(self.__len__()))
+            rnd_idx = np.random.randint(self.__len__())
+            if bucket_width is not None:
+                rnd_idx = (rnd_idx, bucket_width)
+            return self.__getitem__(rnd_idx)
         return outs
 
     def __len__(self):
@@ -193,7 +298,7 @@ class LMDBDataSetSR(LMDBDataSet):
         lmdb_idx, file_idx = self.data_idx_order_list[idx]
         lmdb_idx = int(lmdb_idx)
         file_idx = int(file_idx)
-        sample_info = self.get_lmdb_sample_info(self.lmdb_sets[lmdb_idx]['txn'],
+        sample_info = self.get_lmdb_sample_info(self.get_txn(lmdb_idx),
                                                 file_idx)
         if sample_info is None:
             return self.__getitem__(np.random.randint(self.__len__()))
@@ -0,0 +1,205 @@
+# copyright (c) 2023 PaddlePaddle Authors. All Rights Reserve.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import numpy as np
+import os
+import traceback
+from paddle.io import Dataset
+from .imaug import transform, create_operators
+from .label_cache import find_label_encoder, load_label_ids, content_stamp
+from ppocr.utils.shards import ShardReader
+
+
+class ShardDataSet(Dataset):
+    """
+    Dataset of packed shards written by ppocr/utils/shards.py, a drop-in
+    for SimpleDataSet: `data_dir` is a shard dataset directory or a list of
+    them, `ratio_list` samples each of them like the label files of
+    SimpleDataSet.
+    With shuffle, the order is shuffled shard by shard, the shards in a
+    random order and the samples of a shard in a random order, so every
+    worker reads from few memory mapped files at a time. The order changes
+    with every epoch, the sampler of build_dataloader keeps it.
+    """
+
+    def __init__(self, config, mode, logger, seed=None):
+        super(ShardDataSet, self).__init__()
+        self.logger = logger
+        self.mode = mode.lower()
+
+        global_config = config['Global']
+        dataset_config = config[mode]['dataset']
+        loader_config = config[mode]['loader']
+
+        data_dir_list = dataset_config['data_dir']
+        if isinstance(data_dir_list, str):
+            data_dir_list = [data_dir_list]
+        ratio_list = dataset_config.get("ratio_list", 1.0)
+        if isinstance(ratio_list, (float, int)):
+            ratio_list = [float(ratio_list)] * len(data_dir_list)
+        assert len(ratio_list) == len(
+            data_dir_list
+        ), "The length of ratio_list should be the same as the data_dir list."
+
+        self.do_shuffle = loader_config['shuffle']
+        self.seed = seed
+        logger.info("Initialize indexs of shard datasets:%s" % data_dir_list)
+        self.readers = [ShardReader(data_dir) for data_dir in data_dir_list]
+        self.data_idx_order_list = self.dataset_traversal(ratio_list)
+        self.sample_info_list = self.load_sample_info()
+        self.ops = create_operators(dataset_config['transforms'], global_config)
+        self.ext_op_transform_idx = dataset_config.get("ext_op_transform_idx",
+                                                       2)
+        self.need_reset = True in [x < 1 for x in ratio_list] or (
+            self.mode == "train" and self.do_shuffle)
+        self.label_ids = None
+        if dataset_config.get('label_cache', False):
+            self.label_ids = self.load_label_ids()
+
+    def dataset_traversal(self, ratio_list):
+        """
+        Samples as rows of [reader, shard, row], ordered shard by shard.
+        """
+        rng = np.random.RandomState(self.seed)
+        shuffle = self.mode == "train" and self.do_shuffle
+        shards = []
+        for rno, reader in enumerate(self.readers):
+            sizes = reader.shard_sizes()
+            total = sum(sizes)
+            keep = None
+            if ratio_list[rno] < 1.0:
+                keep = np.zeros(total, dtype=bool)
+                keep[rng.choice(
+                    total, round(total * ratio_list[rno]),
+                    replace=False)] = True
+            start = 0
+            for sno, size in enumerate(sizes):
+                rows = np.arange(size)
+                if keep is not None:
+                    rows = rows[keep[start:start + size]]
+                start += size
+                shards.append(
+                    np.stack(
+                        [np.full_like(rows, rno), np.full_like(rows, sno),
+                         rows],
+                        axis=1))
+        if shuffle:
+            for shard in shards:
+                rng.shuffle(shard)
+            shards = [shards[i] for i in rng.permutation(len(shards))]
+        if len(shards) == 0:
+            return np.zeros((0, 3), dtype=np.int64)
+        return np.concatenate(shards).astype(np.int64)
+
+    def load_sample_info(self):
+        """
+        [width, height, label_length] of every sample in the order of
+        data_idx_order_list, None for shards written without sizes.
+        """
+        if any(reader.infos is None for reader in self.readers):
+            return None
+        infos = [info for reader in self.readers for info in reader.infos]
+        if len(infos) == 0:
+            return np.zeros((0, 3), dtype=np.int32)
+        shard_base = np.cumsum([0] + [len(r.infos) for r in self.readers])
+        row_base = np.cumsum([0] + [len(info) for info in infos])
+        order = self.data_idx_order_list
+        rows = row_base[shard_base[order[:, 0]] + order[:, 1]] + order[:, 2]
+        return np.concatenate(infos)[rows]
+
+    def load_label_ids(self):
+        """
+        Pre-encoded labels of every shard dataset, see
+        ppocr/data/label_cache.py.
+        """
+        encoder = find_label_encoder(self.ops)
+        if encoder is None:
+            self.logger.warning(
+                "label_cache is set but no label encode op supports it")
+            return None
+        label_ids = []
+        for reader in self.readers:
+            label_ids.append(
+                load_label_ids(
+                    os.path.join(reader.shard_dir, 'label_ids'), encoder,
+                    len(reader), reader.labels, self.logger,
+                    content_stamp([
+                        os.path.join(reader.shard_dir, name + '.lbl')
+                        for name in reader.names
+                    ])))
+        # first sample of every shard in the label ids of its dataset
+        self.label_row_base = [
+            np.cumsum([0] + reader.shard_sizes()) for reader in self.readers
+        ]
+        return label_ids
+
+    def get_sample(self, idx):
+        rno, sno, row = self.data_idx_order_list[idx]
+        reader = self.readers[rno]
+        file_name, label, image = reader.get(sno, row)
+        img_path = os.path.join(reader.shard_dir, file_name)
+        data = {'img_path': img_path, 'label': label, 'image': image}
+        if self.label_ids is not None:
+            data['label_ids'] = (
+                label,
+                self.label_ids[rno][self.label_row_base[rno][sno] + row])
+        return data
+
+    def get_ext_data(self):
+        ext_data_num = 0
+        for op in self.ops:
+            if hasattr(op, 'ext_data_num'):
+                ext_data_num = getattr(op, 'ext_data_num')
+                break
+        load_data_ops = self.ops[:self.ext_op_transform_idx]
+        ext_data = []
+
+        while len(ext_data) < ext_data_num:
+            data = self.get_sample(np.random.randint(self.__len__()))
+            data = transform(data, load_data_ops)
+            if data is None:
+                continue
+            if 'polys' in data.keys():
+                if data['polys'].shape[1] != 4:
+                    continue
+            ext_data.append(data)
+        return ext_data
+
+    def __getitem__(self, idx):
+        # (idx, width) from BucketBatchSampler
+        bucket_width = None
+        if isinstance(idx, (tuple, list)):
+            idx, bucket_width = idx
+        try:
+            data = self.get_sample(idx)
+            if bucket_width is not None:
+                data['bucket_width'] = bucket_width
+            data['ext_data'] = self.get_ext_data()
+            outs = transform(data, self.ops)
+        except:
+            self.logger.error(
+                "When parsing sample {}, error happened with msg: {}".format(
+                    self.data_idx_order_list[idx].tolist(),
+                    traceback.format_exc()))
+            outs = None
+        if outs is None:
+            # during evaluation, we should fix the idx to get same results for many times of evaluation.
+            rnd_idx = np.random.randint(self.__len__(
+            )) if self.mode == "train" else (idx + 1) % self.__len__()
+            if bucket_width is not None:
+                rnd_idx = (rnd_idx, bucket_width)
+            return self.__getitem__(rnd_idx)
+        return outs
+
+    def __len__(self):
+        return len(self.data_idx_order_list)
@@ -18,6 +18,7 @@ import random
 import traceback
 from paddle.io import Dataset
 from .imaug import transform, create_operators
+from .label_cache import find_label_encoder, load_label_ids, content_stamp
 
 
 class SimpleDataSet(Dataset):
@@ -52,26 +53,68 @@ class SimpleDataSet(Dataset):
         self.ext_op_transform_idx = dataset_config.get("ext_op_transform_idx",
                                                        2)
         self.need_reset = True in [x < 1 for x in ratio_list]
+        self.label_ids = None
+        if dataset_config.get('label_cache', False):
+            self.label_ids = self.load_label_ids(label_file_list)
 
     def get_image_info_list(self, file_list, ratio_list):
         if isinstance(file_list, str):
             file_list = [file_list]
         data_lines = []
+        # [file index, line index] of every line in data_lines
+        data_line_sources = []
         for idx, file in enumerate(file_list):
             with open(file, "rb") as f:
                 lines = f.readlines()
+                line_ids = list(range(len(lines)))
                 if self.mode == "train" or ratio_list[idx] < 1.0:
                     random.seed(self.seed)
-                    lines = random.sample(lines,
-                                          round(len(lines) * ratio_list[idx]))
-                data_lines.extend(lines)
+                    line_ids = random.sample(
+                        line_ids, round(len(lines) * ratio_list[idx]))
+                data_lines.extend([lines[i] for i in line_ids])
+                data_line_sources.append(
+                    np.stack(
+                        [np.full(len(line_ids), idx), np.array(line_ids)],
+                        axis=1).astype(np.int64).reshape(-1, 2))
+        self.data_line_sources = np.concatenate(data_line_sources)
         return data_lines
 
     def shuffle_data_random(self):
+        order = list(range(len(self.data_lines)))
         random.seed(self.seed)
-        random.shuffle(self.data_lines)
+        random.shuffle(order)
+        self.data_lines = [self.data_lines[i] for i in order]
+        self.data_line_sources = self.data_line_sources[order]
         return
 
+    def load_label_ids(self, file_list):
+        """
+        Pre-encoded labels of every label file, see ppocr/data/label_cache.py.
+        """
+        encoder = find_label_encoder(self.ops)
+        if encoder is None:
+            self.logger.warning(
+                "label_cache is set but no label encode op supports it")
+            return None
+        if isinstance(file_list, str):
+            file_list = [file_list]
+        label_ids = []
+        for file in file_list:
+            with open(file, "rb") as f:
+                lines = f.readlines()
+
+            def labels_fn(lines=lines):
+                for line in lines:
+                    substr = line.decode('utf-8').strip("\n").split(
+                        self.delimiter)
+                    yield substr[1] if len(substr) > 1 else None
+
+            label_ids.append(
+                load_label_ids(file + '.label_ids', encoder,
+                               len(lines), labels_fn, self.logger,
+                               content_stamp([file])))
+        return label_ids
+
     def _try_parse_filename_list(self, file_name):
         # multiple images -> one gt label
         if len(file_name) > 0 and file_name[0] == "[":
@@ -128,6 +171,9 @@ class SimpleDataSet(Dataset):
             label = substr[1]
             img_path = os.path.join(self.data_dir, file_name)
             data = {'img_path': img_path, 'label': label}
+            if self.label_ids is not None:
+                fno, lno = self.data_line_sources[file_idx]
+                data['label_ids'] = (label, self.label_ids[fno][lno])
             if not os.path.exists(img_path):
                 raise Exception("{} does not exist!".format(img_path))
             with open(data['img_path'], 'rb') as f:
@@ -39,6 +39,7 @@ class DBPostProcess(object):
                  use_dilation=False,
                  score_mode="fast",
                  box_type='quad',
+                 use_vectorized=False,
                  **kwargs):
         self.thresh = thresh
         self.box_thresh = box_thresh
@@ -47,6 +48,7 @@ class DBPostProcess(object):
         self.min_size = 3
         self.score_mode = score_mode
         self.box_type = box_type
+        self.use_vectorized = use_vectorized
         assert score_mode in [
             "slow", "fast"
         ], "Score mode must be in [slow, fast] but got: {}".format(score_mode)
@@ -148,6 +150,132 @@ class DBPostProcess(object):
             scores.append(score)
         return np.array(boxes, dtype="int32"), scores
 
+    def boxes_from_bitmap_vectorized(self, pred, _bitmap, dest_width,
+                                     dest_height):
+        '''
+        Vectorized boxes_from_bitmap for box_type 'quad' and score_mode
+        'fast'. All candidates are scored at once through a label map and
+        a bincount of the probability map, and the unclip of each
+        rectangle is computed in closed form: a rectangle of size (w, h)
+        offset by d with round joins has the min-area rect (w + 2d, h + 2d).
+        The boxes match boxes_from_bitmap within about one pixel.
+        '''
+        bitmap = _bitmap
+        height, width = bitmap.shape
+
+        outs = cv2.findContours((bitmap * 255).astype(np.uint8), cv2.RETR_LIST,
+                                cv2.CHAIN_APPROX_SIMPLE)
+        if len(outs) == 3:
+            contours = outs[1]
+        else:
+            contours = outs[0]
+        contours = contours[:self.max_candidates]
+        if len(contours) == 0:
+            return np.zeros((0, 4, 2), dtype="int32"), []
+
+        rects = np.array(
+            [[*r[0], *r[1], r[2]] for r in map(cv2.minAreaRect, contours)],
+            dtype=np.float64)
+        rects = rects[rects[:, 2:4].min(axis=1) >= self.min_size]
+        if len(rects) == 0:
+            return np.zeros((0, 4, 2), dtype="int32"), []
+
+        points = self._order_rect_points(self._rect_points(rects))
+        scores = self._boxes_score_fast(pred, points)
+        keep = scores >= self.box_thresh
+        rects, scores = rects[keep], scores[keep]
+
+        # closed-form unclip: distance = area * unclip_ratio / perimeter
+        w, h = rects[:, 2], rects[:, 3]
+        distance = w * h * self.unclip_ratio / (2 * (w + h))
+        rects[:, 2] += 2 * distance
+        rects[:, 3] += 2 * distance
+        keep = rects[:, 2:4].min(axis=1) >= self.min_size + 2
+        rects, scores = rects[keep], scores[keep]
+
+        boxes = self._order_rect_points(self._rect_points(rects))
+        boxes[..., 0] = np.clip(
+            np.round(boxes[..., 0] / width * dest_width), 0, dest_width)
+        boxes[..., 1] = np.clip(
+            np.round(boxes[..., 1] / height * dest_height), 0, dest_height)
+        return boxes.astype("int32"), scores.tolist()
+
+    def _rect_points(self, rects):
+        '''
+        cv2.boxPoints for a batch of rects [N, 5] (cx, cy, w, h, angle)
+        '''
+        cx, cy, w, h = rects[:, 0], rects[:, 1], rects[:, 2], rects[:, 3]
+        angle = rects[:, 4] * np.pi / 180.
+        b = np.cos(angle) * 0.5
+        a = np.sin(angle) * 0.5
+        pts = np.empty((len(rects), 4, 2), dtype=np.float64)
+        pts[:, 0, 0] = cx - a * h - b * w
+        pts[:, 0, 1] = cy + b * h - a * w
+        pts[:, 1, 0] = cx + a * h - b * w
+        pts[:, 1, 1] = cy - b * h - a * w
+        pts[:, 2, 0] = 2 * cx - pts[:, 0, 0]
+        pts[:, 2, 1] = 2 * cy - pts[:, 0, 1]
+        pts[:, 3, 0] = 2 * cx - pts[:, 1, 0]
+        pts[:, 3, 1] = 2 * cy - pts[:, 1, 1]
+        return pts.astype(np.float32)
+
+    def _order_rect_points(self, pts):
+        '''
+        The point order of get_mini_boxes for a batch of boxes [N, 4, 2]
+        '''
+        order = np.argsort(pts[:, :, 0], axis=1, kind='stable')
+        pts = np.take_along_axis(pts, order[:, :, None], axis=1)
+        left_swap = pts[:, 1, 1] <= pts[:, 0, 1]
+        right_swap = pts[:, 3, 1] <= pts[:, 2, 1]
+        idx = np.empty((len(pts), 4), dtype=np.int64)
+        idx[:, 0] = np.where(left_swap, 1, 0)
+        idx[:, 3] = np.where(left_swap, 0, 1)
+        idx[:, 1] = np.where(right_swap, 3, 2)
+        idx[:, 2] = np.where(right_swap, 2, 3)
+        return np.take_along_axis(pts, idx[:, :, None], axis=1)
+
+    def _boxes_score_fast(self, bitmap, boxes):
+        '''
+        box_score_fast for a batch of boxes [N, 4, 2]. The boxes are painted
+        into a label map once front to back and once back to front, the
+        mean score of every label is a bincount over the map. Boxes that
+        overlap another box are scored one by one with box_score_fast.
+        '''
+        num = len(boxes)
+        if num == 0:
+            return np.zeros((0, ), dtype=np.float64)
+        h, w = bitmap.shape[:2]
+        int_boxes = boxes.astype("int32")
+        label_fwd = np.zeros((h, w), dtype=np.int32)
+        label_bwd = np.zeros((h, w), dtype=np.int32)
+        for i in range(num):
+            cv2.fillPoly(label_fwd, int_boxes[i:i + 1], i + 1)
+            cv2.fillPoly(label_bwd, int_boxes[num - 1 - i:num - i], num - i)
+
+        # both maps cover the same pixels, only look at the painted ones
+        support = np.flatnonzero(label_fwd)
+        label_fwd = label_fwd.ravel()[support]
+        label_bwd = label_bwd.ravel()[support]
+        counts = np.bincount(label_fwd, minlength=num + 1)[1:]
+        sums = np.bincount(
+            label_fwd, weights=bitmap.ravel()[support],
+            minlength=num + 1)[1:]
+        scores = sums / np.maximum(counts, 1)
+
+        overlap = label_fwd != label_bwd
+        redo = np.zeros((num + 1, ), dtype=bool)
+        redo[label_fwd[overlap]] = True
+        redo[label_bwd[overlap]] = True
+        redo = redo[1:]
+        # a box fully covered by others can leave no mismatching pixel
+        xs, ys = int_boxes[:, :, 0], int_boxes[:, :, 1]
+        areas = np.abs((xs * np.roll(ys, -1, axis=1) - ys * np.roll(
+            xs, -1, axis=1)).sum(axis=1)) / 2
+        redo |= counts < areas
+        for i in np.nonzero(redo)[0]:
+            scores[i] = self.box_score_fast(bitmap, boxes[i])
+        return scores
+
     def unclip(self, box, unclip_ratio):
         poly = Polygon(box)
         distance = poly.area * unclip_ratio / poly.length
@@ -237,8 +365,12 @@ class DBPostProcess(object):
                 boxes, scores = self.polygons_from_bitmap(pred[batch_index],
                                                           mask, src_w, src_h)
             elif self.box_type == 'quad':
-                boxes, scores = self.boxes_from_bitmap(pred[batch_index], mask,
-                                                       src_w, src_h)
+                if self.use_vectorized and self.score_mode == "fast":
+                    boxes, scores = self.boxes_from_bitmap_vectorized(
+                        pred[batch_index], mask, src_w, src_h)
+                else:
+                    boxes, scores = self.boxes_from_bitmap(
+                        pred[batch_index], mask, src_w, src_h)
             else:
                 raise ValueError("box_type can only be one of ['quad', 'poly']")
 
@@ -257,6 +389,7 @@ class DistillationDBPostProcess(object):
                  use_dilation=False,
                  score_mode="fast",
                  box_type='quad',
+                 use_vectorized=False,
                  **kwargs):
         self.model_name = model_name
         self.key = key
@@ -267,7 +400,8 @@ class DistillationDBPostProcess(object):
             unclip_ratio=unclip_ratio,
             use_dilation=use_dilation,
             score_mode=score_mode,
-            box_type=box_type)
+            box_type=box_type,
+            use_vectorized=use_vectorized)
 
     def __call__(self, predicts, shape_list):
         results = {}
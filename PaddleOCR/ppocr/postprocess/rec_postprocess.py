@@ -157,10 +157,16 @@ class BaseRecLabelDecode(object):
 class CTCLabelDecode(BaseRecLabelDecode):
     """ Convert between text-label and text-index """
 
-    def __init__(self, character_dict_path=None, use_space_char=False,
+    def __init__(self,
+                 character_dict_path=None,
+                 use_space_char=False,
+                 return_char_conf=False,
                  **kwargs):
         super(CTCLabelDecode, self).__init__(character_dict_path,
                                              use_space_char)
+        self.return_char_conf = return_char_conf
+        # lookup table from index to character for the vectorized decode
+        self.character_table = np.array(self.character, dtype=object)
 
     def __call__(self, preds, label=None, return_word_box=False, *args, **kwargs):
         if isinstance(preds, tuple) or isinstance(preds, list):
@@ -168,8 +174,13 @@ class CTCLabelDecode(BaseRecLabelDecode):
         if isinstance(preds, paddle.Tensor):
             preds = preds.numpy()
         preds_idx = preds.argmax(axis=2)
-        preds_prob = preds.max(axis=2)
-        text = self.decode(preds_idx, preds_prob, is_remove_duplicate=True, return_word_box=return_word_box)
+        # gather the max prob at the argmax instead of a second full pass
+        preds_prob = np.take_along_axis(
+            preds, preds_idx[:, :, np.newaxis], axis=2)[:, :, 0]
+        if return_word_box:
+            text = self.decode(preds_idx, preds_prob, is_remove_duplicate=True, return_word_box=return_word_box)
+        else:
+            text = self.greedy_decode(preds_idx, preds_prob)
         if return_word_box:
             for rec_idx, rec in enumerate(text):
                 wh_ratio = kwargs['wh_ratio_list'][rec_idx]
@@ -180,6 +191,41 @@ class CTCLabelDecode(BaseRecLabelDecode):
         label = self.decode(label)
         return text, label
 
+    def greedy_decode(self, text_index, text_prob):
+        """
+        Vectorized version of decode with is_remove_duplicate=True.
+        The duplicate and ignored-token masks are built for the whole batch
+        at once and indices are mapped to characters through a lookup table.
+        If return_char_conf is set, the confidence of every decoded
+        character is appended to each result.
+        """
+        selection = np.ones(text_index.shape, dtype=bool)
+        selection[:, 1:] = text_index[:, 1:] != text_index[:, :-1]
+        for ignored_token in self.get_ignored_tokens():
+            selection &= text_index != ignored_token
+        lengths = selection.sum(axis=1)
+        conf = np.where(selection, text_prob, 0).sum(axis=1) / np.maximum(
+            lengths, 1)
+
+        # row-major boolean indexing keeps the characters grouped by sample
+        offsets = np.cumsum(lengths)[:-1]
+        char_list = np.split(self.character_table[text_index[selection]],
+                             offsets)
+        if self.return_char_conf:
+            char_conf_list = np.split(text_prob[selection], offsets)
+
+        result_list = []
+        for batch_idx in range(len(text_index)):
+            text = ''.join(char_list[batch_idx])
+            if self.reverse:  # for arabic rec
+                text = self.pred_reverse(text)
+            if self.return_char_conf:
+                result_list.append((text, float(conf[batch_idx]),
+                                    char_conf_list[batch_idx].tolist()))
+            else:
+                result_list.append((text, float(conf[batch_idx])))
+        return result_list
+
     def add_special_char(self, dict_character):
         dict_character = ['blank'] + dict_character
         return dict_character
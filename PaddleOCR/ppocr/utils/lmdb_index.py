@@ -0,0 +1,94 @@
+# copyright (c) 2023 PaddlePaddle Authors. All Rights Reserve.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Sample index of LMDB datasets: width, height and label length of every
+sample, stored as npy int32 [num_samples, 3] in sample_index.npy next to
+data.mdb, so samplers can use the sizes without decoding images.
+
+Build it once for all LMDBs under a data dir with
+    python3 ppocr/utils/lmdb_index.py --data_dir ./train_data/data_lmdb_release/training/
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(__dir__, '../..')))
+
+from ppocr.utils.utility import image_size
+
+INDEX_FILE = 'sample_index.npy'
+
+
+def build_index(txn, num_samples):
+    """
+    Sample index of an LMDB in the layout of LMDBDataSet, keys
+    'image-%09d' and 'label-%09d' counted from 1.
+    """
+    index = np.zeros((num_samples, 3), dtype=np.int32)
+    for i in range(num_samples):
+        label = txn.get('label-%09d'.encode() % (i + 1))
+        if label is None:
+            continue
+        width, height = image_size(txn.get('image-%09d'.encode() % (i + 1)))
+        index[i] = width, height, len(label.decode('utf-8'))
+    return index
+
+
+def save_index(dirpath, index):
+    with open(os.path.join(dirpath, INDEX_FILE), 'wb') as f:
+        np.save(f, index)
+
+
+def load_index(dirpath, num_samples):
+    """
+    The sample index of the LMDB in dirpath, None if it was not built or
+    does not match the number of samples.
+    """
+    path = os.path.join(dirpath, INDEX_FILE)
+    if not os.path.exists(path):
+        return None
+    index = np.load(path, mmap_mode='r')
+    if index.shape != (num_samples, 3):
+        return None
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--data_dir',
+        type=str,
+        required=True,
+        help='Directory holding one or more LMDBs, as data_dir of LMDBDataSet')
+    args = parser.parse_args()
+
+    import lmdb
+    for dirpath, dirnames, filenames in os.walk(args.data_dir + '/'):
+        if dirnames:
+            continue
+        env = lmdb.open(
+            dirpath, readonly=True, lock=False, readahead=True, meminit=False)
+        with env.begin(write=False) as txn:
+            num_samples = int(txn.get('num-samples'.encode()))
+            save_index(dirpath, build_index(txn, num_samples))
+        env.close()
+        print("indexed {} samples of {}".format(num_samples, dirpath))
+
+
+if __name__ == "__main__":
+    main()
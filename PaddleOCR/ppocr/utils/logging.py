@@ -20,11 +20,20 @@ import os
 import sys
 import logging
 import functools
-import paddle.distributed as dist
 
 logger_initialized = {}
 
 
+def _get_rank():
+    # paddle.distributed.get_rank() of the default group is the trainer id
+    # set by the launcher, read it directly so that getting a logger does
+    # not import paddle
+    if 'paddle' in sys.modules:
+        import paddle.distributed as dist
+        return dist.get_rank()
+    return int(os.getenv('PADDLE_TRAINER_ID', '0'))
+
+
 @functools.lru_cache()
 def get_logger(name='ppocr', log_file=None, log_level=logging.DEBUG):
     """Initialize and get a logger by name.
@@ -56,13 +65,13 @@ def get_logger(name='ppocr', log_file=None, log_level=logging.DEBUG):
     stream_handler = logging.StreamHandler(stream=sys.stdout)
     stream_handler.setFormatter(formatter)
     logger.addHandler(stream_handler)
-    if log_file is not None and dist.get_rank() == 0:
+    if log_file is not None and _get_rank() == 0:
         log_file_folder = os.path.split(log_file)[0]
         os.makedirs(log_file_folder, exist_ok=True)
         file_handler = logging.FileHandler(log_file, 'a')
         file_handler.setFormatter(formatter)
         logger.addHandler(file_handler)
-    if dist.get_rank() == 0:
+    if _get_rank() == 0:
         logger.setLevel(log_level)
     else:
         logger.setLevel(logging.ERROR)
@@ -0,0 +1,272 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Content addressed caches for OCR results.
+Keys are digests of the decoded pixels plus the options that change the
+result, values are the python results of PaddleOCR.ocr (one page) or of
+the recognizer (one crop).
+"""
+
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+__all__ = [
+    'image_key', 'args_fingerprint', 'LRUCache', 'DiskCache',
+    'OCRResultCache', 'CachedTextRecognizer'
+]
+
+# args that change the result of det + cls + rec
+CACHE_KEY_ARGS = [
+    'det_algorithm', 'det_model_dir', 'det_limit_side_len', 'det_limit_type',
+    'det_box_type', 'det_db_thresh', 'det_db_box_thresh',
+    'det_db_unclip_ratio', 'use_dilation', 'det_db_score_mode',
+    'det_db_vectorized', 'det_tile_size', 'det_tile_overlap',
+    'det_tile_nms_thresh', 'rec_algorithm', 'rec_model_dir', 'rec_image_shape',
+    'rec_image_inverse', 'rec_char_dict_path', 'use_space_char',
+    'max_text_length', 'return_word_box', 'cls_model_dir', 'cls_image_shape',
+    'label_list', 'cls_thresh', 'drop_score', 'use_angle_cls',
+    'multi_column_order', 'reading_order_overlap_thresh',
+    'legacy_reading_order'
+]
+
+_MISS = object()
+
+
+def image_key(img, *extra):
+    """
+    Digest of the pixels, shape and dtype of img and of the reprs of extra.
+    """
+    img = np.ascontiguousarray(img)
+    h = hashlib.blake2b(digest_size=20)
+    h.update(repr((img.shape, img.dtype.str) + extra).encode('utf-8'))
+    h.update(img.data)
+    return h.hexdigest()
+
+
+def args_fingerprint(args):
+    """
+    Stable string of the args listed in CACHE_KEY_ARGS, so that results of
+    different models or thresholds never share a key.
+    """
+    return repr([(name, getattr(args, name, None)) for name in CACHE_KEY_ARGS])
+
+
+class LRUCache(object):
+    """
+    Thread safe in-memory cache holding at most `capacity` items.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key, _MISS)
+            if value is _MISS:
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskCache(object):
+    """
+    sqlite backed cache whose total payload is kept under `max_bytes` by
+    evicting the least recently used entries. Safe to share between
+    threads and processes.
+    """
+
+    def __init__(self, path, max_bytes):
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS cache ('
+                           'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                           'size INTEGER NOT NULL, atime REAL NOT NULL)')
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS cache_atime ON cache (atime)')
+
+    def get(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM cache WHERE key = ?',
+                                     (key, )).fetchone()
+            if row is None:
+                return default
+            self._conn.execute('UPDATE cache SET atime = ? WHERE key = ?',
+                               (time.time(), key))
+        return pickle.loads(row[0])
+
+    def put(self, key, value):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)',
+                (key, sqlite3.Binary(blob), len(blob), time.time()))
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM cache').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute('SELECT key, size FROM cache ORDER BY atime')
+        evict = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evict.append((key, ))
+            total -= size
+        self._conn.executemany('DELETE FROM cache WHERE key = ?', evict)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM cache')
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM cache').fetchone()[
+                0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class OCRResultCache(object):
+    """
+    Two tier cache: a bounded LRU in memory in front of an optional
+    DiskCache. Disk hits are promoted to the memory tier.
+    args:
+        capacity(int): max items kept in memory
+        disk_dir(str): directory of the sqlite file, None disables the disk tier
+        disk_max_mb(int): size limit of the disk tier in MB
+        name(str): file name of the disk tier
+    """
+
+    def __init__(self, capacity, disk_dir=None, disk_max_mb=512,
+                 name='ocr_cache'):
+        self.memory = LRUCache(capacity)
+        self.disk = None
+        if disk_dir:
+            self.disk = DiskCache(
+                os.path.join(disk_dir, name + '.sqlite'),
+                disk_max_mb * 1024 * 1024)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        value = self.memory.get(key, _MISS)
+        if value is _MISS and self.disk is not None:
+            value = self.disk.get(key, _MISS)
+            if value is not _MISS:
+                self.disk_hits += 1
+                self.memory.put(key, value)
+        if value is _MISS:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+        self.hits = self.disk_hits = self.misses = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total > 0 else 0.,
+            'memory_items': len(self.memory),
+            'disk_items': len(self.disk) if self.disk is not None else 0
+        }
+
+
+class CachedTextRecognizer(object):
+    """
+    Wraps a TextRecognizer so crops seen before (repeated headers, footers,
+    stamps) are answered from `cache` and only new crops are recognized.
+    Other attributes are forwarded to the wrapped recognizer. `fingerprint`
+    is mixed into the keys, pass args_fingerprint(args) when the cache has a
+    disk tier shared by different models.
+    """
+
+    def __init__(self, text_recognizer, cache, fingerprint=''):
+        self.text_recognizer = text_recognizer
+        self.cache = cache
+        self.fingerprint = fingerprint
+
+    def __getattr__(self, name):
+        return getattr(self.text_recognizer, name)
+
+    def __call__(self, img_list):
+        keys = [image_key(img, self.fingerprint) for img in img_list]
+        rec_res = [self.cache.get(key, _MISS) for key in keys]
+        # identical crops of the same call are recognized once
+        miss_index = OrderedDict()
+        for i, res in enumerate(rec_res):
+            if res is _MISS:
+                miss_index.setdefault(keys[i], i)
+        elapse = 0
+        if len(miss_index) > 0:
+            miss_res, elapse = self.text_recognizer(
+                [img_list[i] for i in miss_index.values()])
+            miss_res = dict(zip(miss_index.keys(), miss_res))
+            for key, res in miss_res.items():
+                self.cache.put(key, res)
+            rec_res = [
+                miss_res[key] if res is _MISS else res
+                for key, res in zip(keys, rec_res)
+            ]
+        return rec_res, elapse
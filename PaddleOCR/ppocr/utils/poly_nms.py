@@ -127,13 +127,14 @@ def poly_iou(poly_det, poly_gt):
 def poly_nms(polygons, threshold):
     assert isinstance(polygons, list)
 
-    polygons = np.array(sorted(polygons, key=lambda x: x[-1]))
+    # a list, polygons may have different point numbers
+    polygons = sorted(polygons, key=lambda x: x[-1])
 
     keep_poly = []
-    index = [i for i in range(polygons.shape[0])]
+    index = [i for i in range(len(polygons))]
 
     while len(index) > 0:
-        keep_poly.append(polygons[index[-1]].tolist())
+        keep_poly.append([float(v) for v in polygons[index[-1]]])
         A = polygons[index[-1]][:-1]
         index = np.delete(index, -1)
         iou_list = np.zeros((len(index), ))
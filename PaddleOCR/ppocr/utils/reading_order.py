@@ -0,0 +1,186 @@
+# copyright (c) 2023 PaddlePaddle Authors. All Rights Reserve.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Reading order of detected text boxes.
+Boxes are clustered into text lines by vertical overlap with numpy and
+ordered top to bottom, left to right, in O(n log n). The rule of the former
+sorted_boxes is kept as a legacy option.
+Multi-column pages are first split into columns by recursive XY-cut on the
+whitespace between the boxes.
+"""
+
+import numpy as np
+
+__all__ = ['reading_order', 'group_lines']
+
+
+def _box_points(dt_boxes):
+    """
+    First point and axis aligned bounds [x_min, y_min, x_max, y_max] of
+    every box, boxes may be quads or polygons with different point numbers.
+    """
+    if isinstance(dt_boxes, np.ndarray) and dt_boxes.ndim == 3:
+        first = dt_boxes[:, 0, :].astype(np.float64)
+        bounds = np.concatenate(
+            [dt_boxes.min(axis=1), dt_boxes.max(axis=1)],
+            axis=1).astype(np.float64)
+        return first, bounds
+    boxes = [np.asarray(box, dtype=np.float64).reshape(-1, 2) for box in dt_boxes]
+    first = np.array([box[0] for box in boxes]).reshape(-1, 2)
+    bounds = np.array(
+        [np.concatenate([box.min(axis=0), box.max(axis=0)])
+         for box in boxes]).reshape(-1, 4)
+    return first, bounds
+
+
+def group_lines(first,
+                bounds,
+                overlap_thresh=0.4,
+                legacy=False,
+                y_thresh=10):
+    """
+    Order boxes into text lines, top to bottom and left to right.
+    Boxes are sorted by their top. A box starts a new line when its top is
+    at least overlap_thresh of the median box height below the top of the
+    previous box, or when it overlaps the lowest bottom reached so far by
+    less than overlap_thresh of its height. The boxes of a line are ordered
+    by x.
+    With legacy, the rule of the former sorted_boxes is applied instead:
+    boxes are sorted by the first point, y then x, and a box moves before
+    its preceding boxes while their first points are less than y_thresh
+    apart in y and it is further left.
+    args:
+        first(ndarray): first point of each box, [N, 2]
+        bounds(ndarray): [N, 4] x_min, y_min, x_max, y_max of each box
+    return:
+        the order as indices [N]
+    """
+    if legacy:
+        return _legacy_order(first, y_thresh)
+    order = np.lexsort((first[:, 0], bounds[:, 1]))
+    if len(order) < 2:
+        return order
+    top, bottom = bounds[order, 1], bounds[order, 3]
+    height = np.maximum(bottom - top, 1e-6)
+    reach = np.maximum.accumulate(bottom)
+    new_line = (np.diff(top) >= overlap_thresh * np.median(height)) | (
+        reach[:-1] - top[1:] < overlap_thresh * height[1:])
+    line_id = np.concatenate([[0], np.cumsum(new_line)])
+    return order[np.lexsort((first[order, 0], line_id))]
+
+
+def _legacy_order(first, y_thresh):
+    order = np.lexsort((first[:, 0], first[:, 1]))
+    xs, ys = first[order, 0].tolist(), first[order, 1].tolist()
+    idx = order.tolist()
+    for i in range(1, len(idx)):
+        j = i
+        while j > 0 and abs(ys[j] - ys[j - 1]) < y_thresh and \
+                xs[j] < xs[j - 1]:
+            xs[j - 1], xs[j] = xs[j], xs[j - 1]
+            ys[j - 1], ys[j] = ys[j], ys[j - 1]
+            idx[j - 1], idx[j] = idx[j], idx[j - 1]
+            j -= 1
+    return np.array(idx, dtype=np.int64)
+
+
+def _gaps(low, high, min_gap):
+    """
+    Whitespace of at least min_gap between the intervals [low, high].
+    return:
+        the sort order of low, the positions in it where a gap starts and
+        the gap sizes
+    """
+    order = np.argsort(low, kind='stable')
+    reach = np.maximum.accumulate(high[order])
+    gap = low[order][1:] - reach[:-1]
+    pos = np.where(gap >= min_gap)[0]
+    return order, pos, gap[pos]
+
+
+def _has_column_gap(bounds, idx, min_column_gap):
+    if len(idx) < 2:
+        return False
+    _, pos, _ = _gaps(bounds[idx, 0], bounds[idx, 2], min_column_gap)
+    return len(pos) > 0
+
+
+def _xy_cut(first, bounds, idx, min_column_gap, line_args):
+    """
+    Recursive XY-cut: split at the widest column gutter, else, when some
+    horizontal band of the region is split into columns, at the widest
+    horizontal gap. Regions without columns are ordered as text lines.
+    """
+    if len(idx) > 1:
+        order, pos, size = _gaps(bounds[idx, 0], bounds[idx, 2],
+                                 min_column_gap)
+        if len(pos) > 0:
+            cut = pos[np.argmax(size)] + 1
+            left, right = idx[order[:cut]], idx[order[cut:]]
+            return np.concatenate([
+                _xy_cut(first, bounds, left, min_column_gap, line_args),
+                _xy_cut(first, bounds, right, min_column_gap, line_args)
+            ])
+        order, pos, size = _gaps(bounds[idx, 1], bounds[idx, 3], 0)
+        if len(pos) > 0:
+            bands = np.split(idx[order], pos + 1)
+            if any(
+                    _has_column_gap(bounds, band, min_column_gap)
+                    for band in bands):
+                cut = pos[np.argmax(size)] + 1
+                top, bottom = idx[order[:cut]], idx[order[cut:]]
+                return np.concatenate([
+                    _xy_cut(first, bounds, top, min_column_gap,
+                            line_args),
+                    _xy_cut(first, bounds, bottom, min_column_gap,
+                            line_args)
+                ])
+    line_order = group_lines(first[idx], bounds[idx], *line_args)
+    return idx[line_order]
+
+
+def reading_order(dt_boxes,
+                  overlap_thresh=0.4,
+                  multi_column=False,
+                  min_column_gap=None,
+                  legacy=False,
+                  y_thresh=10):
+    """
+    Reading order of text boxes.
+    args:
+        dt_boxes(array|list): boxes with shape [N, 4, 2] or polygons
+        overlap_thresh(float): a box starts a new line when its top is this
+            share of the box height below the previous one, or when it
+            overlaps the lines above by less than this share of its height
+        multi_column(bool): split the page into columns before ordering the
+            lines, columns are read left to right
+        min_column_gap(float): min width of the whitespace between columns,
+            2 times the median box height by default
+        legacy(bool): order the lines with the rule of the former
+            sorted_boxes, in O(n^2)
+        y_thresh(float): with legacy, boxes whose first points are closer
+            than this in y are on the same line
+    return:
+        indices of dt_boxes in reading order
+    """
+    if len(dt_boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    first, bounds = _box_points(dt_boxes)
+    line_args = (overlap_thresh, legacy, y_thresh)
+    if not multi_column:
+        return group_lines(first, bounds, *line_args)
+    if min_column_gap is None:
+        min_column_gap = 2 * np.median(bounds[:, 3] - bounds[:, 1])
+    return _xy_cut(first, bounds,
+                   np.arange(len(first)), max(min_column_gap, 1), line_args)
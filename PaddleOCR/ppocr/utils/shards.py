@@ -0,0 +1,300 @@
+# copyright (c) 2023 PaddlePaddle Authors. All Rights Reserve.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Packed shard format of image datasets, read by ppocr.data.ShardDataSet.
+
+A dataset is a directory with a meta.json and, per shard,
+    <name>.bin: the encoded images, appended one after the other
+    <name>.lbl: "file_name\\tlabel" of every sample in utf-8, appended
+    <name>.idx: npy int64 [N, 4], offset and size of the image in .bin and
+        of the label in .lbl of every sample
+    <name>.info: npy int32 [N, 3], width, height and label length of every
+        sample, for samplers that group samples by size
+so a sample is read with two slices of memory mapped files instead of a
+stat and an open per image.
+
+Convert label files of SimpleDataSet with
+    python3 ppocr/utils/shards.py --data_dir ./train_data/ \
+        --label_file_list ./train_data/train_list.txt --output_dir ./shards/
+"""
+
+import argparse
+import json
+import mmap
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(__dir__, '../..')))
+
+from ppocr.utils.utility import image_size
+
+FORMAT_NAME = 'ppocr-shards'
+FORMAT_VERSION = 1
+META_FILE = 'meta.json'
+
+
+class ShardWriter(object):
+    """
+    Writes samples into shards of about shard_size_mb of images each.
+    """
+
+    def __init__(self, output_dir, shard_size_mb=1024, prefix='part'):
+        os.makedirs(output_dir, exist_ok=True)
+        if os.path.exists(os.path.join(output_dir, META_FILE)):
+            raise ValueError("{} already holds a shard dataset".format(
+                output_dir))
+        self.output_dir = output_dir
+        self.shard_size = int(shard_size_mb * (1 << 20))
+        self.prefix = prefix
+        self.shards = []
+        self._bin = None
+
+    def _open(self):
+        name = '{}-{:05d}'.format(self.prefix, len(self.shards))
+        path = os.path.join(self.output_dir, name)
+        self._name = name
+        self._bin = open(path + '.bin', 'wb')
+        self._lbl = open(path + '.lbl', 'wb')
+        self._index = []
+        self._info = []
+        self._bin_size = 0
+        self._lbl_size = 0
+
+    def _close(self):
+        self._bin.close()
+        self._lbl.close()
+        index = np.array(self._index, dtype=np.int64).reshape(-1, 4)
+        with open(os.path.join(self.output_dir, self._name + '.idx'),
+                  'wb') as f:
+            np.save(f, index)
+        info = np.array(self._info, dtype=np.int32).reshape(-1, 3)
+        with open(os.path.join(self.output_dir, self._name + '.info'),
+                  'wb') as f:
+            np.save(f, info)
+        self.shards.append({'name': self._name, 'num_samples': len(index)})
+        self._bin = None
+
+    def add(self, file_name, image, label):
+        """
+        args:
+            file_name(str): image path relative to the data dir
+            image(bytes): encoded image
+            label(str): label as in the label file
+        """
+        if self._bin is None:
+            self._open()
+        text = '{}\t{}'.format(file_name, label).encode('utf-8')
+        self._bin.write(image)
+        self._lbl.write(text)
+        self._index.append(
+            [self._bin_size, len(image), self._lbl_size, len(text)])
+        self._info.append(list(image_size(image)) + [len(label)])
+        self._bin_size += len(image)
+        self._lbl_size += len(text)
+        if self._bin_size >= self.shard_size:
+            self._close()
+
+    def close(self):
+        if self._bin is not None:
+            self._close()
+        meta = {
+            'format': FORMAT_NAME,
+            'version': FORMAT_VERSION,
+            'num_samples': sum(shard['num_samples'] for shard in self.shards),
+            'shards': self.shards
+        }
+        with open(os.path.join(self.output_dir, META_FILE), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        elif self._bin is not None:
+            # no meta.json, a failed conversion is not a readable dataset
+            self._bin.close()
+            self._lbl.close()
+
+
+class ShardReader(object):
+    """
+    Random access to the samples of a shard dataset. The indexes are loaded
+    up front, the data files are memory mapped on first use in every
+    process, so a reader may be created before the dataloader forks.
+    """
+
+    def __init__(self, shard_dir):
+        with open(os.path.join(shard_dir, META_FILE)) as f:
+            meta = json.load(f)
+        if meta.get('format') != FORMAT_NAME or meta.get(
+                'version') != FORMAT_VERSION:
+            raise ValueError("{} is not a shard dataset of version {}".format(
+                shard_dir, FORMAT_VERSION))
+        self.shard_dir = shard_dir
+        self.names = [shard['name'] for shard in meta['shards']]
+        self.indexes = [
+            np.load(
+                os.path.join(shard_dir, name + '.idx'), mmap_mode='r')
+            for name in self.names
+        ]
+        self.infos = None
+        info_paths = [
+            os.path.join(shard_dir, name + '.info') for name in self.names
+        ]
+        if all(os.path.exists(path) for path in info_paths):
+            self.infos = [np.load(path, mmap_mode='r') for path in info_paths]
+        self._pid = None
+        self._maps = {}
+
+    def __len__(self):
+        return sum(len(index) for index in self.indexes)
+
+    def shard_sizes(self):
+        return [len(index) for index in self.indexes]
+
+    def _map(self, shard_id, ext):
+        if self._pid != os.getpid():
+            # mappings of the parent are not reused after a fork
+            self._pid = os.getpid()
+            self._maps = {}
+        key = (shard_id, ext)
+        mm = self._maps.get(key)
+        if mm is None:
+            path = os.path.join(self.shard_dir, self.names[shard_id] + ext)
+            with open(path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    mm = b''
+                else:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[key] = mm
+        return mm
+
+    def labels(self):
+        """
+        Labels of all samples, shard by shard.
+        """
+        for shard_id, index in enumerate(self.indexes):
+            lbl = self._map(shard_id, '.lbl')
+            for _, _, lbl_off, lbl_len in index.tolist():
+                text = lbl[lbl_off:lbl_off + lbl_len].decode('utf-8')
+                yield text.split('\t', 1)[1]
+
+    def get(self, shard_id, row):
+        """
+        return:
+            file_name(str), label(str) and the encoded image(bytes)
+        """
+        img_off, img_len, lbl_off, lbl_len = (
+            int(v) for v in self.indexes[shard_id][row])
+        text = self._map(shard_id, '.lbl')[lbl_off:lbl_off + lbl_len]
+        file_name, label = text.decode('utf-8').split('\t', 1)
+        image = self._map(shard_id, '.bin')[img_off:img_off + img_len]
+        return file_name, label, image
+
+
+def _parse_line(line, delimiter):
+    substr = line.decode('utf-8').strip('\n').split(delimiter)
+    file_name, label = substr[0], substr[1]
+    # multiple images -> one gt label, every image becomes a sample
+    if len(file_name) > 0 and file_name[0] == '[':
+        try:
+            return [(name, label) for name in json.loads(file_name)]
+        except ValueError:
+            pass
+    return [(file_name, label)]
+
+
+def _read_image(data_dir, file_name):
+    path = os.path.join(data_dir, file_name)
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def convert(label_file_list,
+            data_dir,
+            output_dir,
+            delimiter='\t',
+            shard_size_mb=1024,
+            num_workers=16):
+    """
+    Pack the samples of SimpleDataSet label files into a shard dataset,
+    images are read with num_workers threads. Missing images are skipped.
+    return:
+        number of samples written and of images not found
+    """
+    samples = []
+    for label_file in label_file_list:
+        with open(label_file, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    samples.extend(_parse_line(line, delimiter))
+    written, missing = 0, 0
+    chunk = max(1, num_workers) * 64
+    with ShardWriter(output_dir, shard_size_mb) as writer, \
+            ThreadPoolExecutor(max(1, num_workers)) as executor:
+        for start in range(0, len(samples), chunk):
+            batch = samples[start:start + chunk]
+            images = executor.map(lambda s: _read_image(data_dir, s[0]),
+                                  batch)
+            for (file_name, label), image in zip(batch, images):
+                if image is None:
+                    missing += 1
+                    continue
+                writer.add(file_name, image, label)
+                written += 1
+    return written, missing
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--data_dir',
+        type=str,
+        default=".",
+        help='The root directory of images, as data_dir of SimpleDataSet')
+    parser.add_argument(
+        '--label_file_list',
+        type=str,
+        nargs='+',
+        required=True,
+        help='Label files to pack into one shard dataset')
+    parser.add_argument(
+        '--output_dir', type=str, required=True, help='Output directory')
+    parser.add_argument('--delimiter', type=str, default='\t')
+    parser.add_argument(
+        '--shard_size_mb',
+        type=float,
+        default=1024,
+        help='Size of the images of one shard')
+    parser.add_argument(
+        '--num_workers',
+        type=int,
+        default=16,
+        help='Threads reading the images')
+
+    args = parser.parse_args()
+    written, missing = convert(args.label_file_list, args.data_dir,
+                               args.output_dir, args.delimiter,
+                               args.shard_size_mb, args.num_workers)
+    print("packed {} samples into {}, {} images not found".format(
+        written, args.output_dir, missing))
@@ -12,12 +12,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import io
 import logging
 import os
 import cv2
 import random
 import numpy as np
-import paddle
 
 
 def print_dict(d, logger, delimiter=0):
@@ -102,13 +102,64 @@ def check_and_read(img_path):
             frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2RGB)
         imgvalue = frame[:, :, ::-1]
         return imgvalue, True, False
-    elif os.path.basename(img_path)[-3:].lower() == 'pdf':
-        import fitz
+    elif is_pdf_file(img_path):
+        return list(read_pdf_pages(img_path)), False, True
+    return None, False, False
+
+
+def image_size(buf):
+    """
+    (width, height) of an encoded image, read from the header when PIL
+    knows the format, (0, 0) for a missing or broken image.
+    """
+    if not buf:
+        return 0, 0
+    try:
         from PIL import Image
-        imgs = []
-        with fitz.open(img_path) as pdf:
-            for pg in range(0, pdf.page_count):
-                page = pdf[pg]
+        with Image.open(io.BytesIO(buf)) as img:
+            return img.size
+    except Exception:
+        pass
+    img = cv2.imdecode(np.frombuffer(buf, dtype='uint8'), cv2.IMREAD_COLOR)
+    if img is None:
+        return 0, 0
+    return img.shape[1], img.shape[0]
+
+
+def is_pdf_file(file_path):
+    return os.path.basename(file_path)[-3:].lower() == 'pdf'
+
+
+def read_pdf_pages(pdf_path, dpi=None, page_range=None, prefetch_num=0):
+    """
+    Render the pages of a pdf one at a time, so only the pages being
+    processed are held in memory.
+    args:
+        pdf_path(str): path of the pdf
+        dpi(int): render resolution, None renders at 2x zoom (1x for pages
+            larger than 2000 pixels)
+        page_range(tuple): (start, stop) page indices, stop excluded and
+            None meaning the last page, None renders every page
+        prefetch_num(int): pages rendered ahead in a background thread
+    return(generator): BGR ndarray of every page
+    """
+    pages = _render_pdf_pages(pdf_path, dpi, page_range)
+    if prefetch_num > 0:
+        pages = prefetch(pages, prefetch_num)
+    return pages
+
+
+def _render_pdf_pages(pdf_path, dpi, page_range):
+    import fitz
+    with fitz.open(pdf_path) as pdf:
+        start, stop = page_range if page_range is not None else (0, None)
+        stop = pdf.page_count if stop is None else min(stop, pdf.page_count)
+        for pg in range(max(start, 0), stop):
+            page = pdf[pg]
+            if dpi is not None:
+                pm = page.get_pixmap(
+                    matrix=fitz.Matrix(dpi / 72., dpi / 72.), alpha=False)
+            else:
                 mat = fitz.Matrix(2, 2)
                 pm = page.get_pixmap(matrix=mat, alpha=False)
 
@@ -116,11 +167,56 @@ def check_and_read(img_path):
                 if pm.width > 2000 or pm.height > 2000:
                     pm = page.get_pixmap(matrix=fitz.Matrix(1, 1), alpha=False)
 
-                img = Image.frombytes("RGB", [pm.width, pm.height], pm.samples)
-                img = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
-                imgs.append(img)
-            return imgs, False, True
-    return None, False, False
+            img = np.frombuffer(
+                pm.samples, dtype=np.uint8).reshape(pm.height, pm.width, 3)
+            yield cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+
+
+def prefetch(iterable, num=2):
+    """
+    Iterate `iterable` in a background thread keeping up to `num` items
+    ready, so producing the next item overlaps with consuming this one.
+    Exceptions of the producer are raised in the consumer.
+    """
+    import queue
+    import threading
+
+    end = object()
+    items = queue.Queue(maxsize=max(1, num))
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except Exception as e:
+            put((end, e))
+            return
+        put((end, None))
+
+    worker = threading.Thread(target=produce, daemon=True)
+    worker.start()
+    try:
+        while True:
+            item, error = items.get()
+            if error is not None:
+                raise error
+            if item is end:
+                return
+            yield item
+    finally:
+        stop.set()
+        worker.join()
 
 
 def load_vqa_bio_label_maps(label_map_path):
@@ -143,6 +239,7 @@ def load_vqa_bio_label_maps(label_map_path):
 
 
 def set_seed(seed=1024):
+    import paddle
     random.seed(seed)
     np.random.seed(seed)
     paddle.seed(seed)
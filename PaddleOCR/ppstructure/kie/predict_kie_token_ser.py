@@ -40,12 +40,20 @@ logger = get_logger()
 
 class SerPredictor(object):
     def __init__(self, args):
+        # same predictor config as the other subsystems of the process, so
+        # the det and rec models are shared with them
+        predictor_args = {
+            name: getattr(args, name)
+            for name in utility.PREDICTOR_KEY_ARGS if hasattr(args, name)
+        }
+        predictor_args['share_predictors'] = getattr(args, 'share_predictors',
+                                                     True)
         self.ocr_engine = PaddleOCR(
             use_angle_cls=args.use_angle_cls,
             det_model_dir=args.det_model_dir,
             rec_model_dir=args.rec_model_dir,
             show_log=False,
-            use_gpu=args.use_gpu)
+            **predictor_args)
 
         pre_process_list = [{
             'VQATokenLabelEncode': {
@@ -96,7 +104,7 @@ class SerPredictor(object):
                                               {'infer_mode': True})
         self.postprocess_op = build_post_process(postprocess_params)
         self.predictor, self.input_tensor, self.output_tensors, self.config = \
-            utility.create_predictor(args, 'ser', logger)
+            utility.get_predictor(args, 'ser', logger, owner=self)
 
     def __call__(self, img):
         ori_im = img.copy()
@@ -45,7 +45,7 @@ class SerRePredictor(object):
             postprocess_params = {'name': 'VQAReTokenLayoutLMPostProcess'}
             self.postprocess_op = build_post_process(postprocess_params)
             self.predictor, self.input_tensor, self.output_tensors, self.config = \
-                utility.create_predictor(args, 're', logger)
+                utility.get_predictor(args, 're', logger, owner=self)
         else:
             self.predictor = None
 
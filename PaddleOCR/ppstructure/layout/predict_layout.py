@@ -65,7 +65,7 @@ class LayoutPredictor(object):
         self.preprocess_op = create_operators(pre_process_list)
         self.postprocess_op = build_post_process(postprocess_params)
         self.predictor, self.input_tensor, self.output_tensors, self.config = \
-            utility.create_predictor(args, 'layout', logger)
+            utility.get_predictor(args, 'layout', logger, owner=self)
 
     def __call__(self, img):
         ori_im = img.copy()
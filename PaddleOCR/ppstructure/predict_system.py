@@ -28,21 +28,25 @@ import time
 import logging
 from copy import deepcopy
 
-from ppocr.utils.utility import get_image_file_list, check_and_read
+from ppocr.utils.utility import get_image_file_list, check_and_read, is_pdf_file
 from ppocr.utils.logging import get_logger
 from ppocr.utils.visual import draw_ser_results, draw_re_results
-from tools.infer.predict_system import TextSystem
-from ppstructure.layout.predict_layout import LayoutPredictor
-from ppstructure.table.predict_table import TableSystem, to_excel
-from ppstructure.utility import parse_args, draw_structure_result, cal_ocr_word_box
+from tools.infer.predict_system import TextSystem, sorted_boxes
+from tools.infer.utility import read_pdf_by_args, LazyAttribute
+from ppstructure.utility import parse_args, draw_structure_result, cal_ocr_word_box, to_excel
 
 logger = get_logger()
 
 
 class StructureSystem(object):
+    layout_predictor = LazyAttribute('create_layout_predictor')
+    table_system = LazyAttribute('create_table_system')
+
     def __init__(self, args):
+        self.args = args
         self.mode = args.mode
         self.recovery = args.recovery
+        self.page_level_ocr = args.page_level_ocr
 
         self.image_orientation_predictor = None
         if args.image_orientation:
@@ -59,21 +63,12 @@ class StructureSystem(object):
                     "When args.layout is false, args.ocr is automatically set to false"
                 )
             args.drop_score = 0
-            # init model
-            self.layout_predictor = None
+            # init model, with lazy_init the predictors are created on first use
             self.text_system = None
-            self.table_system = None
-            if args.layout:
-                self.layout_predictor = LayoutPredictor(args)
-                if args.ocr:
-                    self.text_system = TextSystem(args)
-            if args.table:
-                if self.text_system is not None:
-                    self.table_system = TableSystem(
-                        args, self.text_system.text_detector,
-                        self.text_system.text_recognizer)
-                else:
-                    self.table_system = TableSystem(args)
+            if args.layout and args.ocr:
+                self.text_system = TextSystem(args)
+            if not args.lazy_init:
+                self.build()
 
         elif self.mode == 'kie':
             from ppstructure.kie.predict_kie_token_ser_re import SerRePredictor
@@ -81,6 +76,133 @@ class StructureSystem(object):
 
         self.return_word_box = args.return_word_box
 
+    def build(self):
+        """
+        Create the predictors that are not created yet.
+        """
+        if self.mode != 'structure':
+            return
+        if self.text_system is not None:
+            self.text_system.build()
+        self.layout_predictor
+        self.table_system
+
+    def create_layout_predictor(self):
+        if not self.args.layout:
+            return None
+        from ppstructure.layout.predict_layout import LayoutPredictor
+        return LayoutPredictor(self.args)
+
+    def create_table_system(self):
+        if not self.args.table:
+            return None
+        from ppstructure.table.predict_table import TableSystem
+        if self.text_system is not None:
+            return TableSystem(self.args, self.text_system.text_detector,
+                               self.text_system.text_recognizer)
+        return TableSystem(self.args)
+
+    def _page_ocr(self, ori_im, region_bboxes, table_bboxes=()):
+        """
+        Run text detection once on the whole page and assign every box to
+        the region containing its center (the smallest one if several do),
+        clipped to that region. The crops of all text and table regions are
+        then recognized in one shared batch, which the recognizer sorts by
+        width.
+        args:
+            ori_im(array): the page image
+            region_bboxes(list): [x1, y1, x2, y2] of the text regions to ocr
+            table_bboxes(list): [x1, y1, x2, y2] of the table regions to ocr
+        return:
+            per text region (filter_boxes, filter_rec_res) in page
+            coordinates, per table region (dt_boxes, rec_res) in table
+            coordinates as expected by TableSystem, and the ocr time_dict
+            of the page, with the share of every text region then table
+            region, split by crop count, in time_dict['regions']
+        """
+        text_sys = self.text_system
+        time_dict = {'det': 0, 'rec': 0, 'cls': 0}
+        time_dict['regions'] = [{
+            'det': 0,
+            'rec': 0,
+            'cls': 0
+        } for _ in range(len(region_bboxes) + len(table_bboxes))]
+        results = [([], []) for _ in region_bboxes]
+        table_results = [(np.zeros((0, 4)), []) for _ in table_bboxes]
+        if len(region_bboxes) + len(table_bboxes) == 0:
+            return results, table_results, time_dict
+
+        dt_boxes, elapse = text_sys.text_detector(ori_im)
+        time_dict['det'] = elapse
+        if dt_boxes is None or len(dt_boxes) == 0:
+            return results, table_results, time_dict
+
+        regions = np.array(
+            list(region_bboxes) + list(table_bboxes), dtype=np.float32)
+        # per box, polygons of det_box_type 'poly' differ in point number
+        centers = np.array(
+            [np.mean(box, axis=0) for box in dt_boxes]).reshape(-1, 2)
+        inside = (centers[:, None, 0] >= regions[None, :, 0]) & \
+                 (centers[:, None, 0] < regions[None, :, 2]) & \
+                 (centers[:, None, 1] >= regions[None, :, 1]) & \
+                 (centers[:, None, 1] < regions[None, :, 3])
+        areas = (regions[:, 2] - regions[:, 0]) * (
+            regions[:, 3] - regions[:, 1])
+        owner = np.where(inside, areas[None, :], np.inf).argmin(axis=1)
+        owner[~inside.any(axis=1)] = -1
+
+        region_boxes = []
+        img_crop_list = []
+        for idx, (x1, y1, x2, y2) in enumerate(regions):
+            boxes = [dt_boxes[i].copy() for i in np.where(owner == idx)[0]]
+            for box in boxes:
+                box[:, 0] = np.clip(box[:, 0], x1, x2)
+                box[:, 1] = np.clip(box[:, 1], y1, y2)
+            if len(boxes) > 0:
+                boxes = sorted_boxes(
+                    boxes,
+                    overlap_thresh=text_sys.args.reading_order_overlap_thresh,
+                    legacy=text_sys.args.legacy_reading_order)
+            if idx < len(region_bboxes):
+                crops = text_sys.get_crop_images(ori_im, boxes)
+            else:
+                # tables are matched on axis aligned boxes of the table image
+                x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+                boxes = [box - [x1, y1] for box in boxes]
+                boxes, crops = self.table_system.get_crop_images(
+                    ori_im[y1:y2, x1:x2, :], boxes)
+            region_boxes.append(boxes)
+            img_crop_list.extend(crops)
+
+        # only text crops go through the angle classifier, like TableSystem
+        text_crop_num = sum(
+            len(boxes) for boxes in region_boxes[:len(region_bboxes)])
+        if text_sys.use_angle_cls and text_crop_num > 0:
+            text_crops, _, elapse = text_sys.text_classifier(
+                img_crop_list[:text_crop_num])
+            img_crop_list[:text_crop_num] = text_crops
+            time_dict['cls'] = elapse
+        rec_res, elapse = text_sys.text_recognizer(img_crop_list)
+        time_dict['rec'] = elapse
+
+        beg = 0
+        for idx, boxes in enumerate(region_boxes):
+            end = beg + len(boxes)
+            region_time = time_dict['regions'][idx]
+            region_time['det'] = time_dict['det'] * len(boxes) / len(dt_boxes)
+            region_time['rec'] = time_dict['rec'] * len(boxes) / max(
+                len(img_crop_list), 1)
+            if idx < len(region_bboxes) and text_crop_num > 0:
+                region_time['cls'] = time_dict['cls'] * len(
+                    boxes) / text_crop_num
+            if idx < len(region_bboxes):
+                results[idx] = text_sys.filter_rec_res(boxes, rec_res[beg:end])
+            else:
+                table_results[idx - len(region_bboxes)] = (boxes,
+                                                           rec_res[beg:end])
+            beg = end
+        return results, table_results, time_dict
+
     def __call__(self, img, return_ocr_result_in_table=False, img_idx=0):
         time_dict = {
             'image_orientation': 0,
@@ -116,9 +238,52 @@ class StructureSystem(object):
             else:
                 h, w = ori_im.shape[:2]
                 layout_res = [dict(bbox=None, label='table')]
+            page_ocr_res = {}
+            page_table_ocr_res = {}
+            # share of the page level ocr time of every region
+            page_region_times = {}
+            if self.text_system is not None and (self.recovery or
+                                                 self.page_level_ocr):
+                # detect once on the page instead of once per region
+                ocr_regions = [
+                    idx for idx, region in enumerate(layout_res)
+                    if region['label'] != 'table' and
+                    region['bbox'] is not None
+                ]
+                table_regions = []
+                if self.page_level_ocr and self.table_system is not None:
+                    table_regions = [
+                        idx for idx, region in enumerate(layout_res)
+                        if region['label'] == 'table' and
+                        region['bbox'] is not None
+                    ]
+                region_bboxes = [[
+                    int(v) for v in layout_res[idx]['bbox']
+                ] for idx in ocr_regions]
+                table_bboxes = [[
+                    int(v) for v in layout_res[idx]['bbox']
+                ] for idx in table_regions]
+                ocr_res, table_ocr_res, ocr_time_dict = self._page_ocr(
+                    ori_im, region_bboxes, table_bboxes)
+                page_ocr_res = dict(zip(ocr_regions, ocr_res))
+                page_table_ocr_res = dict(zip(table_regions, table_ocr_res))
+                page_region_times = dict(
+                    zip(ocr_regions + table_regions,
+                        ocr_time_dict['regions']))
+                time_dict['det'] += ocr_time_dict['det']
+                time_dict['rec'] += ocr_time_dict['rec']
             res_list = []
-            for region in layout_res:
+            # det/cls/rec/table time of every region, in the order of res_list
+            time_dict['regions'] = []
+            for region_idx, region in enumerate(layout_res):
                 res = ''
+                region_time = {'det': 0, 'rec': 0}
+                if region_idx in page_region_times:
+                    region_time['det'] = page_region_times[region_idx]['det']
+                    region_time['rec'] = page_region_times[region_idx]['rec']
+                    if self.text_system.use_angle_cls:
+                        region_time['cls'] = page_region_times[region_idx][
+                            'cls']
                 if region['bbox'] is not None:
                     x1, y1, x2, y2 = region['bbox']
                     x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
@@ -129,23 +294,30 @@ class StructureSystem(object):
                 if region['label'] == 'table':
                     if self.table_system is not None:
                         res, table_time_dict = self.table_system(
-                            roi_img, return_ocr_result_in_table)
+                            roi_img, return_ocr_result_in_table,
+                            page_table_ocr_res.get(region_idx))
                         time_dict['table'] += table_time_dict['table']
                         time_dict['table_match'] += table_time_dict['match']
                         time_dict['det'] += table_time_dict['det']
                         time_dict['rec'] += table_time_dict['rec']
+                        region_time['table'] = table_time_dict['table']
+                        region_time['table_match'] = table_time_dict['match']
+                        region_time['det'] += table_time_dict['det']
+                        region_time['rec'] += table_time_dict['rec']
                 else:
                     if self.text_system is not None:
-                        if self.recovery:
-                            wht_im = np.ones(ori_im.shape, dtype=ori_im.dtype)
-                            wht_im[y1:y2, x1:x2, :] = roi_img
-                            filter_boxes, filter_rec_res, ocr_time_dict = self.text_system(
-                                wht_im)
+                        if region_idx in page_ocr_res:
+                            filter_boxes, filter_rec_res = page_ocr_res[
+                                region_idx]
                         else:
                             filter_boxes, filter_rec_res, ocr_time_dict = self.text_system(
                                 roi_img)
-                        time_dict['det'] += ocr_time_dict['det']
-                        time_dict['rec'] += ocr_time_dict['rec']
+                            time_dict['det'] += ocr_time_dict['det']
+                            time_dict['rec'] += ocr_time_dict['rec']
+                            region_time['det'] = ocr_time_dict['det']
+                            region_time['rec'] = ocr_time_dict['rec']
+                            if self.text_system.use_angle_cls:
+                                region_time['cls'] = ocr_time_dict['cls']
 
                         # remove style char,
                         # when using the recognition model trained on the PubtabNet dataset,
@@ -162,7 +334,7 @@ class StructureSystem(object):
                             for token in style_token:
                                 if token in rec_str:
                                     rec_str = rec_str.replace(token, '')
-                            if not self.recovery:
+                            if region_idx not in page_ocr_res:
                                 box += [x1, y1]
                             if self.return_word_box:
                                 word_box_content_list, word_box_list = cal_ocr_word_box(rec_str, box, rec_res[2])
@@ -186,6 +358,7 @@ class StructureSystem(object):
                     'res': res,
                     'img_idx': img_idx
                 })
+                time_dict['regions'].append(region_time)
             end = time.time()
             time_dict['all'] = end - start
             return res_list, time_dict
@@ -236,7 +409,7 @@ def main(args):
 
     for i, image_file in enumerate(image_file_list):
         logger.info("[{}/{}] {}".format(i, img_num, image_file))
-        img, flag_gif, flag_pdf = check_and_read(image_file)
+        flag_pdf = is_pdf_file(image_file)
         img_name = os.path.basename(image_file).split('.')[0]
 
         if args.recovery and args.use_pdf2docx_api and flag_pdf:
@@ -250,19 +423,21 @@ def main(args):
             logger.info('docx save to {}'.format(docx_file))
             continue
 
-        if not flag_gif and not flag_pdf:
-            img = cv2.imread(image_file)
-
         if not flag_pdf:
+            img, flag_gif, _ = check_and_read(image_file)
+            if not flag_gif:
+                img = cv2.imread(image_file)
             if img is None:
                 logger.error("error in loading image:{}".format(image_file))
                 continue
-            imgs = [img]
+            imgs = enumerate([img])
         else:
-            imgs = img
+            # pages are rendered on demand while the previous one is analyzed
+            imgs = enumerate(
+                read_pdf_by_args(image_file, args), args.page_start)
 
         all_res = []
-        for index, img in enumerate(imgs):
+        for index, img in imgs:
             res, time_dict = structure_sys(img, img_idx=index)
             img_save_path = os.path.join(save_folder, img_name,
                                          'show_{}.jpg'.format(index))
@@ -88,7 +88,7 @@ class TableStructurer(object):
         self.preprocess_op = create_operators(pre_process_list)
         self.postprocess_op = build_post_process(postprocess_params)
         self.predictor, self.input_tensor, self.output_tensors, self.config = \
-            utility.create_predictor(args, 'table', logger)
+            utility.get_predictor(args, 'table', logger, owner=self)
 
         if args.benchmark:
             import auto_log
@@ -34,7 +34,7 @@ from ppocr.utils.utility import get_image_file_list, check_and_read
 from ppocr.utils.logging import get_logger
 from ppstructure.table.matcher import TableMatch
 from ppstructure.table.table_master_match import TableMasterMatcher
-from ppstructure.utility import parse_args
+from ppstructure.utility import parse_args, to_excel
 import ppstructure.table.predict_structure as predict_strture
 
 logger = get_logger()
@@ -76,10 +76,16 @@ class TableSystem(object):
         else:
             self.match = TableMatch(filter_ocr_result=True)
 
-        self.predictor, self.input_tensor, self.output_tensors, self.config = utility.create_predictor(
-            args, 'table', logger)
-
-    def __call__(self, img, return_ocr_result_in_table=False):
+    def __call__(self, img, return_ocr_result_in_table=False,
+                 ocr_result=None):
+        """
+        args:
+            img(array): the table image
+            return_ocr_result_in_table(bool): return the ocr boxes and texts
+            ocr_result(tuple): precomputed (dt_boxes, rec_res) in the
+                [x_min, y_min, x_max, y_max] format of get_crop_images,
+                skips the detector and recognizer when given
+        """
         result = dict()
         time_dict = {'det': 0, 'rec': 0, 'table': 0, 'all': 0, 'match': 0}
         start = time.time()
@@ -87,10 +93,13 @@ class TableSystem(object):
         result['cell_bbox'] = structure_res[1].tolist()
         time_dict['table'] = elapse
 
-        dt_boxes, rec_res, det_elapse, rec_elapse = self._ocr(
-            copy.deepcopy(img))
-        time_dict['det'] = det_elapse
-        time_dict['rec'] = rec_elapse
+        if ocr_result is None:
+            dt_boxes, rec_res, det_elapse, rec_elapse = self._ocr(
+                copy.deepcopy(img))
+            time_dict['det'] = det_elapse
+            time_dict['rec'] = rec_elapse
+        else:
+            dt_boxes, rec_res = ocr_result
 
         if return_ocr_result_in_table:
             result['boxes'] = dt_boxes  #[x.tolist() for x in dt_boxes]
@@ -110,10 +119,26 @@ class TableSystem(object):
         return structure_res, elapse
 
     def _ocr(self, img):
-        h, w = img.shape[:2]
         dt_boxes, det_elapse = self.text_detector(copy.deepcopy(img))
-        dt_boxes = sorted_boxes(dt_boxes)
+        dt_boxes = sorted_boxes(
+            dt_boxes,
+            overlap_thresh=self.args.reading_order_overlap_thresh,
+            legacy=self.args.legacy_reading_order)
+        dt_boxes, img_crop_list = self.get_crop_images(img, dt_boxes)
+        logger.debug("dt_boxes num : {}, elapse : {}".format(
+            len(dt_boxes), det_elapse))
+        rec_res, rec_elapse = self.text_recognizer(img_crop_list)
+        logger.debug("rec_res num  : {}, elapse : {}".format(
+            len(rec_res), rec_elapse))
+        return dt_boxes, rec_res, det_elapse, rec_elapse
 
+    def get_crop_images(self, img, dt_boxes):
+        """
+        Convert the sorted quad boxes to axis aligned
+        [x_min, y_min, x_max, y_max] boxes and crop them from img with a
+        2 pixel margin, returns (r_boxes, img_crop_list).
+        """
+        h, w = img.shape[:2]
         r_boxes = []
         for box in dt_boxes:
             x_min = max(0, box[:, 0].min() - 1)
@@ -123,10 +148,6 @@ class TableSystem(object):
             box = [x_min, y_min, x_max, y_max]
             r_boxes.append(box)
         dt_boxes = np.array(r_boxes)
-        logger.debug("dt_boxes num : {}, elapse : {}".format(
-            len(dt_boxes), det_elapse))
-        if dt_boxes is None:
-            return None, None
 
         img_crop_list = []
         for i in range(len(dt_boxes)):
@@ -134,15 +155,7 @@ class TableSystem(object):
             x0, y0, x1, y1 = expand(2, det_box, img.shape)
             text_rect = img[int(y0):int(y1), int(x0):int(x1), :]
             img_crop_list.append(text_rect)
-        rec_res, rec_elapse = self.text_recognizer(img_crop_list)
-        logger.debug("rec_res num  : {}, elapse : {}".format(
-            len(rec_res), rec_elapse))
-        return dt_boxes, rec_res, det_elapse, rec_elapse
-
-
-def to_excel(html_table, excel_path):
-    from tablepyxl import tablepyxl
-    tablepyxl.document_to_xl(html_table, excel_path)
+        return dt_boxes, img_crop_list
 
 
 def main(args):
@@ -87,6 +87,12 @@ def init_args():
         type=str2bool,
         default=True,
         help='In the forward, whether the non-table area is recognition by ocr')
+    parser.add_argument(
+        "--page_level_ocr",
+        type=str2bool,
+        default=False,
+        help='Whether to detect text once per page and recognize the text and table regions of the page in shared batches'
+    )
     # param for recovery
     parser.add_argument(
         "--recovery",
@@ -122,6 +128,11 @@ def parse_args():
     return parser.parse_args()
 
 
+def to_excel(html_table, excel_path):
+    from tablepyxl import tablepyxl
+    tablepyxl.document_to_xl(html_table, excel_path)
+
+
 def draw_structure_result(image, result, font_path):
     if isinstance(image, np.ndarray):
         image = Image.fromarray(image)
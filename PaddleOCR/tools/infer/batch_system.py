@@ -0,0 +1,196 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import sys
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(__dir__)
+sys.path.insert(0, os.path.abspath(os.path.join(__dir__, '../..')))
+
+os.environ["FLAGS_allocator_strategy"] = 'auto_growth'
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from ppocr.utils.logging import get_logger
+from tools.infer.predict_system import TextSystem, sorted_boxes
+
+logger = get_logger()
+
+
+class _OCRRequest(object):
+    def __init__(self, img, cls):
+        self.img = img
+        self.cls = cls
+        self.future = Future()
+
+
+class BatchTextSystem(object):
+    """
+    Dynamic batching scheduler on top of TextSystem.
+    Images submitted by many callers are gathered for up to
+    `batch_wait_ms` (or until `batch_max_images` are pending), the text
+    crops of all gathered images are classified and recognized in shared
+    batches, and every caller receives the same
+    (dt_boxes, rec_res, time_dict) triple as TextSystem.__call__.
+    """
+
+    def __init__(self, args, text_system=None):
+        # a text system created here is closed with the scheduler
+        self._own_text_system = text_system is None
+        if text_system is None:
+            text_system = TextSystem(args)
+        self.text_system = text_system
+        self.max_images = max(1, args.batch_max_images)
+        self.wait_time = args.batch_wait_ms / 1000.
+
+        self._queue = queue.Queue()
+        self._closed = threading.Event()
+        self._worker = threading.Thread(target=self._loop, daemon=True)
+        self._worker.start()
+
+    def submit(self, img, cls=True):
+        """
+        Enqueue one image and return a concurrent.futures.Future that
+        resolves to (dt_boxes, rec_res, time_dict).
+        """
+        if self._closed.is_set():
+            raise RuntimeError("BatchTextSystem has been closed")
+        request = _OCRRequest(img, cls)
+        self._queue.put(request)
+        return request.future
+
+    def __call__(self, img, cls=True):
+        return self.submit(img, cls).result()
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._queue.put(None)
+        self._worker.join()
+        if self._own_text_system:
+            self.text_system.close()
+
+    def _collect(self):
+        request = self._queue.get()
+        if request is None:
+            return []
+        batch = [request]
+        deadline = time.time() + self.wait_time
+        while len(batch) < self.max_images:
+            remain = deadline - time.time()
+            if remain <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remain)
+            except queue.Empty:
+                break
+            if request is None:
+                break
+            batch.append(request)
+        return batch
+
+    def _loop(self):
+        while not self._closed.is_set():
+            batch = self._collect()
+            batch = [
+                req for req in batch
+                if req.future.set_running_or_notify_cancel()
+            ]
+            if len(batch) == 0:
+                continue
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                logger.error("batch ocr failed: {}".format(e))
+                for req in batch:
+                    if not req.future.done():
+                        req.future.set_exception(e)
+        # fail whatever was queued after close()
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None and request.future.set_running_or_notify_cancel(
+            ):
+                request.future.set_exception(
+                    RuntimeError("BatchTextSystem has been closed"))
+
+    def _detect(self, batch):
+        """
+        Run the detector over the images of all requests in batched
+        forward passes, images larger than det_tile_size are detected in
+        tiles. Returns a list of (dt_boxes, elapse) aligned with `batch`.
+        """
+        dt_boxes_list, elapse = self.text_system.text_detector.batch(
+            [req.img for req in batch])
+        return [(dt_boxes, elapse) for dt_boxes in dt_boxes_list]
+
+    def _run_batch(self, batch):
+        text_sys = self.text_system
+        start = time.time()
+        det_res = self._detect(batch)
+
+        pages = []
+        img_crop_list = []
+        for req, (dt_boxes, elapse) in zip(batch, det_res):
+            time_dict = {'det': elapse, 'rec': 0, 'cls': 0, 'all': 0}
+            if dt_boxes is None:
+                time_dict['all'] = time.time() - start
+                req.future.set_result((None, None, time_dict))
+                continue
+            dt_boxes = sorted_boxes(
+                dt_boxes, text_sys.args.multi_column_order,
+                text_sys.args.reading_order_overlap_thresh,
+                text_sys.args.legacy_reading_order)
+            crops = text_sys.get_crop_images(req.img, dt_boxes)
+            pages.append((req, dt_boxes, len(img_crop_list), len(crops),
+                          time_dict))
+            img_crop_list.extend(crops)
+        if len(pages) == 0:
+            return
+
+        # angle classification only for the crops of requests asking for it
+        if text_sys.use_angle_cls:
+            cls_index = []
+            for req, _, beg, num, _ in pages:
+                if req.cls:
+                    cls_index.extend(range(beg, beg + num))
+            if len(cls_index) > 0:
+                cls_crops, _, elapse = text_sys.text_classifier(
+                    [img_crop_list[i] for i in cls_index])
+                for i, crop in zip(cls_index, cls_crops):
+                    img_crop_list[i] = crop
+                for page in pages:
+                    if page[0].cls:
+                        page[4]['cls'] = elapse
+
+        rec_res, elapse = text_sys.text_recognizer(img_crop_list)
+        logger.debug("batch images: {}, rec_res num: {}, elapsed: {}".format(
+            len(pages), len(rec_res), elapse))
+        if text_sys.args.save_crop_res:
+            text_sys.draw_crop_rec_res(text_sys.args.crop_res_save_dir,
+                                       img_crop_list, rec_res)
+
+        end = time.time()
+        for req, dt_boxes, beg, num, time_dict in pages:
+            time_dict['rec'] = elapse
+            time_dict['all'] = end - start
+            filter_boxes, filter_rec_res = text_sys.filter_rec_res(
+                dt_boxes, rec_res[beg:beg + num])
+            req.future.set_result((filter_boxes, filter_rec_res, time_dict))
@@ -0,0 +1,114 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import sys
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(__dir__)
+sys.path.insert(0, os.path.abspath(os.path.join(__dir__, '../..')))
+
+import asyncio
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ppocr.utils.logging import get_logger
+from tools.infer.utility import clone_engine
+
+logger = get_logger()
+
+
+class EnginePool(object):
+    """
+    Replicas of an inference engine sharing its loaded weights, see
+    utility.clone_engine, and the threads running them. Every replica serves
+    one call at a time, so at most `size` calls run concurrently and the
+    others wait in order. The engine itself is not used by the pool and
+    stays free for blocking calls.
+    args:
+        engine: TextSystem, PaddleOCR, StructureSystem, ..., its lazily
+            created predictors are created first, see TextSystem.build
+        size(int): number of replicas
+        max_pending(int): max calls running or waiting, more are rejected
+            with a RuntimeError. 0 for no limit
+        skip: attributes of engine shared by the replicas without cloning
+    """
+
+    def __init__(self, engine, size, max_pending=0, skip=()):
+        self.size = max(1, size)
+        self.max_pending = max_pending
+        # lazily created predictors must exist to be cloned, else every
+        # replica would be the engine itself
+        build = getattr(engine, 'build', None)
+        if build is not None:
+            build()
+        self._engines = queue.LifoQueue()
+        for _ in range(self.size):
+            replica = clone_engine(engine, skip)
+            assert replica is not engine, \
+                "{} has no predictor to clone".format(type(engine).__name__)
+            self._engines.put(replica)
+        self._executor = ThreadPoolExecutor(self.size)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._closed = False
+
+    def _run(self, func, args, kwargs):
+        engine = self._engines.get()
+        try:
+            return func(engine, *args, **kwargs)
+        finally:
+            self._engines.put(engine)
+
+    def _release(self, _):
+        with self._lock:
+            self._pending -= 1
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Run func(replica, *args, **kwargs) on a free replica, returns a
+        concurrent.futures.Future. A call cancelled before it starts never
+        runs, a started call runs to the end.
+        """
+        if self._closed:
+            raise RuntimeError("EnginePool has been closed")
+        with self._lock:
+            if 0 < self.max_pending <= self._pending:
+                raise RuntimeError(
+                    "EnginePool is full, {} calls pending".format(
+                        self._pending))
+            self._pending += 1
+        try:
+            future = self._executor.submit(self._run, func, args, kwargs)
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, func, *args, timeout=None, **kwargs):
+        """
+        Awaitable submit. On timeout asyncio.TimeoutError is raised and the
+        call is cancelled, as when the awaiting task is cancelled.
+        """
+        future = asyncio.wrap_future(self.submit(func, *args, **kwargs))
+        return await asyncio.wait_for(future, timeout)
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def close(self):
+        self._closed = True
+        self._executor.shutdown()
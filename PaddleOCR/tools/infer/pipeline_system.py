@@ -0,0 +1,175 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import sys
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(__dir__)
+sys.path.insert(0, os.path.abspath(os.path.join(__dir__, '../..')))
+
+os.environ["FLAGS_allocator_strategy"] = 'auto_growth'
+
+import queue
+import threading
+import time
+
+from ppocr.utils.logging import get_logger
+from tools.infer.predict_system import TextSystem, sorted_boxes
+
+logger = get_logger()
+
+_END = object()
+
+
+class _StageError(object):
+    def __init__(self, error):
+        self.error = error
+
+
+class PipelineTextSystem(TextSystem):
+    """
+    Pipelined det -> cls -> rec execution.
+    Every stage runs in its own thread with its own predictor and the
+    stages are linked by bounded queues, so page N+1 is detected while
+    page N is being recognized and a slow consumer throttles the input.
+    """
+
+    def __init__(self, args):
+        super(PipelineTextSystem, self).__init__(args)
+        self.queue_size = max(1, args.pipeline_queue_size)
+        # the stage predictors are not reentrant, run one stream at a time
+        self._stream_lock = threading.Lock()
+
+    def _put(self, q, item, stop):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q, stop):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _feed(self, imgs, out_q, stop):
+        try:
+            for idx, img in enumerate(imgs):
+                if not self._put(out_q, (idx, img), stop):
+                    return
+        except Exception as e:
+            self._put(out_q, _StageError(e), stop)
+            return
+        self._put(out_q, _END, stop)
+
+    def _run_stage(self, func, in_q, out_q, stop):
+        while True:
+            item = self._get(in_q, stop)
+            if item is _END or isinstance(item, _StageError):
+                self._put(out_q, item, stop)
+                return
+            try:
+                item = func(item)
+            except Exception as e:
+                self._put(out_q, _StageError(e), stop)
+                return
+            if not self._put(out_q, item, stop):
+                return
+
+    def _det_stage(self, item):
+        idx, img = item
+        time_dict = {'det': 0, 'rec': 0, 'cls': 0, 'all': 0}
+        start = time.time()
+        if img is None:
+            logger.debug("no valid image provided")
+            return idx, None, None, time_dict, start
+        dt_boxes, elapse = self.text_detector(img)
+        time_dict['det'] = elapse
+        if dt_boxes is None:
+            return idx, None, None, time_dict, start
+        dt_boxes = sorted_boxes(dt_boxes, self.args.multi_column_order,
+                                self.args.reading_order_overlap_thresh,
+                                self.args.legacy_reading_order)
+        img_crop_list = self.get_crop_images(img, dt_boxes)
+        return idx, dt_boxes, img_crop_list, time_dict, start
+
+    def _cls_stage(self, item):
+        idx, dt_boxes, img_crop_list, time_dict, start = item
+        if dt_boxes is not None:
+            img_crop_list, _, elapse = self.text_classifier(img_crop_list)
+            time_dict['cls'] = elapse
+        return idx, dt_boxes, img_crop_list, time_dict, start
+
+    def _rec_stage(self, item):
+        idx, dt_boxes, img_crop_list, time_dict, start = item
+        if dt_boxes is None:
+            time_dict['all'] = time.time() - start
+            return None, None, time_dict
+        rec_res, elapse = self.text_recognizer(img_crop_list)
+        time_dict['rec'] = elapse
+        if self.args.save_crop_res:
+            self.draw_crop_rec_res(self.args.crop_res_save_dir, img_crop_list,
+                                   rec_res)
+        filter_boxes, filter_rec_res = self.filter_rec_res(dt_boxes, rec_res)
+        time_dict['all'] = time.time() - start
+        return filter_boxes, filter_rec_res, time_dict
+
+    def stream(self, imgs, cls=True):
+        """
+        Run OCR over an iterable of images in pipeline mode.
+        args:
+            imgs(iterable): BGR images, can be a generator
+            cls(bool): use angle classifier or not
+        return(generator):
+            (dt_boxes, rec_res, time_dict) for every input, in input order
+        """
+        with self._stream_lock:
+            stop = threading.Event()
+            stages = [self._det_stage]
+            if self.use_angle_cls and cls:
+                stages.append(self._cls_stage)
+            stages.append(self._rec_stage)
+            queues = [
+                queue.Queue(maxsize=self.queue_size)
+                for _ in range(len(stages) + 1)
+            ]
+            workers = [
+                threading.Thread(
+                    target=self._feed, args=(imgs, queues[0], stop))
+            ]
+            for i, stage in enumerate(stages):
+                workers.append(
+                    threading.Thread(
+                        target=self._run_stage,
+                        args=(stage, queues[i], queues[i + 1], stop)))
+            for worker in workers:
+                worker.daemon = True
+                worker.start()
+            try:
+                while True:
+                    item = queues[-1].get()
+                    if item is _END:
+                        break
+                    if isinstance(item, _StageError):
+                        raise item.error
+                    yield item
+            finally:
+                stop.set()
+                for worker in workers:
+                    worker.join()
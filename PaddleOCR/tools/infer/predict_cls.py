@@ -46,10 +46,15 @@ class TextClassifier(object):
         }
         self.postprocess_op = build_post_process(postprocess_params)
         self.predictor, self.input_tensor, self.output_tensors, _ = \
-            utility.create_predictor(args, 'cls', logger)
+            utility.get_predictor(args, 'cls', logger, owner=self)
         self.use_onnx = args.use_onnx
+        self.input_arena = utility.InputArena()
 
-    def resize_norm_img(self, img):
+    def resize_norm_img(self, img, out=None):
+        """
+        Resize and normalize img into a [C, H, W] float32 image, written
+        in place into the preallocated slot out when given.
+        """
         imgC, imgH, imgW = self.cls_image_shape
         h = img.shape[0]
         w = img.shape[1]
@@ -59,6 +64,8 @@ class TextClassifier(object):
         else:
             resized_w = int(math.ceil(imgH * ratio))
         resized_image = cv2.resize(img, (resized_w, imgH))
+        if out is not None:
+            return utility.norm_img_into(resized_image, out)
         resized_image = resized_image.astype('float32')
         if self.cls_image_shape[0] == 1:
             resized_image = resized_image / 255
@@ -94,12 +101,11 @@ class TextClassifier(object):
                 h, w = img_list[indices[ino]].shape[0:2]
                 wh_ratio = w * 1.0 / h
                 max_wh_ratio = max(max_wh_ratio, wh_ratio)
+            norm_img_batch = self.input_arena.get(
+                [end_img_no - beg_img_no] + self.cls_image_shape)
             for ino in range(beg_img_no, end_img_no):
-                norm_img = self.resize_norm_img(img_list[indices[ino]])
-                norm_img = norm_img[np.newaxis, :]
-                norm_img_batch.append(norm_img)
-            norm_img_batch = np.concatenate(norm_img_batch)
-            norm_img_batch = norm_img_batch.copy()
+                self.resize_norm_img(
+                    img_list[indices[ino]], out=norm_img_batch[ino - beg_img_no])
 
             if self.use_onnx:
                 input_dict = {}
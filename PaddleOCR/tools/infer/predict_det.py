@@ -30,6 +30,7 @@ from ppocr.utils.logging import get_logger
 from ppocr.utils.utility import get_image_file_list, check_and_read
 from ppocr.data import create_operators, transform
 from ppocr.postprocess import build_post_process
+from ppocr.utils.poly_nms import poly_nms, points2polygon
 import json
 logger = get_logger()
 
@@ -68,6 +69,7 @@ class TextDetector(object):
             postprocess_params["use_dilation"] = args.use_dilation
             postprocess_params["score_mode"] = args.det_db_score_mode
             postprocess_params["box_type"] = args.det_box_type
+            postprocess_params["use_vectorized"] = args.det_db_vectorized
         elif self.det_algorithm == "DB++":
             postprocess_params['name'] = 'DBPostProcess'
             postprocess_params["thresh"] = args.det_db_thresh
@@ -77,6 +79,7 @@ class TextDetector(object):
             postprocess_params["use_dilation"] = args.use_dilation
             postprocess_params["score_mode"] = args.det_db_score_mode
             postprocess_params["box_type"] = args.det_box_type
+            postprocess_params["use_vectorized"] = args.det_db_vectorized
             pre_process_list[1] = {
                 'NormalizeImage': {
                     'std': [1.0, 1.0, 1.0],
@@ -138,8 +141,8 @@ class TextDetector(object):
 
         self.preprocess_op = create_operators(pre_process_list)
         self.postprocess_op = build_post_process(postprocess_params)
-        self.predictor, self.input_tensor, self.output_tensors, self.config = utility.create_predictor(
-            args, 'det', logger)
+        self.predictor, self.input_tensor, self.output_tensors, self.config = utility.get_predictor(
+            args, 'det', logger, owner=self)
 
         if self.use_onnx:
             img_h, img_w = self.input_tensor.shape[2:]
@@ -150,6 +153,23 @@ class TextDetector(object):
                     }
                 }
         self.preprocess_op = create_operators(pre_process_list)
+        # tiles are detected at native resolution, without the side length
+        # limit, only resized to a multiple of 32
+        self.tile_preprocess_op = self.preprocess_op
+        if args.det_tile_size > 0:
+            if 'limit_side_len' in pre_process_list[0].get('DetResizeForTest',
+                                                           {}):
+                self.tile_preprocess_op = create_operators([{
+                    'DetResizeForTest': {
+                        'limit_side_len': args.det_tile_size,
+                        'limit_type': 'max'
+                    }
+                }] + pre_process_list[1:])
+            else:
+                logger.warning(
+                    "det_tile_size: tiles are resized by the preprocessing of "
+                    "{}, not detected at native resolution".format(
+                        self.det_algorithm))
 
         if args.benchmark:
             import auto_log
@@ -212,28 +232,14 @@ class TextDetector(object):
                 box = np.array(box)
             box = self.clip_det_res(box, img_height, img_width)
             dt_boxes_new.append(box)
-        dt_boxes = np.array(dt_boxes_new)
-        return dt_boxes
+        # a list, polygons may have different point numbers
+        return dt_boxes_new
 
-    def __call__(self, img):
-        ori_im = img.copy()
-        data = {'image': img}
-
-        st = time.time()
-
-        if self.args.benchmark:
-            self.autolog.times.start()
-
-        data = transform(data, self.preprocess_op)
-        img, shape_list = data
-        if img is None:
-            return None, 0
-        img = np.expand_dims(img, axis=0)
-        shape_list = np.expand_dims(shape_list, axis=0)
-        img = img.copy()
-
-        if self.args.benchmark:
-            self.autolog.times.stamp()
+    def predict(self, img):
+        """
+        Run the predictor on a [N, C, H, W] batch and return the preds dict
+        expected by the post process.
+        """
         if self.use_onnx:
             input_dict = {}
             input_dict[self.input_tensor.name] = img
@@ -267,20 +273,250 @@ class TextDetector(object):
             preds['score'] = outputs[1]
         else:
             raise NotImplementedError
+        return preds
+
+    def filter_boxes(self, dt_boxes, image_shape):
+        if self.args.det_box_type == 'poly':
+            return self.filter_tag_det_res_only_clip(dt_boxes, image_shape)
+        return self.filter_tag_det_res(dt_boxes, image_shape)
+
+    def __call__(self, img):
+        tile_size = self.args.det_tile_size
+        if tile_size > 0 and max(img.shape[:2]) > tile_size:
+            return self.detect_tiles(img)
+        ori_im = img.copy()
+        data = {'image': img}
+
+        st = time.time()
+
+        if self.args.benchmark:
+            self.autolog.times.start()
+
+        data = transform(data, self.preprocess_op)
+        img, shape_list = data
+        if img is None:
+            return None, 0
+        img = np.expand_dims(img, axis=0)
+        shape_list = np.expand_dims(shape_list, axis=0)
+        img = img.copy()
+
+        if self.args.benchmark:
+            self.autolog.times.stamp()
+        preds = self.predict(img)
 
         post_result = self.postprocess_op(preds, shape_list)
         dt_boxes = post_result[0]['points']
-
-        if self.args.det_box_type == 'poly':
-            dt_boxes = self.filter_tag_det_res_only_clip(dt_boxes, ori_im.shape)
-        else:
-            dt_boxes = self.filter_tag_det_res(dt_boxes, ori_im.shape)
+        dt_boxes = self.filter_boxes(dt_boxes, ori_im.shape)
 
         if self.args.benchmark:
             self.autolog.times.end(stamp=True)
         et = time.time()
         return dt_boxes, et - st
 
+    def batch(self, imgs, preprocess_op=None):
+        """
+        Detect several images with batched forward passes.
+        Images whose long side exceeds det_tile_size are detected in tiles
+        like in __call__. Images resized to the same shape share a batch.
+        For DB and DB++, whose maps have the input resolution, images of
+        different shapes are also padded to a shared shape and the maps
+        cropped back to each image before post processing. Batches hold
+        at most det_batch_num images. Boxes are mapped back through the
+        ratio of each image.
+        args:
+            imgs(list): BGR images
+            preprocess_op(list): operators replacing self.preprocess_op
+        return:
+            list of dt_boxes (None for images that could not be
+            preprocessed) aligned with imgs, and the elapse
+        """
+        st = time.time()
+        if preprocess_op is None:
+            preprocess_op = self.preprocess_op
+        dt_boxes_list = [None] * len(imgs)
+        tile_size = self.args.det_tile_size
+        inputs = []
+        for idx, img in enumerate(imgs):
+            if img is None:
+                continue
+            if tile_size > 0 and max(img.shape[:2]) > tile_size:
+                dt_boxes_list[idx], _ = self.detect_tiles(img)
+                continue
+            data = transform({'image': img}, preprocess_op)
+            if data is not None and data[0] is not None:
+                inputs.append((idx, data[0], data[1]))
+        if len(inputs) == 0:
+            return dt_boxes_list, time.time() - st
+
+        pad = self.det_algorithm in ['DB', 'DB++'] and not self.use_onnx
+        if pad:
+            groups = [inputs]
+        else:
+            groups = {}
+            for item in inputs:
+                groups.setdefault(item[1].shape, []).append(item)
+            groups = list(groups.values())
+
+        batch_num = max(1, self.args.det_batch_num)
+        for group in groups:
+            if pad:
+                # similar sizes next to each other keep the padding small
+                group = sorted(group, key=lambda x: x[1].shape[1:])
+            for beg in range(0, len(group), batch_num):
+                items = group[beg:beg + batch_num]
+                shapes = np.array([item[1].shape[1:] for item in items])
+                max_h, max_w = shapes.max(axis=0)
+                norm_img_batch = np.zeros(
+                    (len(items), items[0][1].shape[0], max_h, max_w),
+                    dtype=np.float32)
+                for k, (_, norm_img, _) in enumerate(items):
+                    h, w = norm_img.shape[1:]
+                    norm_img_batch[k, :, :h, :w] = norm_img
+                shape_list = np.array([item[2] for item in items])
+                preds = self.predict(norm_img_batch)
+
+                if pad and (shapes != shapes[0]).any():
+                    post_result = []
+                    for k, (h, w) in enumerate(shapes):
+                        post_result += self.postprocess_op(
+                            {'maps': preds['maps'][k:k + 1, :, :h, :w]},
+                            shape_list[k:k + 1])
+                else:
+                    post_result = self.postprocess_op(preds, shape_list)
+                for (idx, _, _), res in zip(items, post_result):
+                    dt_boxes_list[idx] = self.filter_boxes(res['points'],
+                                                           imgs[idx].shape)
+        return dt_boxes_list, time.time() - st
+
+    def detect_tiles(self, img):
+        """
+        Detect a large image at native resolution. The image is cut into
+        overlapping det_tile_size tiles which are detected det_batch_num
+        at a time without the det_limit_side_len limit, so memory is
+        bounded by the tile size. Boxes that can appear in several tiles
+        are merged across the seams: polygon NMS removes duplicated
+        complete boxes, fragments cut by a seam and covered by a
+        complete box are dropped, and the remaining fragments of a line
+        longer than the overlap are joined.
+        return:
+            boxes as an array [N, 4, 2], or a list of polygons with
+            det_box_type 'poly', and the elapse
+        """
+        st = time.time()
+        h, w = img.shape[:2]
+        tile = self.args.det_tile_size
+        overlap = min(self.args.det_tile_overlap, tile // 2)
+
+        def tile_starts(length):
+            starts = list(range(0, max(length - tile, 0) + 1, tile - overlap))
+            if starts[-1] + tile < length:
+                starts.append(length - tile)
+            return starts
+
+        tiles = [(x, y) for y in tile_starts(h) for x in tile_starts(w)]
+        tile_rects = np.array(
+            [[x, y, min(x + tile, w), min(y + tile, h)] for x, y in tiles])
+
+        boxes, cut_flags = [], []
+        margin = 2
+        batch_num = max(1, self.args.det_batch_num)
+        for beg in range(0, len(tiles), batch_num):
+            chunk = tile_rects[beg:beg + batch_num]
+            dt_boxes_list, _ = self.batch(
+                [img[y0:y1, x0:x1] for x0, y0, x1, y1 in chunk],
+                self.tile_preprocess_op)
+            for (x0, y0, x1, y1), dt_boxes in zip(chunk, dt_boxes_list):
+                if dt_boxes is None:
+                    continue
+                for box in dt_boxes:
+                    box = np.array(box, dtype=np.float32)
+                    # touching an edge shared with another tile
+                    cut = (x0 > 0 and box[:, 0].min() <= margin) or \
+                          (y0 > 0 and box[:, 1].min() <= margin) or \
+                          (x1 < w and box[:, 0].max() >= x1 - x0 - 1 - margin) or \
+                          (y1 < h and box[:, 1].max() >= y1 - y0 - 1 - margin)
+                    boxes.append((box + [x0, y0]).astype(np.float32))
+                    cut_flags.append(cut)
+        if len(boxes) == 0:
+            if self.args.det_box_type == 'poly':
+                return [], time.time() - st
+            return np.zeros((0, 4, 2), dtype=np.float32), time.time() - st
+
+        # only boxes reaching into more than one tile can be duplicated
+        bboxes = np.array([[
+            b[:, 0].min(), b[:, 1].min(), b[:, 0].max(), b[:, 1].max()
+        ] for b in boxes])
+        tile_hits = (bboxes[:, None, 0] < tile_rects[None, :, 2]) & \
+                    (bboxes[:, None, 2] > tile_rects[None, :, 0]) & \
+                    (bboxes[:, None, 1] < tile_rects[None, :, 3]) & \
+                    (bboxes[:, None, 3] > tile_rects[None, :, 1])
+        seam = tile_hits.sum(axis=1) > 1
+        result = [b for b, on_seam in zip(boxes, seam) if not on_seam]
+
+        # complete copies of the same box are merged by nms, larger first
+        candidates, fragments = [], []
+        for i in np.where(seam)[0]:
+            if cut_flags[i]:
+                fragments.append(boxes[i])
+                continue
+            area = cv2.contourArea(boxes[i]) / (h * w)
+            candidates.append(boxes[i].reshape(-1).tolist() + [area])
+        complete = []
+        if len(candidates) > 0:
+            kept = poly_nms(candidates, self.args.det_tile_nms_thresh)
+            complete = [np.array(k[:-1]).reshape(-1, 2) for k in kept]
+        result += complete
+        result += self.merge_fragments(fragments, complete)
+        if self.args.det_box_type == 'poly':
+            # polygons have different point numbers
+            return [np.asarray(b, dtype=np.float32)
+                    for b in result], time.time() - st
+        return np.array(result, dtype=np.float32), time.time() - st
+
+    def merge_fragments(self, fragments, complete):
+        """
+        Drop the fragments mostly covered by a complete box and join the
+        overlapping rest into their minimum area rectangle.
+        """
+        complete_polys = [points2polygon(b) for b in complete]
+        polys, remain = [], []
+        for box in fragments:
+            poly = points2polygon(box)
+            if poly.area <= 0:
+                continue
+            if any(
+                    poly.intersection(c).area > 0.5 * poly.area
+                    for c in complete_polys):
+                continue
+            polys.append(poly)
+            remain.append(box)
+
+        # union find over overlapping fragments
+        parent = list(range(len(remain)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i in range(len(remain)):
+            for j in range(i + 1, len(remain)):
+                if polys[i].intersects(polys[j]):
+                    parent[find(i)] = find(j)
+        groups = {}
+        for i in range(len(remain)):
+            groups.setdefault(find(i), []).append(remain[i])
+        merged = []
+        for group in groups.values():
+            if len(group) == 1:
+                merged.append(group[0])
+                continue
+            points = np.concatenate(group).astype(np.float32)
+            rect = cv2.boxPoints(cv2.minAreaRect(points))
+            merged.append(self.order_points_clockwise(rect))
+        return merged
+
 
 if __name__ == "__main__":
     args = utility.parse_args()
@@ -74,8 +74,8 @@ class TextE2E(object):
 
         self.preprocess_op = create_operators(pre_process_list)
         self.postprocess_op = build_post_process(postprocess_params)
-        self.predictor, self.input_tensor, self.output_tensors, _ = utility.create_predictor(
-            args, 'e2e', logger)  # paddle.jit.load(args.det_model_dir)
+        self.predictor, self.input_tensor, self.output_tensors, _ = utility.get_predictor(
+            args, 'e2e', logger, owner=self)  # paddle.jit.load(args.det_model_dir)
         # self.predictor.eval()
 
     def clip_det_res(self, points, img_height, img_width):
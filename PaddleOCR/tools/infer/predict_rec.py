@@ -118,7 +118,7 @@ class TextRecognizer(object):
         self.postprocess_op = build_post_process(postprocess_params)
         self.postprocess_params = postprocess_params
         self.predictor, self.input_tensor, self.output_tensors, self.config = \
-            utility.create_predictor(args, 'rec', logger)
+            utility.get_predictor(args, 'rec', logger, owner=self)
         self.benchmark = args.benchmark
         self.use_onnx = args.use_onnx
         if args.benchmark:
@@ -141,8 +141,24 @@ class TextRecognizer(object):
                 warmup=0,
                 logger=logger)
         self.return_word_box = args.return_word_box
-
-    def resize_norm_img(self, img, max_wh_ratio):
+        # width buckets only for models padding the batch to its widest crop
+        self.rec_width_buckets = []
+        if args.rec_width_buckets and not self.use_onnx and \
+                self.rec_algorithm in ['CRNN', 'Rosetta', 'SVTR_LCNet']:
+            self.rec_width_buckets = sorted(
+                int(v) for v in args.rec_width_buckets.split(',') if v.strip())
+        self.rec_batch_pixels = args.rec_batch_pixels
+        # batches of the plain resize_norm_img path are assembled in place
+        self.input_arena = None
+        if self.rec_algorithm in ['CRNN', 'Rosetta', 'SVTR_LCNet']:
+            self.input_arena = utility.InputArena()
+
+    def resize_norm_img(self, img, max_wh_ratio, out=None):
+        """
+        Resize and normalize img into a [C, H, W] float32 image padded to
+        max_wh_ratio. For the plain path out can be a preallocated slot
+        which is filled in place and returned.
+        """
         imgC, imgH, imgW = self.rec_image_shape
         if self.rec_algorithm == 'NRTR' or self.rec_algorithm == 'ViTSTR':
             img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
@@ -189,6 +205,8 @@ class TextRecognizer(object):
                 resized_w = self.rec_image_shape[2]
             imgW = self.rec_image_shape[2]
         resized_image = cv2.resize(img, (resized_w, imgH))
+        if out is not None:
+            return utility.norm_img_into(resized_image, out)
         resized_image = resized_image.astype('float32')
         resized_image = resized_image.transpose((2, 0, 1)) / 255
         resized_image -= 0.5
@@ -197,6 +215,21 @@ class TextRecognizer(object):
         padding_im[:, :, 0:resized_w] = resized_image
         return padding_im
 
+    def get_batch_buffer(self, batch_size, max_wh_ratio):
+        """
+        Slot buffer of the batch in the input arena, None for algorithms
+        that build their batch by concatenation.
+        """
+        if self.input_arena is None:
+            return None
+        imgC, imgH, imgW = self.rec_image_shape
+        imgW = int((imgH * max_wh_ratio))
+        if self.use_onnx:
+            w = self.input_tensor.shape[3:][0]
+            if w is not None and w > 0:
+                imgW = w
+        return self.input_arena.get((batch_size, imgC, imgH, imgW))
+
     def resize_norm_img_vl(self, img, image_shape):
 
         imgC, imgH, imgW = image_shape
@@ -384,21 +417,68 @@ class TextRecognizer(object):
 
         return img
 
-    def __call__(self, img_list):
+    def get_batches(self, img_list):
+        """
+        Order the crops and cut them into batches.
+        Without width buckets the crops are sorted by aspect ratio and cut
+        into groups of rec_batch_num padded to their widest crop. With
+        buckets every crop goes to the narrowest bucket it fits (crops
+        wider than the last bucket to a multiple of it), all batches of a
+        bucket share its width and hold as many crops as fit in
+        rec_batch_pixels, so padding and the number of input shapes stay
+        bounded.
+        return:
+            indices(array): crop order
+            batches(list): (beg, end, max_wh_ratio) over indices,
+                max_wh_ratio is None when the batch pads to its widest crop
+        """
         img_num = len(img_list)
         # Calculate the aspect ratio of all text bars
-        width_list = []
-        for img in img_list:
-            width_list.append(img.shape[1] / float(img.shape[0]))
-        # Sorting can speed up the recognition process
-        indices = np.argsort(np.array(width_list))
+        width_list = np.array(
+            [img.shape[1] / float(img.shape[0]) for img in img_list])
+        if len(self.rec_width_buckets) == 0:
+            # Sorting can speed up the recognition process
+            indices = np.argsort(width_list)
+            batch_num = self.rec_batch_num
+            batches = [(beg, min(img_num, beg + batch_num), None)
+                       for beg in range(0, img_num, batch_num)]
+            return indices, batches
+
+        imgH = self.rec_image_shape[1]
+        buckets = np.array(self.rec_width_buckets)
+        need_w = np.ceil(imgH * width_list)
+        bucket_idx = np.searchsorted(buckets, need_w)
+        bucket_w = np.where(
+            bucket_idx < len(buckets),
+            buckets[np.minimum(bucket_idx, len(buckets) - 1)],
+            np.ceil(need_w / buckets[-1]) * buckets[-1])
+        indices = np.lexsort((width_list, bucket_w))
+        pixel_budget = self.rec_batch_pixels
+        if pixel_budget <= 0:
+            pixel_budget = self.rec_batch_num * imgH * buckets[0]
+
+        batches = []
+        sorted_w = bucket_w[indices]
+        _, starts = np.unique(sorted_w, return_index=True)
+        ends = list(starts[1:]) + [img_num]
+        for beg, end in zip(starts, ends):
+            width = sorted_w[beg]
+            batch_num = max(1, int(pixel_budget // (imgH * width)))
+            # + 0.5 so that int(imgH * max_wh_ratio) gives the bucket width
+            max_wh_ratio = (width + 0.5) / imgH
+            for batch_beg in range(beg, end, batch_num):
+                batches.append((batch_beg, min(end, batch_beg + batch_num),
+                                max_wh_ratio))
+        return indices, batches
+
+    def __call__(self, img_list):
+        img_num = len(img_list)
+        indices, batches = self.get_batches(img_list)
         rec_res = [['', 0.0]] * img_num
-        batch_num = self.rec_batch_num
         st = time.time()
         if self.benchmark:
             self.autolog.times.start()
-        for beg_img_no in range(0, img_num, batch_num):
-            end_img_no = min(img_num, beg_img_no + batch_num)
+        for beg_img_no, end_img_no, bucket_wh_ratio in batches:
             norm_img_batch = []
             if self.rec_algorithm == "SRN":
                 encoder_word_pos_list = []
@@ -415,6 +495,10 @@ class TextRecognizer(object):
                 wh_ratio = w * 1.0 / h
                 max_wh_ratio = max(max_wh_ratio, wh_ratio)
                 wh_ratio_list.append(wh_ratio)
+            if bucket_wh_ratio is not None:
+                max_wh_ratio = bucket_wh_ratio
+            batch_buffer = self.get_batch_buffer(end_img_no - beg_img_no,
+                                                 max_wh_ratio)
             for ino in range(beg_img_no, end_img_no):
                 if self.rec_algorithm == "SAR":
                     norm_img, _, _, valid_ratio = self.resize_norm_img_sar(
@@ -475,13 +559,21 @@ class TextRecognizer(object):
                     word_label_list = []
                     norm_img_mask_batch.append(norm_image_mask)
                     word_label_list.append(word_label)
+                elif batch_buffer is not None:
+                    self.resize_norm_img(
+                        img_list[indices[ino]],
+                        max_wh_ratio,
+                        out=batch_buffer[ino - beg_img_no])
                 else:
                     norm_img = self.resize_norm_img(img_list[indices[ino]],
                                                     max_wh_ratio)
                     norm_img = norm_img[np.newaxis, :]
                     norm_img_batch.append(norm_img)
-            norm_img_batch = np.concatenate(norm_img_batch)
-            norm_img_batch = norm_img_batch.copy()
+            if batch_buffer is not None:
+                norm_img_batch = batch_buffer
+            else:
+                norm_img_batch = np.concatenate(norm_img_batch)
+                norm_img_batch = norm_img_batch.copy()
             if self.benchmark:
                 self.autolog.times.stamp()
 
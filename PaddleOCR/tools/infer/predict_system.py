@@ -23,35 +23,118 @@ os.environ["FLAGS_allocator_strategy"] = 'auto_growth'
 
 import cv2
 import copy
+import itertools
 import numpy as np
 import json
 import time
 import logging
 from PIL import Image
 import tools.infer.utility as utility
-import tools.infer.predict_rec as predict_rec
-import tools.infer.predict_det as predict_det
-import tools.infer.predict_cls as predict_cls
-from ppocr.utils.utility import get_image_file_list, check_and_read
+from ppocr.utils.utility import get_image_file_list, check_and_read, is_pdf_file
 from ppocr.utils.logging import get_logger
-from tools.infer.utility import draw_ocr_box_txt, get_rotate_crop_image, get_minarea_rect_crop
+from ppocr.utils.reading_order import reading_order
+from ppocr.utils.ocr_cache import OCRResultCache, CachedTextRecognizer, args_fingerprint
+from tools.infer.utility import draw_ocr_box_txt, get_rotate_crop_image, get_minarea_rect_crop, get_minarea_rect, CropEngine
 logger = get_logger()
 
 
 class TextSystem(object):
+    text_detector = utility.LazyAttribute('create_text_detector')
+    text_recognizer = utility.LazyAttribute('create_text_recognizer')
+    text_classifier = utility.LazyAttribute('create_text_classifier')
+
     def __init__(self, args):
         if not args.show_log:
             logger.setLevel(logging.INFO)
 
-        self.text_detector = predict_det.TextDetector(args)
-        self.text_recognizer = predict_rec.TextRecognizer(args)
+        self.args = args
         self.use_angle_cls = args.use_angle_cls
         self.drop_score = args.drop_score
+        if hasattr(os, 'sched_getaffinity'):
+            cpu_num = len(os.sched_getaffinity(0))
+        else:
+            cpu_num = os.cpu_count() or 1
+        self.crop_engine = CropEngine(
+            min(args.crop_num_threads, cpu_num), args.crop_axis_aligned_tol)
+        self.crop_image_res_index = 0
+
+        # with lazy_init the predictors are created on first use
+        if not args.lazy_init:
+            self.build()
+
+    def build(self):
+        """
+        Create the predictors that are not created yet.
+        """
+        self.text_detector
+        self.text_recognizer
         if self.use_angle_cls:
-            self.text_classifier = predict_cls.TextClassifier(args)
+            self.text_classifier
 
-        self.args = args
-        self.crop_image_res_index = 0
+    def close(self):
+        """
+        Stop the crop threads. Replicas of clone_engine share them.
+        """
+        self.crop_engine.close()
+
+    def create_text_detector(self):
+        import tools.infer.predict_det as predict_det
+        return predict_det.TextDetector(self.args)
+
+    def create_text_recognizer(self):
+        import tools.infer.predict_rec as predict_rec
+        text_recognizer = predict_rec.TextRecognizer(self.args)
+        if self.args.rec_crop_cache_size > 0:
+            text_recognizer = CachedTextRecognizer(
+                text_recognizer,
+                OCRResultCache(
+                    self.args.rec_crop_cache_size,
+                    disk_dir=self.args.ocr_cache_dir,
+                    disk_max_mb=self.args.ocr_cache_disk_mb,
+                    name='rec_crop_cache'),
+                args_fingerprint(self.args))
+        return text_recognizer
+
+    def create_text_classifier(self):
+        import tools.infer.predict_cls as predict_cls
+        return predict_cls.TextClassifier(self.args)
+
+    def prewarm(self,
+                det_shapes=((640, 640), (960, 960)),
+                rec_widths=(80, 160, 320, 640),
+                cls=True):
+        """
+        Create the predictors and run each once on blank inputs of
+        representative shapes, so the first request does not pay for model
+        loading and shape specific initialization.
+        args:
+            det_shapes: (h, w) of the detector inputs
+            rec_widths: widths of the text lines fed to cls and rec, their
+                height is the one of rec_image_shape
+            cls: also prewarm the angle classifier
+        return:
+            seconds spent per predictor
+        """
+        self.build()
+        time_dict = {'det': 0, 'rec': 0, 'cls': 0}
+        st = time.time()
+        for h, w in det_shapes:
+            self.text_detector(np.full((h, w, 3), 255, dtype=np.uint8))
+        time_dict['det'] = time.time() - st
+
+        rec_h = int(self.args.rec_image_shape.split(',')[1])
+        img_list = [
+            np.full((rec_h, w, 3), 255, dtype=np.uint8) for w in rec_widths
+        ]
+        if self.use_angle_cls and cls and len(img_list) > 0:
+            st = time.time()
+            self.text_classifier(img_list)
+            time_dict['cls'] = time.time() - st
+        if len(img_list) > 0:
+            st = time.time()
+            self.text_recognizer(img_list)
+            time_dict['rec'] = time.time() - st
+        return time_dict
 
     def draw_crop_rec_res(self, output_dir, img_crop_list, rec_res):
         os.makedirs(output_dir, exist_ok=True)
@@ -64,6 +147,25 @@ class TextSystem(object):
             logger.debug(f"{bno}, {rec_res[bno]}")
         self.crop_image_res_index += bbox_num
 
+    def get_crop_images(self, ori_im, dt_boxes):
+        if len(dt_boxes) == 0:
+            return []
+        if self.args.det_box_type == "quad":
+            quads = dt_boxes
+        else:
+            quads = [get_minarea_rect(box) for box in dt_boxes]
+        img_crop_list, _ = self.crop_engine(ori_im, quads)
+        return img_crop_list
+
+    def filter_rec_res(self, dt_boxes, rec_res):
+        filter_boxes, filter_rec_res = [], []
+        for box, rec_result in zip(dt_boxes, rec_res):
+            text, score = rec_result[0], rec_result[1]
+            if score >= self.drop_score:
+                filter_boxes.append(box)
+                filter_rec_res.append(rec_result)
+        return filter_boxes, filter_rec_res
+
     def __call__(self, img, cls=True):
         time_dict = {'det': 0, 'rec': 0, 'cls': 0, 'all': 0}
 
@@ -84,17 +186,11 @@ class TextSystem(object):
         else:
             logger.debug("dt_boxes num : {}, elapsed : {}".format(
                 len(dt_boxes), elapse))
-        img_crop_list = []
-
-        dt_boxes = sorted_boxes(dt_boxes)
 
-        for bno in range(len(dt_boxes)):
-            tmp_box = copy.deepcopy(dt_boxes[bno])
-            if self.args.det_box_type == "quad":
-                img_crop = get_rotate_crop_image(ori_im, tmp_box)
-            else:
-                img_crop = get_minarea_rect_crop(ori_im, tmp_box)
-            img_crop_list.append(img_crop)
+        dt_boxes = sorted_boxes(dt_boxes, self.args.multi_column_order,
+                                self.args.reading_order_overlap_thresh,
+                                self.args.legacy_reading_order)
+        img_crop_list = self.get_crop_images(ori_im, dt_boxes)
         if self.use_angle_cls and cls:
             img_crop_list, angle_list, elapse = self.text_classifier(
                 img_crop_list)
@@ -109,45 +205,134 @@ class TextSystem(object):
         if self.args.save_crop_res:
             self.draw_crop_rec_res(self.args.crop_res_save_dir, img_crop_list,
                                    rec_res)
-        filter_boxes, filter_rec_res = [], []
-        for box, rec_result in zip(dt_boxes, rec_res):
-            text, score = rec_result[0], rec_result[1]
-            if score >= self.drop_score:
-                filter_boxes.append(box)
-                filter_rec_res.append(rec_result)
+        filter_boxes, filter_rec_res = self.filter_rec_res(dt_boxes, rec_res)
         end = time.time()
         time_dict['all'] = end - start
         return filter_boxes, filter_rec_res, time_dict
 
+    def ocr_regions(self, img, regions, det=False, cls=True):
+        """
+        OCR only the given regions of img, without a full page detection.
+        args:
+            img(ndarray): the page
+            regions(list): quads or polygons with shape [K, 2], polygons
+                are replaced by their minimum area rectangle
+            det(bool): False recognizes every region as one text line, True
+                detects the lines inside each region first
+            cls(bool): run the angle classifier on the crops
+        return:
+            one result per region, (text, score) when det is False, else a
+            list of (box, (text, score)) with boxes in page coordinates;
+            and the time_dict
+        """
+        time_dict = {'det': 0, 'rec': 0, 'cls': 0, 'all': 0}
+        start = time.time()
+        quads = [
+            np.array(region, dtype=np.float32).reshape(-1, 2)
+            for region in regions
+        ]
+        quads = [
+            quad if len(quad) == 4 else get_minarea_rect(quad)
+            for quad in quads
+        ]
+        if det:
+            roi_imgs, M = self.crop_engine(img, quads, auto_rotate=False)
+            dt_boxes_list, elapse = self.text_detector.batch(roi_imgs)
+            time_dict['det'] = elapse
+            region_index, dt_boxes = [], []
+            for idx, roi_boxes in enumerate(dt_boxes_list):
+                if roi_boxes is None or len(roi_boxes) == 0:
+                    continue
+                # back from the rectified region to the page
+                roi_boxes = [
+                    cv2.perspectiveTransform(
+                        np.array(
+                            box, dtype=np.float32).reshape(-1, 1, 2),
+                        np.linalg.inv(M[idx])).reshape(-1, 2)
+                    for box in roi_boxes
+                ]
+                roi_boxes = sorted_boxes(
+                    roi_boxes,
+                    overlap_thresh=self.args.reading_order_overlap_thresh,
+                    legacy=self.args.legacy_reading_order)
+                region_index += [idx] * len(roi_boxes)
+                dt_boxes += list(roi_boxes)
+            crop_quads = [
+                box if len(box) == 4 else get_minarea_rect(box)
+                for box in dt_boxes
+            ]
+            img_crop_list, _ = self.crop_engine(img, crop_quads)
+        else:
+            img_crop_list, _ = self.crop_engine(img, quads)
+
+        if len(img_crop_list) > 0:
+            if self.use_angle_cls and cls:
+                img_crop_list, angle_list, elapse = self.text_classifier(
+                    img_crop_list)
+                time_dict['cls'] = elapse
+            rec_res, elapse = self.text_recognizer(img_crop_list)
+            time_dict['rec'] = elapse
+        else:
+            rec_res = []
+
+        if det:
+            results = [[] for _ in quads]
+            for idx, box, res in zip(region_index, dt_boxes, rec_res):
+                if res[1] >= self.drop_score:
+                    results[idx].append((box, res))
+        else:
+            results = list(rec_res)
+        time_dict['all'] = time.time() - start
+        return results, time_dict
 
-def sorted_boxes(dt_boxes):
+
+def sorted_boxes(dt_boxes, multi_column=False, overlap_thresh=0.4,
+                 legacy=False):
     """
     Sort text boxes in order from top to bottom, left to right
     args:
         dt_boxes(array):detected text boxes with shape [4, 2]
+        multi_column(bool): read the columns of the page one after another
+        overlap_thresh(float): share of the box height that separates lines
+        legacy(bool): order with the rule of the former sorted_boxes
     return:
         sorted boxes(array) with shape [4, 2]
     """
-    num_boxes = dt_boxes.shape[0]
-    sorted_boxes = sorted(dt_boxes, key=lambda x: (x[0][1], x[0][0]))
-    _boxes = list(sorted_boxes)
-
-    for i in range(num_boxes - 1):
-        for j in range(i, -1, -1):
-            if abs(_boxes[j + 1][0][1] - _boxes[j][0][1]) < 10 and \
-                    (_boxes[j + 1][0][0] < _boxes[j][0][0]):
-                tmp = _boxes[j]
-                _boxes[j] = _boxes[j + 1]
-                _boxes[j + 1] = tmp
-            else:
-                break
-    return _boxes
+    order = reading_order(
+        dt_boxes, overlap_thresh, multi_column=multi_column, legacy=legacy)
+    return [dt_boxes[i] for i in order]
+
+
+def iter_pages(image_file_list, args):
+    """
+    Yield (idx, image_file, page_index, img, flag_gif, flag_pdf) for every
+    image and every pdf page of image_file_list.
+    """
+    for idx, image_file in enumerate(image_file_list):
+        if is_pdf_file(image_file):
+            # pages are rendered on demand while the previous one is predicted
+            for index, img in enumerate(
+                    utility.read_pdf_by_args(image_file, args),
+                    args.page_start):
+                yield idx, image_file, index, img, False, True
+            continue
+        img, flag_gif, _ = check_and_read(image_file)
+        if not flag_gif:
+            img = cv2.imread(image_file)
+        if img is None:
+            logger.debug("error in loading image:{}".format(image_file))
+            continue
+        yield idx, image_file, 0, img, flag_gif, False
 
 
 def main(args):
     image_file_list = get_image_file_list(args.image_dir)
     image_file_list = image_file_list[args.process_id::args.total_process_num]
-    text_sys = TextSystem(args)
+    if args.worker_num > 0:
+        from tools.infer.worker_pool import OCRWorkerPool
+        text_sys = OCRWorkerPool(args)
+    else:
+        text_sys = TextSystem(args)
     is_visualize = True
     font_path = args.vis_font_path
     drop_score = args.drop_score
@@ -170,82 +355,75 @@ def main(args):
     cpu_mem, gpu_mem, gpu_util = 0, 0, 0
     _st = time.time()
     count = 0
-    for idx, image_file in enumerate(image_file_list):
+    pages, pred_pages = itertools.tee(iter_pages(image_file_list, args))
+    if args.worker_num > 0:
+        # keep the workers busy, results still come back in input order
+        results = text_sys.imap(page[3] for page in pred_pages)
+    else:
+        results = (text_sys(page[3]) for page in pred_pages)
+    for (idx, image_file, index, img, flag_gif, flag_pdf), (
+            dt_boxes, rec_res, time_dict) in zip(pages, results):
+        elapse = time_dict['all']
+        total_time += elapse
+        if flag_pdf:
+            logger.debug(
+                str(idx) + '_' + str(index) + "  Predict time of %s: %.3fs" %
+                (image_file, elapse))
+        else:
+            logger.debug(
+                str(idx) + "  Predict time of %s: %.3fs" % (image_file,
+                                                            elapse))
+        for text, score in rec_res:
+            logger.debug("{}, {:.3f}".format(text, score))
 
-        img, flag_gif, flag_pdf = check_and_read(image_file)
-        if not flag_gif and not flag_pdf:
-            img = cv2.imread(image_file)
-        if not flag_pdf:
-            if img is None:
-                logger.debug("error in loading image:{}".format(image_file))
-                continue
-            imgs = [img]
+        res = [{
+            "transcription": rec_res[i][0],
+            "points": np.array(dt_boxes[i]).astype(np.int32).tolist(),
+        } for i in range(len(dt_boxes))]
+        if flag_pdf:
+            save_pred = os.path.basename(image_file) + '_' + str(
+                index) + "\t" + json.dumps(
+                    res, ensure_ascii=False) + "\n"
         else:
-            page_num = args.page_num
-            if page_num > len(img) or page_num == 0:
-                page_num = len(img)
-            imgs = img[:page_num]
-        for index, img in enumerate(imgs):
-            starttime = time.time()
-            dt_boxes, rec_res, time_dict = text_sys(img)
-            elapse = time.time() - starttime
-            total_time += elapse
-            if len(imgs) > 1:
-                logger.debug(
-                    str(idx) + '_' + str(index) + "  Predict time of %s: %.3fs"
-                    % (image_file, elapse))
-            else:
-                logger.debug(
-                    str(idx) + "  Predict time of %s: %.3fs" % (image_file,
-                                                                elapse))
-            for text, score in rec_res:
-                logger.debug("{}, {:.3f}".format(text, score))
-
-            res = [{
-                "transcription": rec_res[i][0],
-                "points": np.array(dt_boxes[i]).astype(np.int32).tolist(),
-            } for i in range(len(dt_boxes))]
-            if len(imgs) > 1:
-                save_pred = os.path.basename(image_file) + '_' + str(
-                    index) + "\t" + json.dumps(
-                        res, ensure_ascii=False) + "\n"
+            save_pred = os.path.basename(image_file) + "\t" + json.dumps(
+                res, ensure_ascii=False) + "\n"
+        save_results.append(save_pred)
+
+        if is_visualize:
+            image = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+            boxes = dt_boxes
+            txts = [rec_res[i][0] for i in range(len(rec_res))]
+            scores = [rec_res[i][1] for i in range(len(rec_res))]
+
+            draw_img = draw_ocr_box_txt(
+                image,
+                boxes,
+                txts,
+                scores,
+                drop_score=drop_score,
+                font_path=font_path)
+            if flag_gif:
+                save_file = image_file[:-3] + "png"
+            elif flag_pdf:
+                save_file = image_file.replace('.pdf',
+                                               '_' + str(index) + '.png')
             else:
-                save_pred = os.path.basename(image_file) + "\t" + json.dumps(
-                    res, ensure_ascii=False) + "\n"
-            save_results.append(save_pred)
-
-            if is_visualize:
-                image = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
-                boxes = dt_boxes
-                txts = [rec_res[i][0] for i in range(len(rec_res))]
-                scores = [rec_res[i][1] for i in range(len(rec_res))]
-
-                draw_img = draw_ocr_box_txt(
-                    image,
-                    boxes,
-                    txts,
-                    scores,
-                    drop_score=drop_score,
-                    font_path=font_path)
-                if flag_gif:
-                    save_file = image_file[:-3] + "png"
-                elif flag_pdf:
-                    save_file = image_file.replace('.pdf',
-                                                   '_' + str(index) + '.png')
-                else:
-                    save_file = image_file
-                cv2.imwrite(
-                    os.path.join(draw_img_save_dir,
-                                 os.path.basename(save_file)),
-                    draw_img[:, :, ::-1])
-                logger.debug("The visualized image saved in {}".format(
-                    os.path.join(draw_img_save_dir, os.path.basename(
-                        save_file))))
+                save_file = image_file
+            cv2.imwrite(
+                os.path.join(draw_img_save_dir, os.path.basename(save_file)),
+                draw_img[:, :, ::-1])
+            logger.debug("The visualized image saved in {}".format(
+                os.path.join(draw_img_save_dir, os.path.basename(save_file))))
 
     logger.info("The predict total time is {}".format(time.time() - _st))
-    if args.benchmark:
-        text_sys.text_detector.autolog.report()
-        text_sys.text_recognizer.autolog.report()
+    if args.worker_num > 0:
+        text_sys.log_stats()
+        text_sys.close()
+    else:
+        if args.benchmark:
+            text_sys.text_detector.autolog.report()
+            text_sys.text_recognizer.autolog.report()
+        text_sys.close()
 
     with open(
             os.path.join(draw_img_save_dir, "system_results.txt"),
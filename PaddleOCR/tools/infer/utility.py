@@ -13,17 +13,19 @@
 # limitations under the License.
 
 import argparse
+import copy
 import os
 import sys
 import platform
 import cv2
 import numpy as np
-import paddle
 from PIL import Image, ImageDraw, ImageFont
 import math
-from paddle import inference
 import time
 import random
+import threading
+import types
+import weakref
 from ppocr.utils.logging import get_logger
 
 
@@ -52,6 +54,9 @@ def init_args():
     # params for text detector
     parser.add_argument("--image_dir", type=str)
     parser.add_argument("--page_num", type=int, default=0)
+    parser.add_argument("--page_start", type=int, default=0)
+    parser.add_argument("--pdf_dpi", type=int, default=None)
+    parser.add_argument("--pdf_prefetch", type=int, default=2)
     parser.add_argument("--det_algorithm", type=str, default='DB')
     parser.add_argument("--det_model_dir", type=str)
     parser.add_argument("--det_limit_side_len", type=float, default=960)
@@ -65,6 +70,11 @@ def init_args():
     parser.add_argument("--max_batch_size", type=int, default=10)
     parser.add_argument("--use_dilation", type=str2bool, default=False)
     parser.add_argument("--det_db_score_mode", type=str, default="fast")
+    parser.add_argument("--det_db_vectorized", type=str2bool, default=False)
+    parser.add_argument("--det_batch_num", type=int, default=4)
+    parser.add_argument("--det_tile_size", type=int, default=0)
+    parser.add_argument("--det_tile_overlap", type=int, default=128)
+    parser.add_argument("--det_tile_nms_thresh", type=float, default=0.3)
 
     # EAST parmas
     parser.add_argument("--det_east_score_thresh", type=float, default=0.8)
@@ -93,6 +103,8 @@ def init_args():
     parser.add_argument("--rec_image_inverse", type=str2bool, default=True)
     parser.add_argument("--rec_image_shape", type=str, default="3, 48, 320")
     parser.add_argument("--rec_batch_num", type=int, default=6)
+    parser.add_argument("--rec_width_buckets", type=str, default="")
+    parser.add_argument("--rec_batch_pixels", type=int, default=0)
     parser.add_argument("--max_text_length", type=int, default=25)
     parser.add_argument(
         "--rec_char_dict_path",
@@ -102,6 +114,13 @@ def init_args():
     parser.add_argument(
         "--vis_font_path", type=str, default="./doc/fonts/simfang.ttf")
     parser.add_argument("--drop_score", type=float, default=0.5)
+    parser.add_argument("--multi_column_order", type=str2bool, default=False)
+    parser.add_argument(
+        "--reading_order_overlap_thresh", type=float, default=0.4)
+    parser.add_argument(
+        "--legacy_reading_order", type=str2bool, default=False)
+    parser.add_argument("--crop_num_threads", type=int, default=4)
+    parser.add_argument("--crop_axis_aligned_tol", type=float, default=0.)
 
     # params for e2e
     parser.add_argument("--e2e_algorithm", type=str, default='PGNet')
@@ -143,8 +162,29 @@ def init_args():
     # multi-process
     parser.add_argument("--use_mp", type=str2bool, default=False)
     parser.add_argument("--total_process_num", type=int, default=1)
+    parser.add_argument("--worker_num", type=int, default=0)
+    parser.add_argument("--worker_cores", type=int, default=0)
     parser.add_argument("--process_id", type=int, default=0)
 
+    # dynamic batching
+    parser.add_argument("--batch_max_images", type=int, default=8)
+    parser.add_argument("--batch_wait_ms", type=float, default=5)
+
+    # pipelined det/cls/rec
+    parser.add_argument("--pipeline_queue_size", type=int, default=4)
+
+    # shared predictors, lazy init and async api
+    parser.add_argument("--share_predictors", type=str2bool, default=True)
+    parser.add_argument("--lazy_init", type=str2bool, default=False)
+    parser.add_argument("--async_workers", type=int, default=2)
+    parser.add_argument("--async_max_pending", type=int, default=0)
+
+    # result caches
+    parser.add_argument("--ocr_cache_size", type=int, default=0)
+    parser.add_argument("--rec_crop_cache_size", type=int, default=0)
+    parser.add_argument("--ocr_cache_dir", type=str, default=None)
+    parser.add_argument("--ocr_cache_disk_mb", type=int, default=512)
+
     parser.add_argument("--benchmark", type=str2bool, default=False)
     parser.add_argument("--save_log_path", type=str, default="./log_output/")
 
@@ -162,7 +202,21 @@ def parse_args():
     return parser.parse_args()
 
 
-def create_predictor(args, mode, logger):
+def read_pdf_by_args(pdf_path, args):
+    """
+    Page generator of a pdf honoring page_start, page_num, pdf_dpi and
+    pdf_prefetch.
+    """
+    from ppocr.utils.utility import read_pdf_pages
+    stop = args.page_start + args.page_num if args.page_num > 0 else None
+    return read_pdf_pages(
+        pdf_path,
+        dpi=args.pdf_dpi,
+        page_range=(args.page_start, stop),
+        prefetch_num=args.pdf_prefetch)
+
+
+def get_model_dir(args, mode):
     if mode == "det":
         model_dir = args.det_model_dir
     elif mode == 'cls':
@@ -181,6 +235,11 @@ def create_predictor(args, mode, logger):
         model_dir = args.layout_model_dir
     else:
         model_dir = args.e2e_model_dir
+    return model_dir
+
+
+def create_predictor(args, mode, logger):
+    model_dir = get_model_dir(args, mode)
 
     if model_dir is None:
         logger.info("not find {} model file path {}".format(mode, model_dir))
@@ -195,6 +254,7 @@ def create_predictor(args, mode, logger):
         return sess, sess.get_inputs()[0], None, None
 
     else:
+        from paddle import inference
         file_names = ['model', 'inference']
         for file_name in file_names:
             model_file_path = '{}/{}.pdmodel'.format(model_dir, file_name)
@@ -287,18 +347,165 @@ def create_predictor(args, mode, logger):
 
         # create predictor
         predictor = inference.create_predictor(config)
-        input_names = predictor.get_input_names()
-        if mode in ['ser', 're']:
-            input_tensor = []
-            for name in input_names:
-                input_tensor.append(predictor.get_input_handle(name))
-        else:
-            for name in input_names:
-                input_tensor = predictor.get_input_handle(name)
+        input_tensor = get_input_tensors(mode, predictor)
         output_tensors = get_output_tensors(args, mode, predictor)
         return predictor, input_tensor, output_tensors, config
 
 
+# args that change how create_predictor builds a predictor
+PREDICTOR_KEY_ARGS = [
+    'use_onnx', 'use_gpu', 'gpu_mem', 'gpu_id', 'use_xpu', 'use_npu',
+    'use_mlu', 'use_tensorrt', 'precision', 'max_batch_size',
+    'min_subgraph_size', 'enable_mkldnn', 'cpu_threads'
+]
+
+# key -> {'entry': create_predictor result, 'owners': number of live owners,
+# 'pinned': requested without owner}
+_predictor_registry = {}
+_predictor_registry_lock = threading.Lock()
+
+
+def _release_predictor(key, item):
+    with _predictor_registry_lock:
+        item['owners'] -= 1
+        if item['owners'] <= 0 and not item['pinned'] and \
+                _predictor_registry.get(key) is item:
+            del _predictor_registry[key]
+
+
+def get_predictor(args, mode, logger, owner=None):
+    """
+    create_predictor through a process-wide registry keyed by the model dir
+    and the predictor config. The first request of a key loads the model,
+    later ones get a predictor.clone() of it, which shares the weights but
+    can run in parallel. onnxruntime sessions are thread safe and shared
+    as they are. Disabled by --share_predictors false.
+    A model stays registered while one of the owners it was requested for
+    (the detector, recognizer... using the predictor) is alive, models
+    requested without owner until clear_predictor_registry.
+    """
+    if not getattr(args, 'share_predictors', True):
+        return create_predictor(args, mode, logger)
+    model_dir = get_model_dir(args, mode)
+    key = (os.getpid(), mode, model_dir and os.path.abspath(model_dir)) + \
+        tuple(getattr(args, name, None) for name in PREDICTOR_KEY_ARGS)
+    with _predictor_registry_lock:
+        item = _predictor_registry.get(key)
+        created = item is None
+        if created:
+            item = {
+                'entry': create_predictor(args, mode, logger),
+                'owners': 0,
+                'pinned': False
+            }
+            _predictor_registry[key] = item
+        if owner is None:
+            item['pinned'] = True
+        else:
+            item['owners'] += 1
+            weakref.finalize(owner, _release_predictor, key, item)
+    entry = item['entry']
+    if created or args.use_onnx:
+        return entry
+    predictor, input_tensor, output_tensors, config = entry
+    predictor = predictor.clone()
+    logger.debug("share the {} model of {}".format(mode, model_dir))
+    return predictor, get_input_tensors(mode, predictor), get_output_tensors(
+        args, mode, predictor), config
+
+
+def clear_predictor_registry():
+    """
+    Forget the registered predictors, their weights are freed once the
+    predictors handed out are gone too.
+    """
+    with _predictor_registry_lock:
+        _predictor_registry.clear()
+
+
+def get_input_tensors(mode, predictor):
+    input_names = predictor.get_input_names()
+    if mode in ['ser', 're']:
+        input_tensor = []
+        for name in input_names:
+            input_tensor.append(predictor.get_input_handle(name))
+    else:
+        for name in input_names:
+            input_tensor = predictor.get_input_handle(name)
+    return input_tensor
+
+
+def _is_paddle_predictor(obj):
+    return hasattr(obj, 'clone') and hasattr(obj, 'get_input_handle')
+
+
+def _is_tensor_handle(obj):
+    return hasattr(obj, 'copy_from_cpu') and hasattr(obj, 'copy_to_cpu')
+
+
+def _renew_handles(value, predictor):
+    """
+    The handles of predictor with the names of the handles in value (one
+    handle or a list of them), None if value holds no handle.
+    """
+    if isinstance(value, (list, tuple)):
+        if len(value) == 0 or not all(_is_tensor_handle(v) for v in value):
+            return None
+        return [_renew_handles(v, predictor) for v in value]
+    if not _is_tensor_handle(value):
+        return None
+    if value.name() in predictor.get_input_names():
+        return predictor.get_input_handle(value.name())
+    return predictor.get_output_handle(value.name())
+
+
+def clone_engine(engine, skip=(), _memo=None):
+    """
+    Replica of an inference engine (TextDetector, TextSystem, PaddleOCR,
+    StructureSystem...) that may run in another thread at the same time as
+    engine. Paddle predictors are replaced by predictor.clone(), which
+    shares the weights, their tensor handles are fetched from the clone and
+    input arenas are renewed. Everything else, args, pre and post process
+    ops, caches and onnxruntime sessions (which are thread safe), is shared.
+    args:
+        skip: names of attributes that are shared without being cloned
+    """
+    memo = {} if _memo is None else _memo
+    if id(engine) in memo:
+        return memo[id(engine)]
+    memo[id(engine)] = engine
+    attrs = getattr(engine, '__dict__', None)
+    if attrs is None:
+        return engine
+
+    new_attrs = {}
+    predictor = None
+    for name, value in attrs.items():
+        if name not in skip and _is_paddle_predictor(value):
+            predictor = new_attrs[name] = value.clone()
+        elif isinstance(value, InputArena):
+            new_attrs[name] = InputArena()
+    for name, value in attrs.items():
+        if name in new_attrs or name in skip:
+            continue
+        if predictor is not None:
+            handles = _renew_handles(value, predictor)
+            if handles is not None:
+                new_attrs[name] = handles
+                continue
+        if hasattr(value, '__dict__') and not isinstance(value, (
+                type, types.ModuleType, types.FunctionType, types.MethodType)):
+            value_clone = clone_engine(value, skip, memo)
+            if value_clone is not value:
+                new_attrs[name] = value_clone
+    if len(new_attrs) == 0:
+        return engine
+    engine_clone = copy.copy(engine)
+    engine_clone.__dict__.update(new_attrs)
+    memo[id(engine)] = engine_clone
+    return engine_clone
+
+
 def get_output_tensors(args, mode, predictor):
     output_names = predictor.get_output_names()
     output_tensors = []
@@ -322,6 +529,7 @@ def get_infer_gpuid():
     if sysstr == "Windows":
         return 0
 
+    import paddle
     if not paddle.fluid.core.is_compiled_with_rocm():
         cmd = "env | grep CUDA_VISIBLE_DEVICES"
     else:
@@ -606,6 +814,67 @@ def draw_boxes(image, boxes, scores=None, drop_score=0.5):
     return image
 
 
+class LazyAttribute(object):
+    """
+    Attribute built by the named factory method of the instance on first
+    access and then kept in the instance dict like a plain attribute.
+    Assigning the attribute, e.g. eagerly in __init__, skips the factory.
+    Used for predictors, so that models are only loaded when used.
+    """
+    # reentrant, factories may use other lazy attributes
+    _lock = threading.RLock()
+
+    def __init__(self, factory_name):
+        self.factory_name = factory_name
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        with self._lock:
+            if self.name not in obj.__dict__:
+                obj.__dict__[self.name] = getattr(obj, self.factory_name)()
+        return obj.__dict__[self.name]
+
+
+class InputArena(object):
+    """
+    Reusable float32 input buffer of a predictor. get() returns a
+    contiguous [B, C, H, W] view, the memory is only reallocated when a
+    larger batch than any before is requested.
+    """
+
+    def __init__(self):
+        self._buffer = np.empty(0, dtype=np.float32)
+
+    def get(self, shape):
+        size = int(np.prod(shape))
+        if self._buffer.size < size:
+            self._buffer = np.empty(size, dtype=np.float32)
+        return self._buffer[:size].reshape(shape)
+
+
+def norm_img_into(img, out):
+    """
+    Normalize the resized uint8 HWC image img to [-1, 1] straight into the
+    left part of the CHW float32 slot out and zero the padding on its
+    right, without intermediate float copies.
+    """
+    resized_w = img.shape[1]
+    if img.ndim == 2:
+        img = img[:, :, np.newaxis]
+    np.multiply(
+        img.transpose((2, 0, 1)),
+        np.float32(2. / 255.),
+        out=out[:, :, :resized_w])
+    out[:, :, :resized_w] -= np.float32(1.)
+    out[:, :, resized_w:] = 0.
+    return out
+
+
 def get_rotate_crop_image(img, points):
     '''
     img_height, img_width = img.shape[0:2]
@@ -641,7 +910,171 @@ def get_rotate_crop_image(img, points):
     return dst_img
 
 
-def get_minarea_rect_crop(img, points):
+def get_perspective_transforms(points):
+    """
+    Vectorized cv2.getPerspectiveTransform for the crops of get_rotate_crop_image.
+    args:
+        points: quads with shape [N, 4, 2]
+    return:
+        crop widths [N], crop heights [N] and transforms [N, 3, 3] from the
+        image to each crop
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 4, 2)
+    widths = np.maximum(
+        np.linalg.norm(points[:, 0] - points[:, 1], axis=1),
+        np.linalg.norm(points[:, 2] - points[:, 3], axis=1)).astype(np.int64)
+    heights = np.maximum(
+        np.linalg.norm(points[:, 0] - points[:, 3], axis=1),
+        np.linalg.norm(points[:, 1] - points[:, 2], axis=1)).astype(np.int64)
+    widths = np.maximum(widths, 1)
+    heights = np.maximum(heights, 1)
+    num = len(points)
+    u = np.stack([np.zeros(num), widths, widths, np.zeros(num)], axis=1)
+    v = np.stack([np.zeros(num), np.zeros(num), heights, heights], axis=1)
+
+    # the 8 unknowns of every homography, as in cv2.getPerspectiveTransform
+    x, y = points[..., 0], points[..., 1]
+    A = np.zeros((num, 8, 8), dtype=np.float64)
+    A[:, 0:4, 0], A[:, 0:4, 1], A[:, 0:4, 2] = x, y, 1
+    A[:, 0:4, 6], A[:, 0:4, 7] = -u * x, -u * y
+    A[:, 4:8, 3], A[:, 4:8, 4], A[:, 4:8, 5] = x, y, 1
+    A[:, 4:8, 6], A[:, 4:8, 7] = -v * x, -v * y
+    b = np.concatenate([u, v], axis=1)
+    try:
+        H = np.linalg.solve(A, b[..., None])[..., 0]
+    except np.linalg.LinAlgError:
+        # degenerate quads, solve them one by one in the least squares sense
+        H = np.stack(
+            [np.linalg.lstsq(a, c, rcond=None)[0] for a, c in zip(A, b)])
+    M = np.concatenate([H, np.ones((num, 1))], axis=1).reshape(-1, 3, 3)
+    return widths, heights, M
+
+
+class CropEngine(object):
+    """
+    Crops text boxes like get_rotate_crop_image, but for a whole page at
+    once: the transforms of all boxes are solved together, each warp only
+    reads a window around its box instead of the whole image, and the
+    warps run in a thread pool (OpenCV releases the GIL).
+    args:
+        num_threads(int): warp threads, 0 or 1 warps in the calling thread
+        axis_aligned_tol(float): boxes whose corners are within this many
+            pixels of an axis aligned rectangle on the pixel grid are cut
+            out by slicing. At 0 only exact rectangles take this path,
+            which then gives the same pixels as the warp
+    """
+    # cubic interpolation reads 2 pixels around each sample
+    window_margin = 3
+
+    def __init__(self, num_threads=0, axis_aligned_tol=0.):
+        self.num_threads = num_threads
+        self.axis_aligned_tol = axis_aligned_tol
+        self._executor = None
+        if num_threads > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            self._executor = ThreadPoolExecutor(num_threads)
+            # stops the threads with the engine when close is not called
+            self._finalizer = weakref.finalize(
+                self, self._executor.shutdown, wait=False)
+
+    def __call__(self, img, points_list, auto_rotate=True):
+        """
+        args:
+            points_list: quads with shape [N, 4, 2]
+            auto_rotate: rotate crops at least 1.5 times taller than wide by
+                90 degrees, as get_rotate_crop_image does
+        return:
+            the crops and the [N, 3, 3] transforms from img to each crop
+        """
+        points = np.asarray(points_list, dtype=np.float32).reshape(-1, 4, 2)
+        if len(points) == 0:
+            return [], np.zeros((0, 3, 3), dtype=np.float64)
+        widths, heights, M = get_perspective_transforms(points)
+        img_h, img_w = img.shape[:2]
+
+        # integer rectangle each box would be if it were axis aligned
+        x0 = np.round(points[:, :, 0].min(axis=1)).astype(np.int64)
+        y0 = np.round(points[:, :, 1].min(axis=1)).astype(np.int64)
+        rects = np.stack(
+            [
+                np.stack([x0, y0], 1), np.stack([x0 + widths, y0], 1),
+                np.stack([x0 + widths, y0 + heights], 1),
+                np.stack([x0, y0 + heights], 1)
+            ],
+            axis=1)
+        aligned = (np.abs(points - rects).max(axis=(1, 2)) <=
+                   self.axis_aligned_tol + 1e-3) & (x0 >= 0) & (y0 >= 0) & (
+                       x0 + widths <= img_w) & (y0 + heights <= img_h)
+
+        # source window of each warp
+        margin = self.window_margin
+        win_x0 = np.clip(
+            np.floor(points[:, :, 0].min(axis=1)) - margin, 0,
+            img_w).astype(np.int64)
+        win_y0 = np.clip(
+            np.floor(points[:, :, 1].min(axis=1)) - margin, 0,
+            img_h).astype(np.int64)
+        win_x1 = np.clip(
+            np.ceil(points[:, :, 0].max(axis=1)) + margin + 1, 0,
+            img_w).astype(np.int64)
+        win_y1 = np.clip(
+            np.ceil(points[:, :, 1].max(axis=1)) + margin + 1, 0,
+            img_h).astype(np.int64)
+        shift = np.tile(np.eye(3), (len(points), 1, 1))
+        shift[:, 0, 2], shift[:, 1, 2] = win_x0, win_y0
+        win_M = M @ shift
+
+        def crop(i):
+            w, h = int(widths[i]), int(heights[i])
+            if aligned[i]:
+                # a copy, a view would keep the page alive and share pixels
+                dst_img = img[y0[i]:y0[i] + h, x0[i]:x0[i] + w].copy()
+            elif win_x1[i] <= win_x0[i] or win_y1[i] <= win_y0[i]:
+                # the box lies outside the image
+                dst_img = cv2.warpPerspective(
+                    img,
+                    M[i], (w, h),
+                    borderMode=cv2.BORDER_REPLICATE,
+                    flags=cv2.INTER_CUBIC)
+            else:
+                dst_img = cv2.warpPerspective(
+                    img[win_y0[i]:win_y1[i], win_x0[i]:win_x1[i]],
+                    win_M[i], (w, h),
+                    borderMode=cv2.BORDER_REPLICATE,
+                    flags=cv2.INTER_CUBIC)
+            if auto_rotate and h * 1.0 / w >= 1.5:
+                dst_img = np.rot90(dst_img)
+            return dst_img
+
+        if self._executor is not None and len(points) > 1:
+            img_crop_list = list(self._executor.map(crop, range(len(points))))
+        else:
+            img_crop_list = [crop(i) for i in range(len(points))]
+        return img_crop_list, M
+
+    def close(self):
+        """
+        Stop the threads, later crops are made in the calling thread.
+        """
+        if self._executor is not None:
+            self._finalizer.detach()
+            self._executor.shutdown()
+            self._executor = None
+
+
+def get_rotate_crop_images(img, points_list, auto_rotate=True):
+    """
+    get_rotate_crop_image over a list of quads in the calling thread, see
+    CropEngine.
+    """
+    return CropEngine()(img, points_list, auto_rotate)
+
+
+def get_minarea_rect(points):
+    """
+    Minimum area rectangle of a polygon, ordered as top-left, top-right,
+    bottom-right, bottom-left.
+    """
     bounding_box = cv2.minAreaRect(np.array(points).astype(np.int32))
     points = sorted(list(cv2.boxPoints(bounding_box)), key=lambda x: x[0])
 
@@ -659,12 +1092,18 @@ def get_minarea_rect_crop(img, points):
         index_b = 3
         index_c = 2
 
-    box = [points[index_a], points[index_b], points[index_c], points[index_d]]
-    crop_img = get_rotate_crop_image(img, np.array(box))
+    return np.array(
+        [points[index_a], points[index_b], points[index_c], points[index_d]])
+
+
+def get_minarea_rect_crop(img, points):
+    box = get_minarea_rect(points)
+    crop_img = get_rotate_crop_image(img, box)
     return crop_img
 
 
 def check_gpu(use_gpu):
+    import paddle
     if use_gpu and not paddle.is_compiled_with_cuda():
         use_gpu = False
     return use_gpu
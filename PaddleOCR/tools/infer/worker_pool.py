@@ -0,0 +1,331 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import sys
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(__dir__)
+sys.path.insert(0, os.path.abspath(os.path.join(__dir__, '../..')))
+
+os.environ["FLAGS_allocator_strategy"] = 'auto_growth'
+
+import copy
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from ppocr.utils.logging import get_logger
+
+logger = get_logger()
+
+_MODEL_DIR_ARGS = ['det_model_dir', 'cls_model_dir', 'rec_model_dir']
+# seconds between checks that the workers are alive
+_POLL_INTERVAL = 1.0
+
+
+def split_cores(worker_num, cores_per_worker=0):
+    """
+    Split the cores this process may run on into `worker_num` disjoint
+    sets, `cores_per_worker` cores each (0 shares them out evenly).
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+    if cores_per_worker <= 0:
+        cores_per_worker = max(1, len(cores) // worker_num)
+    core_sets = []
+    for i in range(worker_num):
+        core_set = cores[i * cores_per_worker:(i + 1) * cores_per_worker]
+        if len(core_set) == 0:
+            # more workers than cores, wrap around
+            core_set = [cores[i % len(cores)]]
+        core_sets.append(core_set)
+    return core_sets
+
+
+def _preload_model_files(args):
+    """
+    Read the model files once in the parent so the workers load them from
+    the page cache instead of all hitting the disk at the same time.
+    """
+    for name in _MODEL_DIR_ARGS:
+        model_dir = getattr(args, name, None)
+        if not model_dir or not os.path.isdir(model_dir):
+            continue
+        for file_name in os.listdir(model_dir):
+            path = os.path.join(model_dir, file_name)
+            if os.path.isfile(path):
+                with open(path, 'rb') as f:
+                    while f.read(1 << 24):
+                        pass
+
+
+def _worker_main(worker_id, args, cores, task_queue, result_queue, current):
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+    args.cpu_threads = len(cores)
+    from tools.infer.predict_system import TextSystem
+    try:
+        text_sys = TextSystem(args)
+    except Exception as e:
+        result_queue.put(('init_error', worker_id, repr(e)))
+        return
+    result_queue.put(('ready', worker_id, None))
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        task_id, img, cls = task
+        # written to shared memory at once, unlike a queued message, so
+        # the pool can fail the task if this worker dies at any point
+        current[worker_id] = task_id
+        start = time.time()
+        try:
+            dt_boxes, rec_res, time_dict = text_sys(img, cls)
+            res = (dt_boxes, rec_res, time_dict)
+            error = None
+        except Exception as e:
+            res, error = None, repr(e)
+        result_queue.put(('result', worker_id,
+                          (task_id, res, error, time.time() - start)))
+
+
+class OCRWorkerPool(object):
+    """
+    Pool of inference processes. Every worker is pinned to its own set of
+    cores, builds its own TextSystem with a matching `cpu_threads` and
+    takes images from a shared queue, so a many-core machine runs several
+    right-sized predictors instead of one oversubscribed one.
+    Results are (dt_boxes, rec_res, time_dict) as from TextSystem.__call__.
+    A worker that dies (e.g. killed for running out of memory) fails the
+    image it was running and is restarted, the pool is closed and all
+    pending images fail when no worker can be started.
+    """
+
+    def __init__(self, args, worker_num=None, cores_per_worker=None):
+        self.worker_num = max(1, worker_num or args.worker_num)
+        if cores_per_worker is None:
+            cores_per_worker = args.worker_cores
+        self.core_sets = split_cores(self.worker_num, cores_per_worker)
+        _preload_model_files(args)
+
+        method = 'fork' if 'fork' in multiprocessing.get_all_start_methods(
+        ) else 'spawn'
+        self._ctx = multiprocessing.get_context(method)
+        self._task_queue = self._ctx.Queue()
+        self._result_queue = self._ctx.Queue()
+        self._futures = {}
+        # id of the last task taken by each worker
+        self._current = self._ctx.RawArray('q', [-1] * self.worker_num)
+        self._lock = threading.Lock()
+        self._task_ids = itertools.count()
+        self._stats = [{
+            'count': 0,
+            'errors': 0,
+            'latency': []
+        } for _ in range(self.worker_num)]
+        self._start_time = None
+
+        self._worker_args = copy.deepcopy(args)
+        self._worker_args.worker_num = 0
+        self._workers = [None] * self.worker_num
+        for worker_id in range(self.worker_num):
+            self._start_worker(worker_id)
+        self._wait_ready()
+        self._closed = False
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+        logger.info("started {} ocr workers, cores: {}".format(
+            self.worker_num, self.core_sets))
+
+    def _start_worker(self, worker_id):
+        worker = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self._worker_args, self.core_sets[worker_id],
+                  self._task_queue, self._result_queue, self._current),
+            daemon=True)
+        worker.start()
+        self._workers[worker_id] = worker
+
+    def _wait_ready(self):
+        ready = 0
+        while ready < self.worker_num:
+            kind, worker_id, error = self._result_queue.get()
+            if kind == 'init_error':
+                self._terminate()
+                raise RuntimeError("ocr worker {} failed to start: {}".format(
+                    worker_id, error))
+            ready += 1
+
+    def _collect(self):
+        last_check = time.time()
+        while True:
+            try:
+                item = self._result_queue.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                return
+            if time.time() - last_check >= _POLL_INTERVAL:
+                self._check_workers()
+                last_check = time.time()
+            if len(item) == 0:
+                continue
+            kind, worker_id, value = item
+            if kind == 'init_error':
+                logger.error("ocr worker {} failed to restart: {}".format(
+                    worker_id, value))
+                self._workers[worker_id].join()
+                self._workers[worker_id] = None
+                if all(worker is None for worker in self._workers):
+                    self._fail_all(
+                        RuntimeError("no ocr worker could be restarted"))
+                continue
+            if kind != 'result':
+                continue
+            task_id, res, error, latency = value
+            stats = self._stats[worker_id]
+            stats['count'] += 1
+            stats['latency'].append(latency)
+            with self._lock:
+                future = self._futures.pop(task_id, None)
+            if future is None:
+                # already failed as its worker was taken for dead
+                continue
+            if error is not None:
+                stats['errors'] += 1
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(res)
+
+    def _check_workers(self):
+        """
+        Fail the task of every worker that died and restart the worker.
+        """
+        for worker_id, worker in enumerate(self._workers):
+            if self._closed or worker is None or worker.exitcode is None:
+                continue
+            error = "ocr worker {} died with exit code {}".format(
+                worker_id, worker.exitcode)
+            logger.error(error)
+            task_id = self._current[worker_id]
+            self._current[worker_id] = -1
+            with self._lock:
+                future = self._futures.pop(task_id, None)
+            if future is not None:
+                self._stats[worker_id]['errors'] += 1
+                future.set_exception(RuntimeError(error))
+            self._start_worker(worker_id)
+
+    def _fail_all(self, error):
+        self._closed = True
+        with self._lock:
+            futures = list(self._futures.values())
+            self._futures.clear()
+        for future in futures:
+            future.set_exception(error)
+
+    def submit(self, img, cls=True):
+        """
+        Queue one image, returns a concurrent.futures.Future resolving to
+        (dt_boxes, rec_res, time_dict).
+        """
+        if self._closed:
+            raise RuntimeError("OCRWorkerPool has been closed")
+        if self._start_time is None:
+            self._start_time = time.time()
+        task_id = next(self._task_ids)
+        future = Future()
+        with self._lock:
+            self._futures[task_id] = future
+        self._task_queue.put((task_id, img, cls))
+        return future
+
+    def __call__(self, img, cls=True, timeout=None):
+        return self.submit(img, cls).result(timeout)
+
+    def imap(self, imgs, cls=True, max_pending=None, timeout=None):
+        """
+        Run an iterable of images through the pool and yield the results
+        in input order, keeping at most `max_pending` images in flight.
+        With `timeout`, waiting longer than that many seconds for a result
+        raises concurrent.futures.TimeoutError.
+        """
+        if max_pending is None:
+            max_pending = 2 * self.worker_num
+        pending = deque()
+        for img in imgs:
+            pending.append(self.submit(img, cls))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result(timeout)
+        while pending:
+            yield pending.popleft().result(timeout)
+
+    def stats(self):
+        """
+        Per worker count, error count, throughput (images/s since the first
+        submit) and latency mean/p50/p95 in seconds.
+        """
+        elapse = time.time() - self._start_time if self._start_time else 0
+        report = []
+        for worker_id, stats in enumerate(self._stats):
+            latency = np.array(stats['latency'], dtype=np.float64)
+            report.append({
+                'worker': worker_id,
+                'cores': self.core_sets[worker_id],
+                'count': stats['count'],
+                'errors': stats['errors'],
+                'throughput': stats['count'] / elapse if elapse > 0 else 0.,
+                'latency_mean': float(latency.mean()) if len(latency) else 0.,
+                'latency_p50':
+                float(np.percentile(latency, 50)) if len(latency) else 0.,
+                'latency_p95':
+                float(np.percentile(latency, 95)) if len(latency) else 0.
+            })
+        return report
+
+    def log_stats(self):
+        total = 0
+        for item in self.stats():
+            total += item['throughput']
+            logger.info(
+                "worker {worker} cores {cores}: {count} images, "
+                "{throughput:.2f} img/s, latency mean {latency_mean:.3f}s "
+                "p50 {latency_p50:.3f}s p95 {latency_p95:.3f}s".format(**item))
+        logger.info("pool throughput: {:.2f} img/s".format(total))
+
+    def close(self):
+        if self._closed and not self._collector.is_alive():
+            return
+        self._closed = True
+        workers = [worker for worker in self._workers if worker is not None]
+        for _ in workers:
+            self._task_queue.put(None)
+        for worker in workers:
+            worker.join()
+        self._result_queue.put(None)
+        self._collector.join()
+
+    def _terminate(self):
+        for worker in self._workers:
+            if worker is not None:
+                worker.terminate()
+                worker.join()
@@ -2,94 +2,12 @@
 # -*- coding: utf-8 -*-
 """
 基础OCR Web服务
-使用基本的Python库实现OCR功能
+与简易OCR Web服务共用同一个本地PaddleOCR引擎，仅页面不同
 """
 
-import os
-import json
-import base64
-from io import BytesIO
-from flask import Flask, render_template, request, jsonify
-import requests
-from PIL import Image
+from simple_ocr_web import create_app
 
-app = Flask(__name__)
-
-# 简化的OCR功能
-def call_ocr_api(image_data):
-    """调用OCR API进行文字识别"""
-    try:
-        # 这里使用一个简单的文本识别示例
-        # 实际使用时应该调用OCR服务
-        
-        # 尝试使用在线OCR服务（免费版本）
-        url = "https://api.ocr.space/parse/image"
-        
-        # 将图像转换为base64
-        img_str = base64.b64encode(image_data).decode('utf-8')
-        
-        payload = {
-            'base64Image': f'data:image/jpeg;base64,{img_str}',
-            'apikey': 'K83885682688957',  # 免费API密钥
-            'language': 'chs',
-            'OCREngine': '2'
-        }
-        
-        response = requests.post(url, data=payload, timeout=30)
-        
-        if response.status_code == 200:
-            result = response.json()
-            if result.get('IsErroredOnProcessing'):
-                return {'error': 'OCR处理错误: ' + result.get('ErrorMessage', '未知错误')}
-            
-            # 解析结果
-            text_results = []
-            for parsed_result in result.get('ParsedResults', []):
-                text = parsed_result.get('ParsedText', '')
-                if text.strip():
-                    text_results.append({
-                        'text': text.strip(),
-                        'confidence': 0.9,
-                        'bbox': []
-                    })
-            
-            if not text_results:
-                return {'error': '未识别到文字'}
-            
-            return text_results
-        else:
-            return {'error': f'API请求失败: {response.status_code}'}
-            
-    except Exception as e:
-        return {'error': f'OCR处理异常: {str(e)}'}
-
-def preprocess_image(image_file):
-    """预处理上传的图像"""
-    try:
-        # 读取图像
-        image = Image.open(image_file.stream)
-        
-        # 转换为RGB格式
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # 调整图像大小（避免过大图像）
-        max_size = (2000, 2000)
-        image.thumbnail(max_size, Image.Resampling.LANCZOS)
-        
-        # 转换为字节流
-        img_byte_arr = BytesIO()
-        image.save(img_byte_arr, format='JPEG', quality=85)
-        img_byte_arr = img_byte_arr.getvalue()
-        
-        return img_byte_arr
-    except Exception as e:
-        raise Exception(f'图像预处理失败: {str(e)}')
-
-@app.route('/')
-def index():
-    """主页面"""
-    return '''
+INDEX_HTML = '''
     <!DOCTYPE html>
     <html lang="zh-CN">
     <head>
@@ -297,37 +215,14 @@ def index():
         </script>
     </body>
     </html>
-    '''
+'''
 
-@app.route('/ocr', methods=['POST'])
-def ocr():
-    """OCR识别接口"""
-    try:
-        if 'image' not in request.files:
-            return jsonify({'error': '没有上传图片'}), 400
-        
-        image_file = request.files['image']
-        if image_file.filename == '':
-            return jsonify({'error': '没有选择文件'}), 400
-        
-        # 预处理图像
-        processed_image = preprocess_image(image_file)
-        
-        # 调用OCR API
-        ocr_results = call_ocr_api(processed_image)
-        
-        if 'error' in ocr_results:
-            return jsonify({'error': ocr_results['error']}), 500
-        
-        return jsonify({'results': ocr_results})
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+app = create_app(INDEX_HTML)
 
 if __name__ == '__main__':
     print("启动OCR Web服务...")
     print("服务地址: http://127.0.0.1:5000")
     print("按 Ctrl+C 停止服务")
-    
-    # 启动Web服务
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+
+    # 启动Web服务，threaded=True 以支持并发上传；关闭debug避免重复加载模型
+    app.run(host='0.0.0.0', port=5000, threaded=True, debug=False)
@@ -2,112 +2,189 @@
 # -*- coding: utf-8 -*-
 """
 简易OCR Web服务
-使用PaddleOCR提供的在线API服务
+启动时加载一次本地PaddleOCR引擎，推理在后台批处理线程中执行，
+支持并发上传、请求超时以及 /healthz 就绪探针
 """
 
 import os
-import json
-import base64
-from io import BytesIO
-from flask import Flask, render_template, request, jsonify
-import requests
-from PIL import Image
+import sys
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from flask import Flask, request, jsonify
+from PIL import Image, UnidentifiedImageError
 import numpy as np
 
-app = Flask(__name__)
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(__dir__, 'PaddleOCR'))
 
-# PaddleOCR在线API接口（使用第三方服务或本地服务）
-def call_ocr_api(image_data):
-    """调用OCR API进行文字识别"""
-    try:
-        # 首先尝试使用本地安装的PaddleOCR
+# 服务配置，均可通过环境变量覆盖
+OCR_LANG = os.environ.get('OCR_LANG', 'ch')
+OCR_USE_ANGLE_CLS = os.environ.get('OCR_USE_ANGLE_CLS', '1') == '1'
+OCR_USE_GPU = os.environ.get('OCR_USE_GPU', '0') == '1'
+# 单个请求等待识别结果的最长时间（秒）
+OCR_TIMEOUT = float(os.environ.get('OCR_TIMEOUT', '30'))
+# 后台批处理线程一次最多合并的图片数
+OCR_BATCH_MAX_IMAGES = int(os.environ.get('OCR_BATCH_MAX_IMAGES', '8'))
+# 上传文件大小上限（字节）
+MAX_CONTENT_LENGTH = int(os.environ.get('OCR_MAX_UPLOAD', 20 * 1024 * 1024))
+
+
+class OCREngine(object):
+    """本地OCR引擎，进程内只加载一次，所有请求共享"""
+
+    def __init__(self, lang='ch', use_angle_cls=True, use_gpu=False,
+                 batch_max_images=8):
+        self.lang = lang
+        self.use_angle_cls = use_angle_cls
+        self.use_gpu = use_gpu
+        self.batch_max_images = batch_max_images
+        self.system = None
+        self.error = None
+        self.ready = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        """在后台线程中加载模型，加载完成前 /healthz 返回 503"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._load, daemon=True).start()
+
+    def _load(self):
         try:
             from paddleocr import PaddleOCR
-            ocr = PaddleOCR(use_angle_cls=True, lang='ch')
-            result = ocr.ocr(image_data)
-            
-            # 格式化结果
-            text_results = []
-            for line in result:
-                for word_info in line:
-                    text = word_info[1][0]
-                    confidence = word_info[1][1]
-                    box = word_info[0]
-                    text_results.append({
-                        'text': text,
-                        'confidence': float(confidence),
-                        'bbox': box
-                    })
-            
-            return text_results
-        except ImportError:
-            # 如果没有安装PaddleOCR，使用在线API
-            pass
-        
-        # 使用在线OCR服务（示例，需要替换为真实的API）
-        # 注意：这里只是一个示例，实际使用时需要申请相应的API服务
-        url = "https://api.ocr.space/parse/image"
-        
-        # 将图像转换为base64
-        img_str = base64.b64encode(image_data).decode('utf-8')
-        
-        payload = {
-            'base64Image': f'data:image/jpeg;base64,{img_str}',
-            'apikey': 'helloworld',  # 需要替换为真实的API密钥
-            'language': 'chs'
-        }
-        
-        response = requests.post(url, data=payload)
-        
-        if response.status_code == 200:
-            result = response.json()
-            if result.get('IsErroredOnProcessing'):
-                return {'error': 'OCR处理错误'}
-            
-            # 解析结果
-            text_results = []
-            for parsed_result in result.get('ParsedResults', []):
-                text = parsed_result.get('ParsedText', '')
-                text_results.append({
-                    'text': text.strip(),
-                    'confidence': 0.9,  # 在线服务可能不提供置信度
-                    'bbox': []
-                })
-            
-            return text_results
-        else:
-            return {'error': f'API请求失败: {response.status_code}'}
-            
-    except Exception as e:
-        return {'error': f'OCR处理异常: {str(e)}'}
+            from tools.infer.batch_system import BatchTextSystem
+            ocr = PaddleOCR(
+                use_angle_cls=self.use_angle_cls,
+                lang=self.lang,
+                use_gpu=self.use_gpu,
+                show_log=False,
+                batch_max_images=self.batch_max_images)
+            # 并发请求由批处理线程合并推理，请求线程只等待结果
+            self.system = BatchTextSystem(ocr.args, text_system=ocr)
+            self.ready.set()
+            print("PaddleOCR引擎加载完成")
+        except Exception as e:
+            self.error = f'OCR引擎加载失败: {str(e)}'
+            print(self.error)
+
+    def recognize(self, image, timeout=None, scale=(1.0, 1.0)):
+        """
+        识别一张BGR图像，返回每一行文字的文本、置信度和四点坐标，
+        坐标乘以scale（x、y方向的缩放比例）还原到原图
+        """
+        future = self.system.submit(image, cls=self.use_angle_cls)
+        try:
+            dt_boxes, rec_res, _ = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+        if dt_boxes is None:
+            return []
+        text_results = []
+        for box, (text, confidence) in zip(dt_boxes, rec_res):
+            text_results.append({
+                'text': text,
+                'confidence': float(confidence),
+                'bbox': (np.array(box) * scale).tolist()
+            })
+        return text_results
+
+
+engine = OCREngine(
+    lang=OCR_LANG,
+    use_angle_cls=OCR_USE_ANGLE_CLS,
+    use_gpu=OCR_USE_GPU,
+    batch_max_images=OCR_BATCH_MAX_IMAGES)
+
 
 def preprocess_image(image_file):
-    """预处理上传的图像"""
+    """
+    预处理上传的图像，返回BGR格式的numpy数组，以及原图相对处理后图像
+    在x、y方向的缩放比例，用于将识别框还原到原图坐标
+    """
     try:
         # 读取图像
         image = Image.open(image_file.stream)
-        
+
         # 转换为RGB格式
         if image.mode != 'RGB':
             image = image.convert('RGB')
-        
+
         # 调整图像大小（避免过大图像）
+        width, height = image.size
         max_size = (2000, 2000)
         image.thumbnail(max_size, Image.Resampling.LANCZOS)
-        
-        # 转换为字节流
-        img_byte_arr = BytesIO()
-        image.save(img_byte_arr, format='JPEG', quality=85)
-        img_byte_arr = img_byte_arr.getvalue()
-        
-        return img_byte_arr
+        scale = (width / image.size[0], height / image.size[1])
+
+        # RGB -> BGR，与PaddleOCR的输入保持一致
+        return np.ascontiguousarray(np.asarray(image)[:, :, ::-1]), scale
+    except UnidentifiedImageError:
+        raise ValueError('无法识别的图片格式')
     except Exception as e:
-        raise Exception(f'图像预处理失败: {str(e)}')
+        raise ValueError(f'图像预处理失败: {str(e)}')
+
+
+def create_app(index_html):
+    """创建Web应用，index_html为主页面内容"""
+    app = Flask(__name__)
+    app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+
+    @app.route('/')
+    def index():
+        """主页面"""
+        return index_html
+
+    @app.route('/healthz')
+    def healthz():
+        """就绪探针：模型加载完成后返回200"""
+        if engine.ready.is_set():
+            return jsonify({'status': 'ok'})
+        if engine.error:
+            return jsonify({'status': 'error', 'error': engine.error}), 503
+        return jsonify({'status': 'loading'}), 503
+
+    @app.route('/ocr', methods=['POST'])
+    def ocr():
+        """OCR识别接口"""
+        if not engine.ready.is_set():
+            return jsonify({'error': engine.error or 'OCR引擎尚未就绪'}), 503
+
+        if 'image' not in request.files:
+            return jsonify({'error': '没有上传图片'}), 400
+
+        image_file = request.files['image']
+        if image_file.filename == '':
+            return jsonify({'error': '没有选择文件'}), 400
+
+        # 预处理图像
+        try:
+            image, scale = preprocess_image(image_file)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # 调用本地OCR引擎
+        try:
+            ocr_results = engine.recognize(
+                image, timeout=OCR_TIMEOUT, scale=scale)
+        except FutureTimeoutError:
+            return jsonify({'error': f'OCR处理超时（{OCR_TIMEOUT:g}秒）'}), 504
+        except Exception as e:
+            return jsonify({'error': f'OCR处理异常: {str(e)}'}), 500
+
+        return jsonify({'results': ocr_results})
+
+    @app.errorhandler(413)
+    def too_large(e):
+        return jsonify({'error': '上传文件过大'}), 413
 
-@app.route('/')
-def index():
-    """主页面"""
-    return '''
+    engine.start()
+    return app
+
+
+INDEX_HTML = '''
     <!DOCTYPE html>
     <html lang="zh-CN">
     <head>
@@ -310,40 +387,13 @@ def index():
         </script>
     </body>
     </html>
-    '''
+'''
 
-@app.route('/ocr', methods=['POST'])
-def ocr():
-    """OCR识别接口"""
-    try:
-        if 'image' not in request.files:
-            return jsonify({'error': '没有上传图片'}), 400
-        
-        image_file = request.files['image']
-        if image_file.filename == '':
-            return jsonify({'error': '没有选择文件'}), 400
-        
-        # 预处理图像
-        processed_image = preprocess_image(image_file)
-        
-        # 调用OCR API
-        ocr_results = call_ocr_api(processed_image)
-        
-        if 'error' in ocr_results:
-            return jsonify({'error': ocr_results['error']}), 500
-        
-        return jsonify({'results': ocr_results})
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+app = create_app(INDEX_HTML)
 
 if __name__ == '__main__':
-    # 检查是否安装了PaddleOCR
-    try:
-        from paddleocr import PaddleOCR
-        print("PaddleOCR已安装，使用本地OCR引擎")
-    except ImportError:
-        print("PaddleOCR未安装，将使用在线OCR服务（需要配置API密钥）")
-    
-    # 启动Web服务
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    print("启动OCR Web服务，正在后台加载本地PaddleOCR引擎...")
+    print("服务地址: http://127.0.0.1:5000")
+
+    # 启动Web服务，threaded=True 以支持并发上传；关闭debug避免重复加载模型
+    app.run(host='0.0.0.0', port=5000, threaded=True, debug=False)